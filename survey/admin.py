@@ -4,7 +4,8 @@ from .models import (
     Organization, SurveyHeader, SurveySection, Question, Answer,
     SurveySession,
     SurveySectionTranslation, QuestionTranslation,
-    Story,
+    Story, ExportJob, ExportCacheEntry, ImportJob,
+    touch_sessions,
 )
 from leaflet.admin import LeafletGeoAdmin
 
@@ -25,6 +26,13 @@ class SurveyAdmin(LeafletGeoAdmin):
     list_display = ('organization', 'name', 'visibility', 'is_archived', 'redirect_url', 'available_languages')
     list_filter = ('visibility', 'is_archived')
 
+    def save_model(self, request, obj, form, change):
+        # Keep structure_version bumps made since the change form was loaded
+        if change:
+            obj.save(update_fields=form.changed_data)
+        else:
+            obj.save()
+
 
 class QuestionInLine(admin.TabularInline):
     model = Question
@@ -47,12 +55,21 @@ class QuestionAdmin(admin.ModelAdmin):
     ]
 
 
+class AnswerAdmin(admin.ModelAdmin):
+
+    def delete_queryset(self, request, queryset):
+        # Answer.delete() touches its session; bulk deletes do it once per session
+        session_ids = set(queryset.values_list('survey_session_id', flat=True))
+        super().delete_queryset(request, queryset)
+        touch_sessions(id__in=session_ids)
+
+
 gisadmin.site.register(Organization)
 gisadmin.site.register(SurveyHeader, SurveyAdmin)
 gisadmin.site.register(SurveySection, SurveySectionAdmin)
 gisadmin.site.register(Question, QuestionAdmin)
 admin.site.register(SurveySession)
-admin.site.register(Answer)
+admin.site.register(Answer, AnswerAdmin)
 
 
 class StoryAdmin(admin.ModelAdmin):
@@ -62,3 +79,31 @@ class StoryAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Story, StoryAdmin)
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('survey', 'kind', 'mode', 'status', 'progress', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    raw_id_fields = ('survey', 'organization', 'requested_by')
+
+
+admin.site.register(ExportJob, ExportJobAdmin)
+
+
+class ExportCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('survey', 'kind', 'mode', 'size', 'created_at', 'last_used_at')
+    list_filter = ('kind',)
+    raw_id_fields = ('survey',)
+
+
+admin.site.register(ExportCacheEntry, ExportCacheEntryAdmin)
+
+
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('survey', 'status', 'sessions_done', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    raw_id_fields = ('survey', 'created_by')
+    readonly_fields = ('archive_hash',)
+
+
+admin.site.register(ImportJob, ImportJobAdmin)
@@ -0,0 +1,415 @@
+"""
+Respondent answer persistence and prefill.
+
+Turns a submitted survey section into Answer rows and writes only what
+differs from the stored answers, inside a single transaction that holds
+the session's row lock, and loads a session's existing answers back into
+form initial values and GeoJSON features. Questions and sub-questions
+are looked up in the section snapshot (see survey.snapshot), so the number
+of queries does not grow with the number of drawn features or their
+properties.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import geojson
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.contrib.gis.gdal import GDALException
+from django.contrib.gis.geos import GEOSException, GEOSGeometry
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+
+from .models import Answer, SurveySession, touch_sessions
+
+GEO_INPUT_TYPES = ('point', 'line', 'polygon')
+
+# Decimal digits kept by ST_AsGeoJSON; enough to round-trip double coordinates
+GEOJSON_PRECISION = 15
+
+# Answer columns compared and rewritten by upsert_answers
+VALUE_FIELDS = ('text', 'numeric', 'selected_choices') + GEO_INPUT_TYPES
+
+# Coordinates closer than this are treated as unchanged geometry
+GEOMETRY_TOLERANCE = 1e-9
+
+# GEOS geometry type stored by each geo input type
+GEOMETRY_TYPES = {'point': 'Point', 'line': 'LineString', 'polygon': 'Polygon'}
+
+
+class AnswerDataError(Exception):
+    """Raised when submitted values cannot be turned into answers."""
+    pass
+
+
+def build_sub_answer(survey_session_id, sub_question, value, parent_answer) -> Answer:
+    """Build a child answer from one GeoJSON feature property."""
+    sub_answer = Answer(
+        survey_session_id=survey_session_id,
+        question_id=sub_question.id,
+        parent_answer_id=parent_answer,
+    )
+    if not sub_question.choices:
+        if sub_question.input_type in ('text', 'text_line') and value and value[0]:
+            sub_answer.text = value[0]
+        elif sub_question.input_type == 'number' and value and value[0]:
+            sub_answer.numeric = float(value[0])
+    else:
+        if sub_question.input_type == 'range' and value and value[0]:
+            sub_answer.numeric = float(value[0])
+        else:
+            sub_answer.selected_choices = [int(v) for v in value if v]
+    return sub_answer
+
+
+def build_geo_answers(survey_session_id, question, value, sub_questions) -> List[Tuple[Answer, List[Answer]]]:
+    """Build (answer, sub_answers) pairs from a '|'-separated list of GeoJSON features.
+
+    sub_questions maps question code to (snapshot) question; feature
+    properties with unknown codes are ignored.
+    """
+    result = []
+    for geostr in value.split('|'):
+        if geostr == '':
+            continue
+        gj = geojson.loads(geostr)
+        geometry = GEOSGeometry(geojson.dumps(gj['geometry']))
+        if geometry.geom_type != GEOMETRY_TYPES[question.input_type]:
+            raise ValueError(f"expected a {GEOMETRY_TYPES[question.input_type]}, got a {geometry.geom_type}")
+        answer = Answer(survey_session_id=survey_session_id, question_id=question.id)
+        setattr(answer, question.input_type, geometry)
+
+        sub_answers = []
+        for key, prop_value in (gj['properties'] or {}).items():
+            if key == 'question_id':
+                continue
+            sub_question = sub_questions.get(key)
+            if sub_question is None:
+                continue
+            sub_answers.append(build_sub_answer(survey_session_id, sub_question, prop_value, answer))
+        result.append((answer, sub_answers))
+    return result
+
+
+def build_answer(survey_session_id, question, values) -> Answer:
+    """Build a non-geo top-level answer from the submitted values of a question."""
+    answer = Answer(survey_session_id=survey_session_id, question_id=question.id)
+    if not question.choices:
+        value = values[0]
+        if question.input_type in ('text', 'text_line'):
+            answer.text = value
+        elif question.input_type == 'number' and value:
+            answer.numeric = float(value)
+    elif question.input_type == 'range':
+        if values[0]:
+            answer.numeric = float(values[0])
+    else:
+        answer.selected_choices = [int(v) for v in values if v]
+    return answer
+
+
+def build_section_answers(section, survey_session_id, data) -> List[Tuple[Answer, List[Answer]]]:
+    """Build unsaved (answer, sub_answers) pairs for every question submitted in data.
+
+    Args:
+        section: SectionSnapshot of the submitted section
+        survey_session_id: Respondent session id
+        data: QueryDict with the submitted form values
+    """
+    result = []
+    for question in section.questions():
+        values = data.getlist(question.code)
+        if values == []:
+            continue
+        result.extend(build_question_answers(section, survey_session_id, question, values))
+    return result
+
+
+def build_question_answers(section, survey_session_id, question, values) -> List[Tuple[Answer, List[Answer]]]:
+    """Build unsaved (answer, sub_answers) pairs for the submitted values of one question.
+
+    Raises AnswerDataError for malformed GeoJSON, geometries of the wrong
+    type or values that are not numbers or choice codes.
+    """
+    try:
+        if not question.choices and question.input_type in GEO_INPUT_TYPES:
+            return build_geo_answers(survey_session_id, question, values[0], section.questions_by_code)
+        return [(build_answer(survey_session_id, question, values), [])]
+    except (ValueError, TypeError, KeyError, AttributeError, GEOSException, GDALException) as e:
+        raise AnswerDataError(f"Invalid value for question '{question.code}': {e}")
+
+
+def bulk_insert_answers(pairs: List[Tuple[Answer, List[Answer]]]) -> Dict[str, int]:
+    """Insert parent answers, then their children, with one bulk insert each."""
+    parents = [answer for answer, _ in pairs]
+    Answer.objects.bulk_create(parents)
+
+    children = []
+    for answer, sub_answers in pairs:
+        for sub_answer in sub_answers:
+            # Re-assign so the freshly generated parent pk is picked up
+            sub_answer.parent_answer_id = answer
+            children.append(sub_answer)
+    Answer.objects.bulk_create(children)
+
+    return {"answers": len(parents), "sub_answers": len(children)}
+
+
+def _same_value(old, new, field) -> bool:
+    old_value, new_value = getattr(old, field), getattr(new, field)
+    if field in GEO_INPUT_TYPES and old_value is not None and new_value is not None:
+        return old_value.equals_exact(new_value, GEOMETRY_TOLERANCE)
+    return old_value == new_value
+
+
+def _copy_values(target, source) -> bool:
+    """Copy the value fields of source onto target; True if any of them changed."""
+    changed = False
+    for field in VALUE_FIELDS:
+        if not _same_value(target, source, field):
+            setattr(target, field, getattr(source, field))
+            changed = True
+    return changed
+
+
+def _pair_answers(old, new, new_key=lambda item: item):
+    """Pair stored answers with submitted ones.
+
+    Identical values are paired first, the remaining ones in order, so an
+    edited answer is updated instead of deleted and re-inserted.
+
+    Returns (pairs, unmatched_new, unmatched_old).
+    """
+    remaining_old = list(old)
+    pairs = []
+    unmatched_new = []
+    for item in new:
+        answer = new_key(item)
+        match = next(
+            (o for o in remaining_old if all(_same_value(o, answer, f) for f in VALUE_FIELDS)),
+            None,
+        )
+        if match is None:
+            unmatched_new.append(item)
+        else:
+            remaining_old.remove(match)
+            pairs.append((match, item))
+
+    positional = min(len(unmatched_new), len(remaining_old))
+    pairs.extend(zip(remaining_old[:positional], unmatched_new[:positional]))
+    return pairs, unmatched_new[positional:], remaining_old[positional:]
+
+
+def _diff_answers(existing, question_ids, pairs):
+    """Compare stored answers with submitted pairs.
+
+    Returns (created, created_children, updated, deleted): new top-level
+    pairs, new children of kept answers, changed rows and rows to delete.
+    """
+    old_by_question = {}
+    old_children = {}
+    for answer in existing:
+        if answer.parent_answer_id_id is None:
+            old_by_question.setdefault(answer.question_id, []).append(answer)
+        else:
+            old_children.setdefault(answer.parent_answer_id_id, []).append(answer)
+
+    new_by_question = {}
+    for answer, sub_answers in pairs:
+        new_by_question.setdefault(answer.question_id, []).append((answer, sub_answers))
+
+    created = []
+    created_children = []
+    updated = []
+    deleted = []
+    for question_id in question_ids:
+        matched, added, removed = _pair_answers(
+            old_by_question.get(question_id, []),
+            new_by_question.get(question_id, []),
+            new_key=lambda item: item[0],
+        )
+        deleted.extend(removed)
+        created.extend(added)
+
+        for old, (new, sub_answers) in matched:
+            if _copy_values(old, new):
+                updated.append(old)
+            children = old_children.get(old.id, [])
+            for sub_question_id in {a.question_id for a in children} | {a.question_id for a in sub_answers}:
+                child_pairs, new_children, old_removed = _pair_answers(
+                    [a for a in children if a.question_id == sub_question_id],
+                    [a for a in sub_answers if a.question_id == sub_question_id],
+                )
+                deleted.extend(old_removed)
+                for old_child, new_child in child_pairs:
+                    if _copy_values(old_child, new_child):
+                        updated.append(old_child)
+                for new_child in new_children:
+                    new_child.parent_answer_id = old
+                    created_children.append(new_child)
+    return created, created_children, updated, deleted
+
+
+def upsert_answers(survey_session_id, question_ids, pairs: List[Tuple[Answer, List[Answer]]]) -> Dict[str, int]:
+    """Make the stored answers to question_ids match pairs, writing only differences.
+
+    The session row is locked first, so a section submit and an autosave of
+    the same session are serialized and never diff against the same stale
+    answers. Stored top-level answers and their sub-answers are then read
+    in one query and compared with the submitted (answer, sub_answers)
+    pairs. Changed rows are bulk-updated, new ones bulk-inserted and missing
+    ones deleted. Stored answers to question_ids that were not submitted are
+    deleted.
+
+    Returns the number of rows created, updated and deleted; resubmitting
+    unchanged answers touches none.
+    """
+    question_ids = list(question_ids)
+    with transaction.atomic():
+        SurveySession.objects.select_for_update().get(id=survey_session_id)
+        existing = Answer.objects.filter(survey_session_id=survey_session_id).filter(
+            Q(question_id__in=question_ids, parent_answer_id__isnull=True)
+            | Q(parent_answer_id__question_id__in=question_ids)
+        ).order_by('id')
+        created, created_children, updated, deleted = _diff_answers(existing, question_ids, pairs)
+
+        deleted_count = 0
+        if deleted:
+            deleted_count, _ = Answer.objects.filter(id__in=[a.id for a in deleted]).delete()
+        if updated:
+            Answer.objects.bulk_update(updated, VALUE_FIELDS)
+        inserted = bulk_insert_answers(created)
+        if created_children:
+            Answer.objects.bulk_create(created_children)
+        if deleted or updated or created or created_children:
+            # Bulk writes bypass auto_now; keep the incremental export watermark moving
+            touch_sessions(id=survey_session_id)
+
+    return {
+        "created": inserted["answers"] + inserted["sub_answers"] + len(created_children),
+        "updated": len(updated),
+        "deleted": deleted_count,
+    }
+
+
+def save_question_answers(section, survey_session_id, question, data) -> Dict[str, int]:
+    """Store the session's answers to a single top-level question.
+
+    Used by autosave; answers to other questions are not read or written.
+    An empty submission clears the question.
+    """
+    values = data.getlist(question.code)
+    pairs = build_question_answers(section, survey_session_id, question, values) if values else []
+    return upsert_answers(survey_session_id, [question.id], pairs)
+
+
+def save_section_answers(section, survey_session_id, data) -> Dict[str, int]:
+    """Store the session's answers for section from the submitted data.
+
+    One read plus only the writes needed to reach the submitted state,
+    independent of how many features or properties were submitted.
+    """
+    pairs = build_section_answers(section, survey_session_id, data)
+    return upsert_answers(survey_session_id, [q.id for q in section.questions()], pairs)
+
+
+def _answer_values(answer) -> Optional[List[str]]:
+    """Return the stored value of a child answer as a feature property list."""
+    if answer['text'] is not None:
+        return [answer['text']]
+    if answer['numeric'] is not None:
+        return [str(answer['numeric'])]
+    if answer['selected_choices']:
+        return [str(c) for c in answer['selected_choices']]
+    return None
+
+
+def _initial_value(question, answer):
+    """Return the form initial value for a non-geo answer, or None."""
+    if question.input_type in ('text', 'text_line', 'datetime'):
+        return answer['text']
+    if question.input_type == 'number':
+        return answer['numeric']
+    if question.input_type in ('choice', 'rating'):
+        if answer['selected_choices']:
+            return str(answer['selected_choices'][0])
+        if answer['numeric'] is not None:
+            return str(int(answer['numeric']))
+        return None
+    if question.input_type == 'multichoice':
+        if answer['selected_choices']:
+            return [str(c) for c in answer['selected_choices']]
+        return None
+    if question.input_type == 'range':
+        if answer['numeric'] is not None:
+            return int(answer['numeric'])
+    return None
+
+
+def load_section_prefill(section, survey_session_id) -> Tuple[Dict[str, Any], Dict[str, list]]:
+    """Load a session's saved answers for section in a single query.
+
+    Top-level and child answers are fetched together; geometries are
+    serialised to GeoJSON by the database, so no GEOS objects are built.
+
+    Returns:
+        (initial, geo_features): form initial values keyed by question code,
+        and GeoJSON features keyed by geo question code.
+    """
+    questions = section.questions()
+    codes_by_id = {}
+    for question in questions:
+        codes_by_id[question.id] = question.code
+        for sub_question in question.subQuestions():
+            codes_by_id[sub_question.id] = sub_question.code
+    rows = Answer.objects.filter(
+        survey_session_id=survey_session_id,
+        question_id__in=list(codes_by_id),
+    ).annotate(
+        geojson=Coalesce(
+            AsGeoJSON('point', precision=GEOJSON_PRECISION),
+            AsGeoJSON('line', precision=GEOJSON_PRECISION),
+            AsGeoJSON('polygon', precision=GEOJSON_PRECISION),
+        ),
+    ).order_by('id').values(
+        'id', 'question_id', 'parent_answer_id', 'text', 'numeric', 'selected_choices', 'geojson',
+    )
+
+    answers_by_question = {}
+    children = {}
+    for row in rows:
+        if row['parent_answer_id'] is None:
+            answers_by_question.setdefault(row['question_id'], []).append(row)
+        else:
+            children.setdefault(row['parent_answer_id'], []).append(row)
+
+    initial = {}
+    geo_features = {}
+    for question in questions:
+        q_answers = answers_by_question.get(question.id)
+        if not q_answers:
+            continue
+
+        if question.input_type in GEO_INPUT_TYPES:
+            features = []
+            for answer in q_answers:
+                if answer['geojson'] is None:
+                    continue
+                properties = {'question_id': question.code}
+                for child in children.get(answer['id'], []):
+                    values = _answer_values(child)
+                    if values is not None:
+                        properties[codes_by_id[child['question_id']]] = values
+                features.append({
+                    'type': 'Feature',
+                    'geometry': json.loads(answer['geojson']),
+                    'properties': properties,
+                })
+            if features:
+                geo_features[question.code] = features
+        else:
+            value = _initial_value(question, q_answers[0])
+            if value is not None:
+                initial[question.code] = value
+
+    return initial, geo_features
@@ -0,0 +1,133 @@
+"""
+Cache of generated export archives.
+
+download_data and export_survey rebuild the whole archive on every request.
+Archives are instead kept in media storage as ExportCacheEntry rows keyed
+by survey, kind, mode, watermark and a cheap data version: the structure
+version, a hash of the survey header's own fields (which no version
+tracks), plus the count, max id and max updated_at of the survey's
+sessions. Answer writes bump SurveySession.updated_at (see survey.answers),
+so any change to the data gives a new key and old entries are never served.
+
+The key doubles as the response ETag; a request whose If-None-Match holds
+the current ETag gets a 304 without touching storage. Entries are evicted
+least recently used first once their total size exceeds
+EXPORT_CACHE_MAX_BYTES; a limit of 0 disables the cache.
+"""
+import hashlib
+import json
+import tempfile
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Sum
+from django.http import FileResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+
+from .models import ExportCacheEntry, Organization, SurveySession
+
+EXPORT_CACHE_MAX_BYTES = getattr(settings, 'SURVEY_EXPORT_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+
+
+def _header_version(survey) -> str:
+    """Hash the header fields and organization name that archives carry."""
+    fields = [(f.attname, getattr(survey, f.attname)) for f in survey._meta.concrete_fields]
+    organization = Organization.objects.filter(id=survey.organization_id).values_list('name', flat=True).first()
+    raw = json.dumps([fields, organization], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def data_version(survey) -> str:
+    """Return a string that changes whenever the survey's header, structure or responses change."""
+    sessions = SurveySession.objects.filter(survey=survey).aggregate(
+        count=Count('id'), last_id=Max('id'), updated_at=Max('updated_at'),
+    )
+    updated_at = sessions["updated_at"].isoformat() if sessions["updated_at"] else "-"
+    return (
+        f"{survey.structure_version}:{_header_version(survey)}:"
+        f"{sessions['count']}:{sessions['last_id'] or 0}:{updated_at}"
+    )
+
+
+def archive_key(survey, kind, mode, since="") -> str:
+    """Return the cache key, also used as ETag, of an archive of survey's current data."""
+    raw = f"{survey.id}:{kind}:{mode}:{since or ''}:{data_version(survey)}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def not_modified_response(request, key):
+    """Return a 304 response if the client already holds the archive with this key, else None."""
+    etag = quote_etag(key)
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response["ETag"] = etag
+    return response
+
+
+def get_cached_archive(key) -> Optional[ExportCacheEntry]:
+    """Return the cache entry for key and mark it as recently used, or None."""
+    entry = ExportCacheEntry.objects.filter(key=key).first()
+    if entry is not None:
+        ExportCacheEntry.objects.filter(id=entry.id).update(last_used_at=timezone.now())
+    return entry
+
+
+def cached_archive_response(entry, filename) -> FileResponse:
+    response = FileResponse(entry.file.open('rb'), as_attachment=True, filename=filename, content_type="application/zip")
+    response["ETag"] = quote_etag(entry.key)
+    return response
+
+
+def store_archive(survey, kind, mode, key, fileobj) -> Optional[ExportCacheEntry]:
+    """Save the archive in fileobj (positioned at its start) under key, then evict.
+
+    Returns None if the cache is disabled or another request stored the
+    same key first.
+    """
+    if EXPORT_CACHE_MAX_BYTES <= 0:
+        return None
+    entry = ExportCacheEntry(survey=survey, kind=kind, mode=mode, key=key)
+    entry.file.save(f"{key}.zip", File(fileobj), save=False)
+    entry.size = entry.file.size
+    try:
+        with transaction.atomic():
+            entry.save()
+    except IntegrityError:
+        entry.file.delete(save=False)
+        return None
+    evict_archives()
+    return entry
+
+
+def caching_stream(chunks: Iterable[bytes], survey, kind, mode, key) -> Iterator[bytes]:
+    """Yield chunks and keep a copy; the copy is cached once the last chunk is sent.
+
+    If the client disconnects the generator is closed early and nothing is
+    cached.
+    """
+    if EXPORT_CACHE_MAX_BYTES <= 0:
+        yield from chunks
+        return
+    with tempfile.TemporaryFile() as copy:
+        for chunk in chunks:
+            copy.write(chunk)
+            yield chunk
+        copy.seek(0)
+        store_archive(survey, kind, mode, key, copy)
+
+
+def evict_archives(max_bytes=None) -> int:
+    """Delete least recently used entries until the cache fits max_bytes; return how many."""
+    max_bytes = EXPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    total = ExportCacheEntry.objects.aggregate(total=Sum('size'))["total"] or 0
+    evicted = 0
+    for entry in ExportCacheEntry.objects.order_by('last_used_at', 'id').iterator():
+        if total <= max_bytes:
+            break
+        total -= entry.size
+        entry.delete()
+        evicted += 1
+    return evicted
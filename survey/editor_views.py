@@ -4,7 +4,7 @@ from django.contrib import messages
 from django.contrib.gis.geos import Point
 from django.db import transaction
 from django.db.models import Q, Max
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, Http404
 from django.views.decorators.clickjacking import xframe_options_sameorigin
 from django.utils import translation
 from django.views.decorators.http import require_POST
@@ -13,9 +13,12 @@ from .models import (
     SurveyHeader, SurveySection, SurveySectionTranslation,
     Question, QuestionTranslation, SurveyCollaborator,
     Membership, SURVEY_ROLE_CHOICES,
+    bump_structure_version, has_valid_positions, order_sections_by_links,
 )
 from .editor_forms import SurveyHeaderForm, SurveySectionForm, QuestionForm
 from .forms import SurveySectionAnswerForm
+from .snapshot import get_survey_snapshot
+from .fragments import get_subquestion_forms, get_question_block
 from .permissions import (
     org_permission_required, survey_permission_required,
     get_effective_survey_role,
@@ -23,32 +26,15 @@ from .permissions import (
 
 
 def _get_sections_ordered(survey):
-    """Return sections in linked-list order."""
-    sections = list(SurveySection.objects.filter(survey_header=survey))
-    if not sections:
-        return []
-
-    by_id = {s.id: s for s in sections}
-    head = None
-    for s in sections:
-        if s.is_head:
-            head = s
-            break
-    if head is None:
-        return sections  # fallback: unordered
-
-    ordered = []
-    current = head
-    visited = set()
-    while current and current.id not in visited:
-        ordered.append(current)
-        visited.add(current.id)
-        current = by_id.get(current.next_section_id)
-    # Append any orphaned sections
-    for s in sections:
-        if s.id not in visited:
-            ordered.append(s)
-    return ordered
+    """Return sections in linked-list order.
+
+    Uses the stored positions when they are consistent and falls back to
+    walking the next_section links otherwise.
+    """
+    sections = list(SurveySection.objects.filter(survey_header=survey).order_by('position', 'id'))
+    if has_valid_positions(sections):
+        return sections
+    return order_sections_by_links(sections)
 
 
 # ─── Survey creation ─────────────────────────────────────────────────────────
@@ -75,6 +61,7 @@ def editor_survey_create(request):
                 title='Section 1',
                 code='S1',
                 is_head=True,
+                position=1,
             )
             return redirect('editor_survey_detail', survey_uuid=survey.uuid)
     else:
@@ -104,7 +91,7 @@ def editor_survey_detail(request, survey_uuid):
             Question.objects.filter(
                 survey_section=current_section,
                 parent_question_id__isnull=True,
-            ).order_by('order_number')
+            ).order_by('order_number').prefetch_related('question_set__question_set')
         )
 
     can_edit = request.effective_survey_role in ('editor', 'owner')
@@ -127,7 +114,8 @@ def editor_survey_settings(request, survey_uuid):
     if request.method == 'POST':
         form = SurveyHeaderForm(request.POST, instance=survey)
         if form.is_valid():
-            form.save()
+            # Only the form's fields: structure_version may have moved since the survey was loaded
+            form.save(commit=False).save(update_fields=SurveyHeaderForm.Meta.fields)
             if request.headers.get('HX-Request'):
                 return HttpResponse(status=204, headers={'HX-Trigger': 'settingsSaved'})
             return redirect('editor_survey_detail', survey_uuid=survey.uuid)
@@ -167,6 +155,7 @@ def editor_section_create(request, survey_uuid):
         last.save(update_fields=['next_section'])
         section.prev_section = last
         section.save(update_fields=['prev_section'])
+    survey.renumber_sections()
 
     return render(request, 'editor/partials/section_list_item.html', {
         'section': section,
@@ -197,7 +186,7 @@ def editor_section_detail(request, survey_uuid, section_id):
         Question.objects.filter(
             survey_section=section,
             parent_question_id__isnull=True,
-        ).order_by('order_number')
+        ).order_by('order_number').prefetch_related('question_set__question_set')
     )
 
     return render(request, 'editor/partials/section_detail_form.html', {
@@ -245,6 +234,7 @@ def editor_section_delete(request, survey_uuid, section_id):
             next_sec.save(update_fields=['is_head'])
 
     section.delete()
+    survey.renumber_sections()
     response = HttpResponse('')
     response['HX-Trigger-After-Swap'] = 'sectionDeleted'
     return response
@@ -277,6 +267,7 @@ def editor_sections_reorder(request, survey_uuid):
             s.prev_section = sections.get(section_ids[i - 1]) if i > 0 else None
             s.next_section = sections.get(section_ids[i + 1]) if i < len(section_ids) - 1 else None
             s.save(update_fields=['is_head', 'prev_section', 'next_section'])
+        survey.renumber_sections()
 
     return HttpResponse(status=204)
 
@@ -377,7 +368,7 @@ def editor_question_preview(request, survey_uuid, question_id):
 
     # Build a form for the whole section, then keep only this question's field
     form = SurveySectionAnswerForm(
-        initial={}, section=question.survey_section, question=None,
+        initial={}, section=get_survey_snapshot(survey).section_by_id(question.survey_section_id), question=None,
         survey_session_id=None, language=lang,
     )
     for key in list(form.fields.keys()):
@@ -441,6 +432,8 @@ def editor_questions_reorder(request, survey_uuid):
             Question.objects.filter(
                 id=int(qid), survey_section__survey_header=survey
             ).update(order_number=i)
+        # Queryset updates bypass the post_save signal
+        bump_structure_version(pk=survey.pk)
 
     return HttpResponse(status=204)
 
@@ -512,7 +505,9 @@ def editor_section_map_picker(request, survey_uuid, section_id):
 @xframe_options_sameorigin
 def editor_section_preview(request, survey_uuid, section_name):
     survey = request.survey
-    section = get_object_or_404(SurveySection, survey_header=survey, name=section_name)
+    section = get_survey_snapshot(survey).section(section_name)
+    if section is None:
+        raise Http404
 
     selected_language = request.GET.get('lang')
     if selected_language and survey.available_languages and selected_language not in survey.available_languages:
@@ -524,13 +519,8 @@ def editor_section_preview(request, survey_uuid, section_name):
         initial={}, section=section, question=None,
         survey_session_id=None, language=selected_language,
     )
-
-    subquestions_forms = {}
-    for question in section.questions():
-        subquestions_forms[question.code] = SurveySectionAnswerForm(
-            initial={}, section=section, question=question,
-            survey_session_id=None, language=selected_language,
-        ).as_p()
+    subquestions_forms = get_subquestion_forms(section, selected_language, survey.structure_version)
+    question_block = get_question_block(section, selected_language, survey.structure_version)
 
     section_title = section.get_translated_title(selected_language)
     section_subheading = section.get_translated_subheading(selected_language)
@@ -541,6 +531,7 @@ def editor_section_preview(request, survey_uuid, section_name):
     response = render(request, 'survey_section.html', {
         'form': form,
         'subquestions_forms': subquestions_forms,
+        'question_block': question_block,
         'survey': survey,
         'section': section,
         'section_title': section_title,
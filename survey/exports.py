@@ -0,0 +1,444 @@
+"""
+Streaming data downloads.
+
+download_data (survey.views) sends a ZIP archive with one GeoJSON layer per
+geo question and a CSV table of the other answers. stream_zip builds the
+archive while the response is being sent. Members are generators of byte
+chunks, and the archive bytes are handed to the client every
+STREAM_CHUNK_SIZE bytes. Worker memory is therefore bounded by about one
+chunk, not by the size of the survey.
+
+Layers can also be sent as GeoPackage or FlatGeobuf files. These are written
+by GDAL's ogr2ogr from a temporary GeoJSONSeq file (see ogr_layer_files).
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Tuple
+
+import django
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.contrib.postgres.aggregates import JSONBAgg
+from django.db.models import FilteredRelation, Q
+from django.db.models.functions import JSONObject
+
+from .answers import GEOJSON_PRECISION
+from .models import Answer, Question, SurveySession, localize_choice_name
+from .pool import map_in_pool
+
+# Bytes collected from the ZIP writer before they are passed to the client
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Rows fetched per round trip by the server-side cursor of the CSV export
+CSV_FETCH_SIZE = 2000
+
+# Features fetched per round trip by the server-side cursor of a layer
+LAYER_FETCH_SIZE = 2000
+
+# Question types that get a CSV column; the others carry no tabular value
+CSV_INPUT_TYPES = ('text', 'text_line', 'number', 'range', 'choice', 'rating', 'multichoice')
+
+# Formats of the geo layers in a data download
+DATA_FORMATS = ("geojson", "gpkg", "fgb")
+
+# format -> (OGR driver, file extension, layer creation options)
+OGR_FORMATS = {
+    "gpkg": ("GPKG", "gpkg", ()),
+    "fgb": ("FlatGeobuf", "fgb", ("-lco", "SPATIAL_INDEX=YES")),
+}
+
+OGR2OGR = getattr(settings, 'SURVEY_OGR2OGR', 'ogr2ogr')
+
+# Features written per transaction by ogr2ogr
+OGR_TRANSACTION_SIZE = 20000
+
+# Django 5.2 renamed the ordering argument of ordered aggregates to order_by
+AGGREGATE_ORDER_ARG = 'order_by' if django.VERSION >= (5, 2) else 'ordering'
+
+LAYER_CRS = {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}}
+
+
+class GeoExportError(Exception):
+    """Raised when geo layers cannot be converted to the requested format."""
+    pass
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, unseekable sink that ZipFile writes into and stream_zip drains."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def stream_zip(members: Iterable[Tuple[str, Iterable[bytes]]]) -> Iterator[bytes]:
+    """Yield a ZIP archive built from (name, chunks) members, chunk by chunk.
+
+    Members and their chunks are consumed lazily, so they may run queries
+    while the archive is being sent.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in members:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 0  # Windows bug fix
+            with archive.open(info, "w", force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    if buffer.size >= STREAM_CHUNK_SIZE:
+                        yield buffer.drain()
+    yield buffer.drain()
+
+
+def _json(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf8")
+
+
+def geojson_collection_chunks(name, properties, features: Iterable[bytes]) -> Iterator[bytes]:
+    """Yield a FeatureCollection document around already encoded features."""
+    yield (
+        b'{"type": "FeatureCollection", "name": ' + _json(name)
+        + b', "crs": ' + _json(LAYER_CRS)
+        + b', "properties": ' + _json(properties)
+        + b', "features": ['
+    )
+    for index, feature in enumerate(features):
+        yield (b", " if index else b"") + feature
+    yield b"]}"
+
+
+def _sub_answer_value(sub_question, choice_names, child):
+    """Format a sub-answer as a layer property value."""
+    input_type = sub_question.input_type
+    if input_type in ("text", "text_line"):
+        return child["text"]
+    if input_type in ("number", "range"):
+        return child["numeric"]
+    names = [choice_names.get(code, str(code)) for code in (child["choices"] or [])]
+    if input_type in ("choice", "rating"):
+        return names[0] if names else ""
+    if input_type == "multichoice":
+        return names
+    return ""
+
+
+def _layer_properties(question):
+    return {
+        "survey": question.survey_section.survey_header.name,
+        "survey_section": question.survey_section.name,
+        "required": question.required,
+    }
+
+
+def geo_layer_features(question, sub_questions) -> Iterator[bytes]:
+    """Yield the encoded GeoJSON features of a geo question from a single query.
+
+    PostGIS renders each geometry (ST_AsGeoJSON) and aggregates the
+    feature's sub-answers into a JSON array, so no GEOS objects are built
+    and no query runs per feature. Rows are read through a server-side
+    cursor and the geometry text is spliced into the output as is.
+
+    Args:
+        question: Geo question, with survey_section and survey_header loaded
+        sub_questions: The question's sub-questions in display order
+    """
+    choice_names = {
+        q.id: {c["code"]: localize_choice_name(c["name"], None) for c in (q.choices or [])}
+        for q in sub_questions
+    }
+    rows = Answer.objects.filter(
+        question=question,
+        parent_answer_id__isnull=True,
+    ).annotate(
+        geometry=AsGeoJSON(question.input_type, precision=GEOJSON_PRECISION),
+        children=JSONBAgg(
+            JSONObject(
+                question_id='answer__question_id',
+                text='answer__text',
+                numeric='answer__numeric',
+                choices='answer__selected_choices',
+            ),
+            filter=Q(answer__id__isnull=False),
+            default=None,
+            **{AGGREGATE_ORDER_ARG: 'answer__id'},
+        ),
+    ).order_by('id').values_list(
+        'survey_session_id', 'geometry', 'children',
+    ).iterator(chunk_size=LAYER_FETCH_SIZE)
+
+    for session_id, geometry, children in rows:
+        if geometry is None:
+            continue
+        first_child = {}
+        for child in children or []:
+            first_child.setdefault(child["question_id"], child)
+        properties = {}
+        for sub_question in sub_questions:
+            child = first_child.get(sub_question.id)
+            properties[sub_question.name] = (
+                _sub_answer_value(sub_question, choice_names[sub_question.id], child) if child else ""
+            )
+        properties["session"] = f"SurveySession object ({session_id})"
+        yield (
+            b'{"type": "Feature", "properties": ' + _json(properties)
+            + b', "geometry": ' + geometry.encode("utf8") + b'}'
+        )
+
+
+def geo_layer_chunks(question, sub_questions) -> Iterator[bytes]:
+    """Yield the GeoJSON layer of a geo question (see geo_layer_features)."""
+    return geojson_collection_chunks(
+        question.name, _layer_properties(question), geo_layer_features(question, sub_questions),
+    )
+
+
+def _file_chunks(path) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _write_feature_sequence(path, features: Iterable[bytes]) -> int:
+    """Write features as GeoJSONSeq, one per line; return how many were written."""
+    count = 0
+    with open(path, "wb") as f:
+        for feature in features:
+            f.write(feature + b"\n")
+            count += 1
+    return count
+
+
+def ogr_available() -> bool:
+    """Return True if ogr2ogr can be run for the GeoPackage and FlatGeobuf formats."""
+    return shutil.which(OGR2OGR) is not None
+
+
+def _run_ogr2ogr(driver, target, source, layer_name, update, options):
+    command = [OGR2OGR, "-f", driver]
+    if update:
+        command.append("-update")
+    command += [
+        target, source,
+        "-nln", layer_name,
+        "-a_srs", "EPSG:4326",
+        "-gt", str(OGR_TRANSACTION_SIZE),
+    ] + list(options)
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except FileNotFoundError:
+        raise GeoExportError(f"{OGR2OGR} is not installed")
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.decode("utf8", "replace").strip()
+        raise GeoExportError(f"{OGR2OGR} failed for layer '{layer_name}': {message}")
+
+
+def _write_layer_source(task) -> int:
+    """Write the features of one geo question to a GeoJSONSeq file; runs in pool workers."""
+    question_id, path = task
+    question = Question.objects.select_related('survey_section__survey_header').get(id=question_id)
+    sub_questions = list(Question.objects.filter(parent_question_id=question_id).order_by('order_number', 'id'))
+    return _write_feature_sequence(path, geo_layer_features(question, sub_questions))
+
+
+def ogr_layer_files(survey, fmt, directory, workers=1) -> List[Tuple[str, str]]:
+    """Convert the geo layers of survey into fmt files inside directory.
+
+    Features are streamed from the database into one GeoJSONSeq file per
+    layer, and ogr2ogr commits them OGR_TRANSACTION_SIZE at a time; no
+    layer is held in memory. GeoPackage puts every layer into one file;
+    FlatGeobuf writes one file per layer with a packed Hilbert R-tree.
+    Layers without features are left out.
+
+    With workers > 1 the layers are read from the database in a process
+    pool and FlatGeobuf files are converted concurrently; GeoPackage layers
+    share a file and are always added one after another. Output does not
+    depend on workers.
+
+    Returns:
+        (archive name, filesystem path) of the written files
+    """
+    driver, extension, options = OGR_FORMATS[fmt]
+    questions = list(survey.geo_questions().order_by('id'))
+    sources = [os.path.join(directory, f"layer-{index}.geojsonl") for index in range(len(questions))]
+    counts = list(map_in_pool(_write_layer_source, [(q.id, path) for q, path in zip(questions, sources)], workers))
+
+    # OGR layer and file names must be unique within the export
+    layers = []
+    layer_names = set()
+    for question, source, count in zip(questions, sources, counts):
+        if not count:
+            continue
+        layer_name = question.name
+        suffix = 1
+        while layer_name in layer_names:
+            suffix += 1
+            layer_name = f"{question.name}_{suffix}"
+        layer_names.add(layer_name)
+        layers.append((layer_name, source))
+
+    if fmt == "gpkg":
+        target = os.path.join(directory, f"layers.{extension}")
+        for index, (layer_name, source) in enumerate(layers):
+            _run_ogr2ogr(driver, target, source, layer_name, index > 0, options)
+        files = [(f"{survey.name}.{extension}", target)] if layers else []
+    else:
+        files = [
+            (f"{layer_name}.{extension}", os.path.join(directory, f"{index}.{extension}"))
+            for index, (layer_name, _) in enumerate(layers)
+        ]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            conversions = [
+                pool.submit(_run_ogr2ogr, driver, path, source, layer_name, False, options)
+                for (_, path), (layer_name, source) in zip(files, layers)
+            ]
+            for conversion in conversions:
+                conversion.result()
+
+    for source in sources:
+        if os.path.exists(source):
+            os.remove(source)
+    return files
+
+
+def _csv_value(question, choice_names, text, numeric, selected_choices):
+    """Format one answer the way the CSV has always shown it."""
+    input_type = question.input_type
+    if input_type in ("text", "text_line"):
+        return text
+    if input_type in ("number", "range"):
+        return numeric
+    names = [choice_names.get(code, str(code)) for code in (selected_choices or [])]
+    if input_type in ("choice", "rating"):
+        return names[0] if names else ""
+    return names
+
+
+def sessions_csv_chunks(survey) -> Iterator[bytes]:
+    """Yield the CSV table with one row per session and one column per question.
+
+    Sessions and their top-level answers come from one ordered query that
+    pivots rows per session in a single server-side cursor pass. Geometry
+    columns are never loaded, and only one session's row is held in memory.
+    """
+    questions = list(Question.objects.filter(
+        survey_section__survey_header=survey,
+        parent_question_id__isnull=True,
+        input_type__in=CSV_INPUT_TYPES,
+    ).order_by('survey_section__position', 'survey_section_id', 'order_number', 'id'))
+    by_id = {q.id: q for q in questions}
+    choice_names = {
+        q.id: {c["code"]: localize_choice_name(c["name"], None) for c in (q.choices or [])}
+        for q in questions
+    }
+    columns = list(dict.fromkeys(q.name for q in questions))
+
+    sessions = SurveySession.objects.filter(survey=survey)
+    if by_id:
+        rows = sessions.annotate(
+            top_answer=FilteredRelation(
+                'answer',
+                condition=Q(answer__parent_answer_id__isnull=True, answer__question_id__in=list(by_id)),
+            ),
+        ).order_by('id', 'top_answer__id').values_list(
+            'id', 'start_datetime',
+            'top_answer__question_id', 'top_answer__text', 'top_answer__numeric', 'top_answer__selected_choices',
+        ).iterator(chunk_size=CSV_FETCH_SIZE)
+    else:
+        rows = (
+            (session_id, start_datetime, None, None, None, None)
+            for session_id, start_datetime in sessions.order_by('id').values_list(
+                'id', 'start_datetime',
+            ).iterator(chunk_size=CSV_FETCH_SIZE)
+        )
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([""] + columns + ["session", "datetime"])
+
+    def session_row(index, session_id, start_datetime, values):
+        # The session column keeps the str() of the model used by earlier exports
+        session_label = f"SurveySession object ({session_id})"
+        return [index] + [values.get(c, "") for c in columns] + [session_label, start_datetime]
+
+    index = 0
+    current = None
+    for session_id, start_datetime, question_id, text, numeric, selected_choices in rows:
+        if current is None or current[0] != session_id:
+            if current is not None:
+                writer.writerow(session_row(index, *current))
+                index += 1
+                if buffer.tell() >= STREAM_CHUNK_SIZE:
+                    yield buffer.getvalue().encode("utf8")
+                    buffer.seek(0)
+                    buffer.truncate()
+            current = (session_id, start_datetime, {})
+        if question_id is not None:
+            question = by_id[question_id]
+            current[2][question.name] = _csv_value(
+                question, choice_names[question_id], text, numeric, selected_choices,
+            )
+    if current is not None:
+        writer.writerow(session_row(index, *current))
+    yield buffer.getvalue().encode("utf8")
+
+
+def geo_layers(survey) -> Iterator[Tuple[Question, List[Question]]]:
+    """Yield (geo question, sub-questions) pairs of survey in two queries."""
+    geo_questions = list(
+        survey.geo_questions().select_related('survey_section__survey_header').order_by('id')
+    )
+    sub_questions = {}
+    for sub_question in Question.objects.filter(
+        parent_question_id__in=[q.id for q in geo_questions],
+    ).order_by('order_number', 'id'):
+        sub_questions.setdefault(sub_question.parent_question_id_id, []).append(sub_question)
+
+    for question in geo_questions:
+        yield question, sub_questions.get(question.id, [])
+
+
+def survey_data_members(survey, fmt="geojson", workers=1) -> Iterator[Tuple[str, Iterable[bytes]]]:
+    """Yield the (name, chunks) members of a survey data download.
+
+    With fmt 'gpkg' or 'fgb' the layers are converted in a temporary
+    directory that is removed once the members have been consumed, using
+    up to workers processes (see ogr_layer_files).
+    """
+    if fmt not in DATA_FORMATS:
+        raise GeoExportError(f"Invalid data format '{fmt}'. Must be one of: {', '.join(DATA_FORMATS)}")
+
+    if fmt == "geojson":
+        for question, sub_questions in geo_layers(survey):
+            yield question.name + ".geojson", geo_layer_chunks(question, sub_questions)
+    else:
+        with tempfile.TemporaryDirectory(prefix="survey-export-") as directory:
+            for name, path in ogr_layer_files(survey, fmt, directory, workers):
+                yield name, _file_chunks(path)
+    yield survey.name + ".csv", sessions_csv_chunks(survey)
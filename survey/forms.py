@@ -191,6 +191,8 @@ class SurveySectionAnswerForm(forms.Form):
     
 
     def __init__(self, initial, section, question, survey_session_id, language=None, *args, **kwargs):
+        # section/question may be model instances or their read-only
+        # counterparts from survey.snapshot; both expose the same helpers.
         super().__init__(*args, initial=initial, **kwargs)
 
         section = section
@@ -210,7 +212,7 @@ class SurveySectionAnswerForm(forms.Form):
             field_sublabel = question.get_translated_subtext(language) if question.subtext else ""
             field_color = question.color
             field_icon_class = question.icon_class
-            image_source = question.image.url if question.image else None
+            image_source = question.image_url
 
             self.fields[field_name] = self._get_form_from_input_type(question.input_type, question.required, question, field_label, field_sublabel, field_color, field_icon_class, image_source, language)
             self.fields[field_name].widget.question_type = question.input_type
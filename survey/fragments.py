@@ -0,0 +1,88 @@
+"""
+Rendered HTML fragments for survey sections.
+
+The sub-question popup forms and the question block of survey_section.html
+depend only on a section's structure and the respondent language, so they
+are rendered once and kept in Django's cache. Keys include
+SurveyHeader.structure_version: every editor change to sections, questions
+or their translations bumps the version (see survey.signals), which makes
+the old entries unreachable; they expire after FRAGMENT_CACHE_TIMEOUT.
+
+Hit and miss counters are kept per process (see fragment_cache_stats) and
+every lookup is logged with them at DEBUG level on the survey.fragments
+logger.
+"""
+import logging
+import threading
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .forms import SurveySectionAnswerForm
+
+logger = logging.getLogger(__name__)
+
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'SURVEY_FRAGMENT_CACHE_TIMEOUT', 60 * 60)
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _fragment_key(kind, section, language, version) -> str:
+    return f"survey:fragment:{kind}:{section.id}:{language or '-'}:{version}"
+
+
+def _cached(kind, section, language, version, build):
+    key = _fragment_key(kind, section, language, version)
+    value = cache.get(key)
+    outcome = "hit" if value is not None else "miss"
+    with _stats_lock:
+        _stats[outcome + "s"] += 1
+        hits, misses = _stats["hits"], _stats["misses"]
+    logger.debug("Fragment cache %s for %s (hits=%d, misses=%d)", outcome, key, hits, misses)
+    if value is None:
+        value = build()
+        cache.set(key, value, FRAGMENT_CACHE_TIMEOUT)
+    return value
+
+
+def get_subquestion_forms(section, language, version) -> Dict[str, str]:
+    """Return the rendered popup form of every top-level question, keyed by code.
+
+    Questions without sub-questions map to an empty string, as before.
+    """
+    def build():
+        return {
+            question.code: str(SurveySectionAnswerForm(
+                initial={}, section=section, question=question,
+                survey_session_id=None, language=language,
+            ).as_p())
+            for question in section.questions()
+        }
+    return _cached("subquestions", section, language, version, build)
+
+
+def get_question_block(section, language, version) -> str:
+    """Return the rendered visible fields of an unfilled section form."""
+    def build():
+        form = SurveySectionAnswerForm(
+            initial={}, section=section, question=None,
+            survey_session_id=None, language=language,
+        )
+        return str(render_to_string('survey_section_questions.html', {'form': form}))
+    return mark_safe(_cached("questions", section, language, version, build))
+
+
+def fragment_cache_stats() -> Dict[str, int]:
+    """Return the hit/miss counters of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_fragment_cache_stats() -> None:
+    with _stats_lock:
+        _stats["hits"] = 0
+        _stats["misses"] = 0
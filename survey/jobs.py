@@ -0,0 +1,191 @@
+"""
+Background export jobs.
+
+export_survey and download_data build large archives outside the request:
+for surveys with more than EXPORT_SYNC_MAX_ANSWERS answers they queue an
+ExportJob and return at once. The editor can also queue jobs explicitly and
+poll their progress (see survey.views.export_job_create/export_job_status).
+
+Jobs are run by a worker process (manage.py run_export_worker). It claims
+queued jobs with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can
+share the queue, and runs at most EXPORT_JOBS_PER_ORGANIZATION jobs of one
+organization at a time. The archive is written to a temporary file and
+saved through the default storage as the job's artifact; it is also stored
+in the archive cache (see survey.archive_cache), so the next request for
+the same unchanged data is served from there instead of queueing another
+job. Requesting an export that is already queued or running returns that
+job. Finished jobs and their artifacts are deleted by the worker after
+EXPORT_JOB_RETENTION.
+"""
+import logging
+import tempfile
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .archive_cache import archive_key, store_archive
+from .exports import GeoExportError, stream_zip, survey_data_members
+from .models import Answer, ExportJob, Organization
+from .serialization import ExportError, export_survey_to_zip, parse_watermark
+
+logger = logging.getLogger(__name__)
+
+# Surveys with more answers than this are exported by the worker
+EXPORT_SYNC_MAX_ANSWERS = getattr(settings, 'SURVEY_EXPORT_SYNC_MAX_ANSWERS', 20000)
+
+# Jobs of one organization that may run at the same time
+EXPORT_JOBS_PER_ORGANIZATION = getattr(settings, 'SURVEY_EXPORT_JOBS_PER_ORGANIZATION', 2)
+
+# Running jobs older than this are taken to belong to a dead worker
+EXPORT_JOB_TIMEOUT = timedelta(seconds=getattr(settings, 'SURVEY_EXPORT_JOB_TIMEOUT', 6 * 60 * 60))
+
+# Finished and failed jobs are deleted, with their artifacts, after this
+EXPORT_JOB_RETENTION = timedelta(seconds=getattr(settings, 'SURVEY_EXPORT_JOB_RETENTION', 7 * 24 * 60 * 60))
+
+
+def should_run_in_background(survey) -> bool:
+    """Return True if survey is too large to export within a request."""
+    answers = Answer.objects.filter(survey_session__survey=survey)
+    return answers[:EXPORT_SYNC_MAX_ANSWERS + 1].count() > EXPORT_SYNC_MAX_ANSWERS
+
+
+def enqueue_export(survey, user, kind, mode, since="") -> ExportJob:
+    """Queue an export of survey; kind is 'archive' (export_survey) or 'data' (download_data).
+
+    If the same export is already queued or running, that job is returned
+    instead of queueing the work again.
+    """
+    pending = ExportJob.objects.filter(
+        survey=survey, kind=kind, mode=mode, since=since or "", status__in=("queued", "running"),
+    ).order_by('created_at', 'id').first()
+    if pending is not None:
+        return pending
+    return ExportJob.objects.create(
+        survey=survey,
+        organization_id=survey.organization_id,
+        requested_by=user if user is not None and user.is_authenticated else None,
+        kind=kind,
+        mode=mode,
+        since=since or "",
+    )
+
+
+def fail_stale_jobs() -> int:
+    """Mark running jobs older than EXPORT_JOB_TIMEOUT as failed; return how many."""
+    return ExportJob.objects.filter(
+        status="running",
+        started_at__lt=timezone.now() - EXPORT_JOB_TIMEOUT,
+    ).update(status="failed", error="The export worker stopped", finished_at=timezone.now())
+
+
+def purge_finished_jobs() -> int:
+    """Delete finished and failed jobs older than EXPORT_JOB_RETENTION; return how many."""
+    deleted, _ = ExportJob.objects.filter(
+        status__in=("done", "failed"),
+        finished_at__lt=timezone.now() - EXPORT_JOB_RETENTION,
+    ).delete()
+    return deleted
+
+
+def claim_next_job() -> Optional[ExportJob]:
+    """Take the oldest queued job whose organization is below its concurrency limit."""
+    with transaction.atomic():
+        busy = [
+            organization_id
+            for organization_id, running in ExportJob.objects.filter(status="running").values_list(
+                'organization_id',
+            ).annotate(running=Count('id'))
+            if running >= EXPORT_JOBS_PER_ORGANIZATION
+        ]
+        while True:
+            job = ExportJob.objects.select_for_update(skip_locked=True).filter(
+                status="queued",
+            ).exclude(organization_id__in=busy).order_by('created_at', 'id').first()
+            if job is None:
+                return None
+
+            # Workers claiming jobs of the same organization are serialized on its
+            # row, so the limit holds even when they race; an organization that
+            # filled up meanwhile is skipped in favour of the next candidate
+            Organization.objects.select_for_update().get(id=job.organization_id)
+            running = ExportJob.objects.filter(organization_id=job.organization_id, status="running").count()
+            if running < EXPORT_JOBS_PER_ORGANIZATION:
+                break
+            busy.append(job.organization_id)
+
+        job.status = "running"
+        job.progress = 0
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'progress', 'started_at'])
+    return job
+
+
+def _progress_reporter(job) -> Callable[[int, int], None]:
+    """Return a (done, total) callback that stores the job's percentage when it changes."""
+    def report(done, total):
+        percent = min(99, done * 100 // total) if total else 0
+        if percent != job.progress:
+            job.progress = percent
+            ExportJob.objects.filter(id=job.id).update(progress=percent)
+    return report
+
+
+def _write_data_archive(job, output, report):
+    survey = job.survey
+    total = survey.geo_questions().count() + 1
+
+    def members():
+        for index, member in enumerate(survey_data_members(survey, job.mode)):
+            report(index, total)
+            yield member
+
+    for chunk in stream_zip(members()):
+        output.write(chunk)
+
+
+def run_job(job) -> ExportJob:
+    """Build the job's archive and store it as the artifact; failures are recorded on the job."""
+    report = _progress_reporter(job)
+    # Taken before the archive is built, like the views do, so data written
+    # meanwhile gives a newer key
+    key = archive_key(job.survey, job.kind, job.mode, job.since)
+    try:
+        with tempfile.TemporaryFile() as output:
+            if job.kind == "data":
+                _write_data_archive(job, output, report)
+            else:
+                since = parse_watermark(job.since) if job.since else None
+                export_survey_to_zip(job.survey, output, job.mode, since, progress=report)
+            output.seek(0)
+            job.artifact.save(job.filename, File(output), save=False)
+            output.seek(0)
+            store_archive(job.survey, job.kind, job.mode, key, output)
+        job.status = "done"
+        job.progress = 100
+    except (ExportError, GeoExportError) as e:
+        job.status = "failed"
+        job.error = str(e)
+    except Exception as e:
+        logger.exception("Export job %s failed", job.id)
+        job.status = "failed"
+        job.error = f"Unexpected error: {e}"
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'error', 'artifact', 'finished_at'])
+    return job
+
+
+def job_status(job) -> dict:
+    """Return the JSON payload of the progress endpoint."""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "mode": job.mode,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error,
+    }
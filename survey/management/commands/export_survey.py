@@ -2,7 +2,7 @@
 Django management command to export a survey to ZIP archive.
 
 Usage:
-    python manage.py export_survey <survey_name_or_uuid> [--mode=structure|data|full] [--output=file.zip]
+    python manage.py export_survey <survey_name_or_uuid> [--mode=structure|data|full|gpkg|fgb] [--since=WATERMARK] [--workers=N] [--output=file.zip]
 """
 import sys
 import uuid as uuid_mod
@@ -10,7 +10,7 @@ import uuid as uuid_mod
 from django.core.management.base import BaseCommand, CommandError
 
 from survey.models import SurveyHeader
-from survey.serialization import export_survey_to_zip, EXPORT_MODES, ExportError
+from survey.serialization import export_survey_to_zip, parse_watermark, EXPORT_MODES, ExportError
 
 
 class Command(BaseCommand):
@@ -27,7 +27,24 @@ class Command(BaseCommand):
             type=str,
             choices=EXPORT_MODES,
             default='structure',
-            help='Export mode: structure (default), data, or full'
+            help='Export mode: structure (default), data, full, '
+                 'or gpkg/fgb for GeoPackage/FlatGeobuf layers (needs ogr2ogr)'
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            default=None,
+            help='Incremental export: only sessions after this session id or ISO 8601 '
+                 'timestamp (data and full modes). A session id only picks up new sessions; '
+                 'a timestamp also picks up edited ones. The new watermark is stored in the responses header; '
+                 'a timestamp watermark overlaps the previous pull, so some sessions are exported again '
+                 '(the import matches them by uuid).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes used to serialize session ranges and GIS layers (default: 1)'
         )
         parser.add_argument(
             '--output',
@@ -60,16 +77,21 @@ class Command(BaseCommand):
 
         # Export
         try:
+            since = parse_watermark(options['since']) if options['since'] else None
+            workers = options['workers']
+            if workers < 1:
+                raise CommandError("--workers must be at least 1")
+
             if output_path:
                 with open(output_path, 'wb') as f:
-                    warnings = export_survey_to_zip(survey, f, mode)
+                    warnings = export_survey_to_zip(survey, f, mode, since, workers=workers)
 
                 self.stdout.write(
                     self.style.SUCCESS(f"Survey '{survey.name}' exported to {output_path}")
                 )
             else:
                 # Output to stdout (binary mode)
-                warnings = export_survey_to_zip(survey, sys.stdout.buffer, mode)
+                warnings = export_survey_to_zip(survey, sys.stdout.buffer, mode, since, workers=workers)
 
             # Show warnings
             for warning in warnings:
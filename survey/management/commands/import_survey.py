@@ -2,8 +2,12 @@
 Django management command to import a survey from ZIP archive.
 
 Usage:
-    python manage.py import_survey <file.zip>
+    python manage.py import_survey <file.zip> [--chunk-size=N] [--resume] [--update-existing]
     cat file.zip | python manage.py import_survey -
+
+With --chunk-size responses are committed every N sessions and the progress
+is checkpointed; --resume continues an interrupted import of the same file.
+Sessions already imported (same uuid) are skipped unless --update-existing.
 """
 import sys
 import os
@@ -29,10 +33,40 @@ class Command(BaseCommand):
             default=None,
             help='Organization name or slug to assign the imported survey to'
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Commit responses every N sessions and record a checkpoint'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue the interrupted checkpointed import of this file, if any'
+        )
+        parser.add_argument(
+            '--update-existing',
+            action='store_true',
+            help='Replace sessions that were imported before (matched by uuid) instead of skipping them'
+        )
+
+    def _report_progress(self, done, total):
+        # Called once per batch of sessions
+        if total:
+            self.stderr.write(f"Imported {done}/{total} sessions")
+        else:
+            self.stderr.write(f"Imported {done} sessions")
 
     def handle(self, *args, **options):
         file_path = options['file']
 
+        chunk_size = options['chunk_size']
+        if chunk_size is not None and chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        # Checkpoints are keyed by a hash of the archive, which stdin cannot be reread for
+        if file_path == '-' and (options['resume'] or chunk_size is not None):
+            raise CommandError("--chunk-size and --resume need a file, not stdin")
+
         # Resolve organization
         org = None
         org_name = options.get('organization')
@@ -61,7 +95,14 @@ class Command(BaseCommand):
 
         # Import
         try:
-            survey, warnings = import_survey_from_zip(input_file, organization=org)
+            survey, warnings = import_survey_from_zip(
+                input_file,
+                organization=org,
+                progress=self._report_progress if options['verbosity'] >= 1 else None,
+                chunk_size=chunk_size,
+                resume=options['resume'],
+                update_existing=options['update_existing'],
+            )
 
             # Show warnings
             for warning in warnings:
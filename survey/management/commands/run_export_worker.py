@@ -0,0 +1,56 @@
+"""
+Django management command that runs queued export jobs.
+
+Usage:
+    python manage.py run_export_worker [--once] [--poll=SECONDS]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from survey.jobs import claim_next_job, fail_stale_jobs, purge_finished_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued survey export jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no job can be claimed instead of polling'
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls of an empty queue (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        stale = fail_stale_jobs()
+        if stale:
+            self.stderr.write(self.style.WARNING(f"Marked {stale} stale job(s) as failed"))
+        purged = purge_finished_jobs()
+        if purged:
+            self.stdout.write(f"Deleted {purged} old job(s)")
+
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll'])
+                    fail_stale_jobs()
+                    purge_finished_jobs()
+                    continue
+
+                self.stdout.write(f"Running export job {job.id} ({job.survey.name} {job.kind}/{job.mode})")
+                run_job(job)
+                if job.status == "done":
+                    self.stdout.write(self.style.SUCCESS(f"Export job {job.id} done: {job.artifact.name}"))
+                else:
+                    self.stderr.write(self.style.ERROR(f"Export job {job.id} failed: {job.error}"))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0014_finalize_org_slug_nonnull'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surveyheader',
+            name='structure_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Incremented on every change to sections, questions or their translations'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0015_surveyheader_structure_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surveysection',
+            name='position',
+            field=models.PositiveIntegerField(default=0, help_text='1-based order in the survey, kept in sync with next/prev links; 0 if unknown'),
+        ),
+    ]
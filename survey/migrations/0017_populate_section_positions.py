@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def populate_positions(apps, schema_editor):
+    SurveySection = apps.get_model('survey', 'SurveySection')
+    sections_by_survey = {}
+    for section in SurveySection.objects.order_by('id'):
+        sections_by_survey.setdefault(section.survey_header_id, []).append(section)
+
+    for sections in sections_by_survey.values():
+        by_id = {s.id: s for s in sections}
+        ordered = []
+        visited = set()
+        current = next((s for s in sections if s.is_head), None)
+        while current is not None and current.id not in visited:
+            ordered.append(current)
+            visited.add(current.id)
+            current = by_id.get(current.next_section_id)
+        ordered.extend(s for s in sections if s.id not in visited)
+
+        for position, section in enumerate(ordered, start=1):
+            section.position = position
+        SurveySection.objects.bulk_update(ordered, ['position'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0016_surveysection_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_positions, migrations.RunPython.noop),
+    ]
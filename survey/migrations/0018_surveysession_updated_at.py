@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def populate_updated_at(apps, schema_editor):
+    SurveySession = apps.get_model('survey', 'SurveySession')
+    SurveySession.objects.update(updated_at=Coalesce('end_datetime', 'start_datetime'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0017_populate_section_positions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surveysession',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Last change to the session or its answers; incremental export watermark'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='surveysession',
+            index=models.Index(fields=['survey', 'updated_at'], name='survey_session_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0019_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportCacheEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Hash of survey, kind, mode and data version', max_length=64, unique=True)),
+                ('kind', models.CharField(choices=[('archive', 'Survey archive'), ('data', 'Data download')], max_length=10)),
+                ('mode', models.CharField(max_length=20)),
+                ('file', models.FileField(upload_to='export-cache/')),
+                ('size', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_cache_entries', to='survey.surveyheader')),
+            ],
+            options={
+                'verbose_name_plural': 'export cache entries',
+            },
+        ),
+    ]
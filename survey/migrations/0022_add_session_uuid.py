@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0021_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surveysession',
+            name='uuid',
+            field=models.UUIDField(null=True, editable=False),
+        ),
+    ]
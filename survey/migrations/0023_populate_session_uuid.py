@@ -0,0 +1,19 @@
+from django.contrib.postgres.functions import RandomUUID
+from django.db import migrations
+
+
+def populate_uuids(apps, schema_editor):
+    # One UPDATE instead of a save per session
+    SurveySession = apps.get_model('survey', 'SurveySession')
+    SurveySession.objects.filter(uuid__isnull=True).update(uuid=RandomUUID())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0022_add_session_uuid'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_uuids, migrations.RunPython.noop),
+    ]
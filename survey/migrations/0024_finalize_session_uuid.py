@@ -0,0 +1,18 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0023_populate_session_uuid'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='surveysession',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, help_text='Stable identity across exports and imports', unique=True),
+        ),
+    ]
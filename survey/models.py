@@ -1,3 +1,4 @@
+import functools
 import uuid
 
 from django.conf import settings
@@ -7,7 +8,7 @@ from django.contrib.gis.geos import Point
 from datetime import datetime
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q
+from django.db.models import Q, F
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator, BaseValidator
 from django.utils.text import slugify
@@ -83,19 +84,55 @@ INPUT_TYPE_CHOICES = (
     ("html", _("HTML")),
 )
 
-class SurveySession(models.Model):
+def memoized_helper(method):
+    """Cache a zero-argument helper's result on the instance.
+
+    The cache lives until invalidate_helper_cache() or refresh_from_db().
+    """
+    @functools.wraps(method)
+    def wrapper(self):
+        cache = self.__dict__.setdefault('_helper_cache', {})
+        if method.__name__ not in cache:
+            cache[method.__name__] = method(self)
+        return cache[method.__name__]
+    return wrapper
+
+
+class HelperCacheMixin:
+    """Explicit invalidation and prefetch lookup for @memoized_helper methods."""
+
+    def invalidate_helper_cache(self):
+        self.__dict__.pop('_helper_cache', None)
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.invalidate_helper_cache()
+        super().refresh_from_db(*args, **kwargs)
+
+    def _prefetched(self, related_name):
+        """Rows loaded by prefetch_related(related_name), or None."""
+        return getattr(self, '_prefetched_objects_cache', {}).get(related_name)
+
+
+class SurveySession(HelperCacheMixin, models.Model):
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, help_text=_('Stable identity across exports and imports'))
     survey = models.ForeignKey("SurveyHeader", on_delete=models.CASCADE)
     start_datetime = models.DateTimeField(default=datetime.now)
     end_datetime = models.DateTimeField(null=True, blank=True)
     language = models.CharField(max_length=10, null=True, blank=True, help_text=_('Selected language code (ISO 639-1)'))
+    updated_at = models.DateTimeField(auto_now=True, help_text=_('Last change to the session or its answers; incremental export watermark'))
 
     class Meta:
         app_label = 'survey'
+        indexes = [
+            models.Index(fields=['survey', 'updated_at'], name='survey_session_updated_idx'),
+        ]
 
+    @memoized_helper
     def answers(self):
-        if not hasattr(self, "__acache"):
-            self.__acache = Answer.objects.filter(Q(survey_session=self) & Q(parent_answer_id__isnull=True))
-        return self.__acache
+        prefetched = self._prefetched('answer_set')
+        if prefetched is not None:
+            return [a for a in prefetched if a.parent_answer_id_id is None]
+        return Answer.objects.filter(Q(survey_session=self) & Q(parent_answer_id__isnull=True))
 
 class Organization(models.Model):
     name = models.CharField(max_length=250)
@@ -157,7 +194,7 @@ class Invitation(models.Model):
     def __str__(self):
         return f"{self.email} → {self.organization.name} ({self.role})"
 
-class SurveyHeader(models.Model):
+class SurveyHeader(HelperCacheMixin, models.Model):
     uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     organization = models.ForeignKey("Organization", on_delete=models.CASCADE)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_surveys')
@@ -167,6 +204,7 @@ class SurveyHeader(models.Model):
     visibility = models.CharField(max_length=10, choices=VISIBILITY_CHOICES, default="private", help_text=_('Controls whether survey appears on the landing page'))
     is_archived = models.BooleanField(default=False, help_text=_('Marks completed surveys whose results can be shown'))
     thanks_html = models.JSONField(default=dict, blank=True, help_text=_('Custom HTML for thanks page. Dict keyed by language: {"en": "<h1>Thanks!</h1>", "ru": "<h1>Спасибо!</h1>"} or a plain string.'))
+    structure_version = models.PositiveIntegerField(default=0, editable=False, help_text=_('Incremented on every change to sections, questions or their translations'))
 
     class Meta:
         app_label = 'survey'
@@ -174,33 +212,43 @@ class SurveyHeader(models.Model):
     def __str__(self):
         return self.name
 
+    @memoized_helper
     def start_section(self):
-        if not hasattr(self, "__sscache"):
-            try:
-                self.__sscache = SurveySection.objects.get(Q(survey_header=self) & Q(is_head=True))
-            except Exception as e:
-                self.__sscache = None
-        return self.__sscache
+        try:
+            return SurveySection.objects.get(Q(survey_header=self) & Q(is_head=True))
+        except Exception as e:
+            return None
 
+    @memoized_helper
     def questions(self):
-        if not hasattr(self, "__qcache"):
-            self.__qcache = Question.objects.filter(survey_section__in=SurveySection.objects.filter(survey_header=self))
-        return self.__qcache
+        return Question.objects.filter(survey_section__in=SurveySection.objects.filter(survey_header=self))
 
+    @memoized_helper
     def geo_questions(self):
-        if not hasattr(self, "__gqcache"):
-            self.__gqcache = Question.objects.filter(Q(survey_section__in=SurveySection.objects.filter(survey_header=self)) & Q(input_type__in=['point','line','polygon']))
-        return self.__gqcache
+        return Question.objects.filter(Q(survey_section__in=SurveySection.objects.filter(survey_header=self)) & Q(input_type__in=['point','line','polygon']))
 
+    @memoized_helper
     def sessions(self):
-        if not hasattr(self, "__scache"):
-            self.__scache = SurveySession.objects.filter(survey=self)
-        return self.__scache
+        prefetched = self._prefetched('surveysession_set')
+        if prefetched is not None:
+            return prefetched
+        return SurveySession.objects.filter(survey=self)
 
+    @memoized_helper
     def answers(self):
-        if not hasattr(self, "__acache"):
-            self.__acache = Answer.objects.filter(Q(question__in=Question.objects.filter(survey_section__in=SurveySection.objects.filter(survey_header=self))))
-        return self.__acache
+        return Answer.objects.filter(Q(question__in=Question.objects.filter(survey_section__in=SurveySection.objects.filter(survey_header=self))))
+
+    def renumber_sections(self):
+        """Store the linked-list order of sections in SurveySection.position."""
+        sections = list(SurveySection.objects.filter(survey_header=self).order_by('id'))
+        changed = []
+        for position, section in enumerate(order_sections_by_links(sections), start=1):
+            if section.position != position:
+                section.position = position
+                changed.append(section)
+        if changed:
+            SurveySection.objects.bulk_update(changed, ['position'])
+            bump_structure_version(pk=self.pk)
 
     def is_multilingual(self):
         return bool(self.available_languages and len(self.available_languages) > 0)
@@ -219,8 +267,58 @@ class SurveyCollaborator(models.Model):
         return f"{self.user.username} - {self.survey.name} ({self.role})"
 
 
+def bump_structure_version(**lookup):
+    """Advance structure_version of the surveys matching lookup.
+
+    Cached structure snapshots (survey.snapshot) are not touched: every
+    process notices the new version the next time it loads the survey row.
+    An instance loaded before the bump holds the old value, so code that
+    edits a loaded survey saves it with update_fields to avoid writing it back.
+    """
+    SurveyHeader.objects.filter(**lookup).update(structure_version=F('structure_version') + 1)
+
+
+def touch_sessions(**lookup):
+    """Move updated_at of the sessions matching lookup to now.
+
+    The incremental export watermark follows SurveySession.updated_at;
+    writes that bypass SurveySession.save() call this once per batch.
+    """
+    SurveySession.objects.filter(**lookup).update(updated_at=timezone.now())
+
+
+def has_valid_positions(sections):
+    """True if the stored positions of sections are exactly 1..n and agree with the links.
+
+    Links changed without renumbering (e.g. in the admin) leave positions
+    that still form 1..n; the head must come first and every section must
+    link to the one positioned after it.
+    """
+    ordered = sorted(sections, key=lambda s: s.position)
+    if [s.position for s in ordered] != list(range(1, len(ordered) + 1)):
+        return False
+    if ordered and (not ordered[0].is_head or ordered[-1].next_section_id is not None):
+        return False
+    return all(section.next_section_id == following.id for section, following in zip(ordered, ordered[1:]))
+
+
+def order_sections_by_links(sections):
+    """Walk next_section links from the head; orphaned sections are appended."""
+    by_id = {s.id: s for s in sections}
+    head = next((s for s in sections if s.is_head), None)
+    ordered = []
+    visited = set()
+    current = head
+    while current is not None and current.id not in visited:
+        ordered.append(current)
+        visited.add(current.id)
+        current = by_id.get(current.next_section_id)
+    ordered.extend(s for s in sections if s.id not in visited)
+    return ordered
+
+
 #survey sections
-class SurveySection(models.Model):
+class SurveySection(HelperCacheMixin, models.Model):
     is_head = models.BooleanField(default=False)
 
     survey_header = models.ForeignKey("SurveyHeader", on_delete=models.CASCADE)
@@ -234,6 +332,7 @@ class SurveySection(models.Model):
 
     next_section = models.ForeignKey("SurveySection", null=True, blank=True, on_delete=models.SET_NULL, related_name='survey_next_section')
     prev_section = models.ForeignKey("SurveySection", null=True, blank=True, on_delete=models.SET_NULL, related_name='survey_prev_section')
+    position = models.PositiveIntegerField(default=0, help_text=_('1-based order in the survey, kept in sync with next/prev links; 0 if unknown'))
 
     class Meta:
         app_label = 'survey'
@@ -241,28 +340,48 @@ class SurveySection(models.Model):
     def __str__(self):
         return self.name
 
+    @memoized_helper
     def questions(self):
-        if not hasattr(self, "__qcache"):
-            self.__qcache = Question.objects.filter(survey_section=self).filter(parent_question_id__isnull=True).order_by('order_number')
-        return self.__qcache
+        prefetched = self._prefetched('question_set')
+        if prefetched is not None:
+            top_level = [q for q in prefetched if q.parent_question_id_id is None]
+            return sorted(top_level, key=lambda q: q.order_number)
+        # Through the reverse manager, so the questions share this instance
+        # as their survey_section (and its _translation_survey result)
+        return self.question_set.filter(parent_question_id__isnull=True).order_by('order_number')
+
+    @memoized_helper
+    def _translation_survey(self):
+        """(survey id, structure_version) the translation tables are looked up by."""
+        if SurveySection.survey_header.is_cached(self):
+            return self.survey_header_id, self.survey_header.structure_version
+        version = SurveyHeader.objects.filter(
+            pk=self.survey_header_id,
+        ).values_list('structure_version', flat=True).first()
+        return self.survey_header_id, version
+
+    def _translation(self, lang):
+        """Return (title, subheading) in lang from prefetched rows or the batched resolver."""
+        prefetched = self._prefetched('translations')
+        if prefetched is not None:
+            for t in prefetched:
+                if t.language == lang:
+                    return t.title, t.subheading
+            return None, None
+        from .translations import section_translation
+        return section_translation(self, lang)
 
     def get_translated_title(self, lang):
         if not lang:
             return self.title
-        try:
-            translation = self.translations.get(language=lang)
-            return translation.title if translation.title else self.title
-        except SurveySectionTranslation.DoesNotExist:
-            return self.title
+        title = self._translation(lang)[0]
+        return title if title else self.title
 
     def get_translated_subheading(self, lang):
         if not lang:
             return self.subheading
-        try:
-            translation = self.translations.get(language=lang)
-            return translation.subheading if translation.subheading else self.subheading
-        except SurveySectionTranslation.DoesNotExist:
-            return self.subheading
+        subheading = self._translation(lang)[1]
+        return subheading if subheading else self.subheading
 
 
 class SurveySectionTranslation(models.Model):
@@ -279,6 +398,17 @@ class SurveySectionTranslation(models.Model):
         return f"{self.section.name} ({self.language})"
 
 
+def localize_choice_name(names, lang=None):
+    """Pick a choice label: requested lang → "en" → first available."""
+    if isinstance(names, dict):
+        if lang and lang in names:
+            return names[lang]
+        if "en" in names:
+            return names["en"]
+        return next(iter(names.values()))
+    return names
+
+
 def question_code_generator():
     while True:
         code = "Q_"+str(random.random())[2:12]
@@ -287,7 +417,7 @@ def question_code_generator():
         except:
             return code
 
-class Question(models.Model):    
+class Question(HelperCacheMixin, models.Model):
     survey_section = models.ForeignKey("SurveySection", on_delete=models.CASCADE)
     parent_question_id = models.ForeignKey('self', default=None, null=True, blank=True, on_delete=models.CASCADE)
     code = models.CharField(max_length=50, default=question_code_generator)
@@ -307,45 +437,60 @@ class Question(models.Model):
     def __str__(self):
         return self.name 
 
+    @memoized_helper
     def subQuestions(self):
-    	if not hasattr(self, "__sqcache"):
-    		self.__sqcache = Question.objects.filter(parent_question_id=self).order_by('order_number')
-    	return self.__sqcache
+        prefetched = self._prefetched('question_set')
+        if prefetched is not None:
+            return sorted(prefetched, key=lambda q: q.order_number)
+        return Question.objects.filter(parent_question_id=self).order_by('order_number')
 
+    @memoized_helper
     def answers(self):
-        if not hasattr(self, "__acache"):
-            self.__acache = Answer.objects.filter(question=self)
-        return self.__acache
+        prefetched = self._prefetched('answer_set')
+        if prefetched is not None:
+            return prefetched
+        return Answer.objects.filter(question=self)
+
+    @memoized_helper
+    def _translation_survey(self):
+        """(survey id, structure_version) the translation tables are looked up by."""
+        if Question.survey_section.is_cached(self):
+            return self.survey_section._translation_survey()
+        return SurveySection.objects.filter(
+            pk=self.survey_section_id,
+        ).values_list('survey_header_id', 'survey_header__structure_version').first()
+
+    def _translation(self, lang):
+        """Return (name, subtext) in lang from prefetched rows or the batched resolver."""
+        prefetched = self._prefetched('translations')
+        if prefetched is not None:
+            for t in prefetched:
+                if t.language == lang:
+                    return t.name, t.subtext
+            return None, None
+        from .translations import question_translation
+        return question_translation(self, lang)
 
     def get_translated_name(self, lang):
         if not lang:
             return self.name
-        try:
-            translation = self.translations.get(language=lang)
-            return translation.name if translation.name else self.name
-        except QuestionTranslation.DoesNotExist:
-            return self.name
+        name = self._translation(lang)[0]
+        return name if name else self.name
 
     def get_translated_subtext(self, lang):
         if not lang:
             return self.subtext
-        try:
-            translation = self.translations.get(language=lang)
-            return translation.subtext if translation.subtext else self.subtext
-        except QuestionTranslation.DoesNotExist:
-            return self.subtext
+        subtext = self._translation(lang)[1]
+        return subtext if subtext else self.subtext
+
+    @property
+    def image_url(self):
+        return self.image.url if self.image else None
 
     def get_choice_name(self, code, lang=None):
         for choice in self.choices or []:
             if choice["code"] == code:
-                names = choice["name"]
-                if isinstance(names, dict):
-                    if lang and lang in names:
-                        return names[lang]
-                    if "en" in names:
-                        return names["en"]
-                    return next(iter(names.values()))
-                return names
+                return localize_choice_name(choice["name"], lang)
         return str(code)
 
 
@@ -363,7 +508,7 @@ class QuestionTranslation(models.Model):
         return f"{self.question.code} ({self.language})"
 
 
-class Answer(models.Model):
+class Answer(HelperCacheMixin, models.Model):
     survey_session = models.ForeignKey("SurveySession", on_delete=models.CASCADE)
     question = models.ForeignKey("Question", on_delete=models.CASCADE)
     parent_answer_id = models.ForeignKey('self', default=None, null=True, blank=True, on_delete=models.CASCADE)
@@ -378,19 +523,29 @@ class Answer(models.Model):
 
     class Meta:
         app_label = 'survey'
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        touch_sessions(id=self.survey_session_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        touch_sessions(id=self.survey_session_id)
+        return result
     
     def get_selected_choice_names(self, lang=None):
         codes = self.selected_choices or []
         return [self.question.get_choice_name(code, lang) for code in codes]
 
+    @memoized_helper
     def subAnswers(self):
-    	if not hasattr(self, "__sacache"):
-    		subanswers = Answer.objects.filter(parent_answer_id=self)
-    		subquestions = self.question.subQuestions()
-    		self.__sacache = {}
-    		for subquestion in subquestions:
-    			self.__sacache[subquestion] = list(filter(lambda a: a.question == subquestion, subanswers))
-    	return self.__sacache
+        subanswers = self._prefetched('answer_set')
+        if subanswers is None:
+            subanswers = list(Answer.objects.filter(parent_answer_id=self))
+        result = {}
+        for subquestion in self.question.subQuestions():
+            result[subquestion] = [a for a in subanswers if a.question_id == subquestion.id]
+        return result
 
 
 STORY_TYPE_CHOICES = (
@@ -421,3 +576,94 @@ class Story(models.Model):
     def get_story_type_display_label(self):
         return dict(STORY_TYPE_CHOICES).get(self.story_type, self.story_type)
 
+
+
+EXPORT_JOB_KIND_CHOICES = (
+    ("archive", _("Survey archive")),
+    ("data", _("Data download")),
+)
+
+EXPORT_JOB_STATUS_CHOICES = (
+    ("queued", _("Queued")),
+    ("running", _("Running")),
+    ("done", _("Done")),
+    ("failed", _("Failed")),
+)
+
+
+class ExportJob(models.Model):
+    """An export built by the export worker (manage.py run_export_worker)."""
+    survey = models.ForeignKey("SurveyHeader", on_delete=models.CASCADE, related_name='export_jobs')
+    organization = models.ForeignKey("Organization", on_delete=models.CASCADE, related_name='export_jobs')
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    kind = models.CharField(max_length=10, choices=EXPORT_JOB_KIND_CHOICES, default="archive")
+    mode = models.CharField(max_length=20, help_text=_('Export mode of an archive, format of a data download'))
+    since = models.CharField(max_length=64, blank=True, default="", help_text=_('Incremental export watermark, if any'))
+    status = models.CharField(max_length=10, choices=EXPORT_JOB_STATUS_CHOICES, default="queued")
+    progress = models.PositiveSmallIntegerField(default=0, help_text=_('Percent done'))
+    error = models.TextField(blank=True, default="")
+    artifact = models.FileField(upload_to='exports/%Y/%m/', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        app_label = 'survey'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='export_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.survey.name} {self.kind}/{self.mode} ({self.status})"
+
+    @property
+    def filename(self):
+        if self.kind == "data":
+            return f"{self.survey.name}.zip"
+        return f"survey_{self.survey.name}_{self.mode}.zip"
+
+
+IMPORT_JOB_STATUS_CHOICES = (
+    ("running", _("Running")),
+    ("done", _("Done")),
+    ("failed", _("Failed")),
+)
+
+
+class ImportJob(models.Model):
+    """Checkpoint of a chunked import (import_survey --chunk-size/--resume)."""
+    archive_hash = models.CharField(max_length=64, db_index=True, help_text=_('SHA-256 of the imported archive'))
+    survey = models.ForeignKey("SurveyHeader", on_delete=models.CASCADE, related_name='import_jobs')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    code_remap = models.JSONField(default=dict, blank=True, help_text=_('Question code remapping of the structure import'))
+    sessions_done = models.PositiveIntegerField(default=0, help_text=_('Sessions of the archive imported and committed so far'))
+    status = models.CharField(max_length=10, choices=IMPORT_JOB_STATUS_CHOICES, default="running")
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        app_label = 'survey'
+
+    def __str__(self):
+        return f"{self.survey.name} import, {self.sessions_done} sessions ({self.status})"
+
+
+class ExportCacheEntry(models.Model):
+    """A generated export archive kept in media storage (see survey.archive_cache)."""
+    key = models.CharField(max_length=64, unique=True, help_text=_('Hash of survey, kind, mode and data version'))
+    survey = models.ForeignKey("SurveyHeader", on_delete=models.CASCADE, related_name='export_cache_entries')
+    kind = models.CharField(max_length=10, choices=EXPORT_JOB_KIND_CHOICES)
+    mode = models.CharField(max_length=20)
+    file = models.FileField(upload_to='export-cache/')
+    size = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        app_label = 'survey'
+        verbose_name_plural = 'export cache entries'
+
+    def __str__(self):
+        return f"{self.survey.name} {self.kind}/{self.mode} ({self.size} bytes)"
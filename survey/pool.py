@@ -0,0 +1,40 @@
+"""
+Process pool for CPU- and query-heavy export work (export_survey --workers).
+
+Workers are forked, so they inherit the parent's database connections. The
+parent closes them before the pool starts; each worker then opens its own
+connection on its first query and never shares a socket with the parent.
+Inside an atomic block the parent's connection cannot be closed and workers
+could not see uncommitted rows, so the work runs in-process instead.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, Sequence, TypeVar
+
+from django.db import connections
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def can_fork_workers() -> bool:
+    return not any(connection.in_atomic_block for connection in connections.all())
+
+
+def map_in_pool(func: Callable[[T], R], items: Sequence[T], workers: int) -> Iterator[R]:
+    """Yield func(item) for every item, in order, using up to workers processes.
+
+    func must be a module-level function and items and results must be
+    picklable.
+    """
+    if workers <= 1 or len(items) <= 1 or not can_fork_workers():
+        for item in items:
+            yield func(item)
+        return
+
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(items)),
+        mp_context=multiprocessing.get_context('fork'),
+    ) as pool:
+        yield from pool.map(func, items)
@@ -4,30 +4,60 @@ Survey import/export serialization module.
 Provides functions for exporting surveys to ZIP archives and importing them back.
 Supports three modes: structure, data, full.
 """
+import hashlib
+import io
 import json
 import zipfile
 import os
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
 from io import BytesIO
-from typing import IO, Dict, List, Optional, Tuple, Any
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Any, Union
 
 from django.conf import settings
 from django.contrib.gis.geos import Point, LineString, Polygon, GEOSGeometry
 from django.core.files.base import ContentFile
 from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
 
 from .models import (
     Organization, SurveyHeader, SurveySection, Question,
-    SurveySession, Answer,
+    SurveySession, Answer, ImportJob,
     INPUT_TYPE_CHOICES, SurveySectionTranslation,
-    QuestionTranslation,
+    QuestionTranslation, order_sections_by_links, bump_structure_version,
 )
+from .exports import GeoExportError, OGR_FORMATS, survey_data_members
+from .pool import map_in_pool
 
-# Format version for compatibility checking
-FORMAT_VERSION = "1.0"
+# Format version for compatibility checking. 1.1 stores responses as
+# responses.ndjson; 1.0 archives with a single responses.json are still read.
+FORMAT_VERSION = "1.1"
+SUPPORTED_FORMAT_VERSIONS = ("1.0", "1.1")
 
-# Valid export modes
-EXPORT_MODES = ("structure", "data", "full")
+# Responses member: a header line, then one session per line
+RESPONSES_FILE = "responses.ndjson"
+LEGACY_RESPONSES_FILE = "responses.json"
+
+# Valid export modes; 'gpkg' and 'fgb' export the data as GIS layers plus a CSV
+EXPORT_MODES = ("structure", "data", "full", "gpkg", "fgb")
+
+# Timestamp watermarks are moved back by this much: updated_at is set when a
+# transaction writes, not when it commits, so a slower transaction can commit
+# a session older than the newest one already exported
+WATERMARK_OVERLAP = timedelta(seconds=getattr(settings, 'SURVEY_EXPORT_WATERMARK_OVERLAP', 5 * 60))
+
+# Sessions serialized or imported per batch of queries
+SESSION_CHUNK_SIZE = 1000
+
+# Answers inserted per bulk_create statement during import
+ANSWER_BATCH_SIZE = 5000
+
+# Characters read per step when a 1.0 responses.json is parsed incrementally
+JSON_READ_SIZE = 64 * 1024
+
+# Session ranges handed to each export worker; more ranges balance uneven sessions
+SESSION_RANGES_PER_WORKER = 4
 
 # Valid input types for validation
 VALID_INPUT_TYPES = [choice[0] for choice in INPUT_TYPE_CHOICES]
@@ -61,7 +91,16 @@ def serialize_survey_to_dict(survey: SurveyHeader) -> Dict[str, Any]:
 
 def serialize_sections(survey: SurveyHeader) -> List[Dict[str, Any]]:
     """Serialize all sections with geo WKT and questions."""
-    sections = SurveySection.objects.filter(survey_header=survey)
+    sections = (
+        SurveySection.objects.filter(survey_header=survey)
+        .select_related('next_section', 'prev_section')
+        .prefetch_related(
+            'translations',
+            'question_set__translations',
+            'question_set__question_set__translations',
+            'question_set__question_set__question_set',
+        )
+    )
     result = []
 
     for section in sections:
@@ -140,35 +179,199 @@ def collect_structure_images(survey: SurveyHeader) -> List[Tuple[str, str]]:
 # EXPORT - Data Serialization
 # =============================================================================
 
-def serialize_sessions(survey: SurveyHeader) -> List[Dict[str, Any]]:
-    """Serialize all survey sessions with their answers."""
-    sessions = []
-
-    for session in survey.sessions():
-        sessions.append({
-            "start_datetime": session.start_datetime.isoformat() if session.start_datetime else None,
-            "end_datetime": session.end_datetime.isoformat() if session.end_datetime else None,
-            "language": session.language,
-            "answers": serialize_answers(session),
-        })
+def parse_watermark(value: str) -> Union[int, datetime]:
+    """
+    Parse an incremental export watermark.
 
+    A plain integer is a session id; anything else must be an ISO 8601
+    timestamp, taken as UTC when it has no offset.
+    """
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    except ValueError:
+        raise ExportError(f"Invalid watermark '{value}'. Use a session id or an ISO 8601 timestamp")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def sessions_since(survey: SurveyHeader, since: Optional[Union[int, datetime]] = None):
+    """Sessions of survey after a watermark: a session id or an updated_at timestamp."""
+    sessions = SurveySession.objects.filter(survey=survey)
+    if isinstance(since, datetime):
+        return sessions.filter(updated_at__gt=since)
+    if since is not None:
+        return sessions.filter(id__gt=since)
     return sessions
 
 
-def _serialize_answer(answer: Answer) -> Dict[str, Any]:
-    """Serialize a single answer."""
+def session_watermark(survey: SurveyHeader, since: Optional[Union[int, datetime]] = None) -> Dict[str, Any]:
+    """
+    Return the watermark to resume from after exporting sessions since since.
+
+    It is read before the sessions themselves, so a session written during
+    the export is exported again by the next pull rather than skipped. The
+    updated_at watermark trails the newest session by WATERMARK_OVERLAP, so
+    sessions near it are exported twice; sessions keep their uuid, and the
+    import skips them, or replaces them with update_existing.
+    """
+    latest = sessions_since(survey, since).aggregate(session_id=Max('id'), updated_at=Max('updated_at'))
+    if latest["session_id"] is None:
+        latest = {
+            "session_id": since if isinstance(since, int) else None,
+            "updated_at": since if isinstance(since, datetime) else None,
+        }
+    elif latest["updated_at"] is not None:
+        latest["updated_at"] -= WATERMARK_OVERLAP
+        if isinstance(since, datetime):
+            latest["updated_at"] = max(latest["updated_at"], since)
+    return {
+        "session_id": latest["session_id"],
+        "updated_at": latest["updated_at"].isoformat() if latest["updated_at"] else None,
+    }
+
+
+def serialize_sessions(
+    survey: SurveyHeader,
+    since: Optional[Union[int, datetime]] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    workers: int = 1,
+) -> List[Dict[str, Any]]:
+    """Serialize survey sessions with their answers (see iter_sessions)."""
+    return list(iter_sessions(survey, since, progress, workers))
+
+
+def iter_sessions(
+    survey: SurveyHeader,
+    since: Optional[Union[int, datetime]] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    workers: int = 1,
+) -> Iterator[Dict[str, Any]]:
+    """Yield serialized sessions with their answers, optionally only those after a watermark.
+
+    Questions are loaded once. Sessions are read in SESSION_CHUNK_SIZE
+    batches by keyset pagination, and each batch fetches all of its answers
+    and sub-answers in one query, grouped in memory. The query count grows
+    with the number of batches, not with sessions or answers, and only one
+    batch is held in memory.
+
+    With workers > 1 the sessions are split into contiguous id ranges of at
+    most SESSION_CHUNK_SIZE sessions that are serialized in a process pool
+    and yielded in id order, so the output is the same as with one worker.
+
+    progress, if given, is called with (sessions done, total) after each
+    batch or range.
+    """
+    selected = sessions_since(survey, since)
+    total = selected.count() if progress else 0
+
+    if workers > 1:
+        ids = list(selected.order_by('id').values_list('id', flat=True))
+        count = max(workers * SESSION_RANGES_PER_WORKER, -(-len(ids) // SESSION_CHUNK_SIZE))
+        tasks = [(survey.id, since, first_id, last_id) for first_id, last_id in _session_id_ranges(ids, count)]
+        done = 0
+        for serialized in map_in_pool(_serialize_session_range_task, tasks, workers):
+            yield from serialized
+            done += len(serialized)
+            if progress:
+                progress(done, total)
+        return
+
+    def report(done):
+        if progress:
+            progress(done, total)
+
+    yield from _iter_session_range(survey, since, report=report)
+
+
+def _session_id_ranges(ids: List[int], count: int) -> List[Tuple[int, int]]:
+    """Split ordered session ids into at most count (first id, last id) ranges of similar size."""
+    if not ids:
+        return []
+    size = -(-len(ids) // count)
+    return [(ids[i], ids[min(i + size, len(ids)) - 1]) for i in range(0, len(ids), size)]
+
+
+def _serialize_session_range_task(task) -> List[Dict[str, Any]]:
+    survey_id, since, first_id, last_id = task
+    survey = SurveyHeader.objects.get(id=survey_id)
+    return list(_iter_session_range(survey, since, first_id, last_id))
+
+
+def _iter_session_range(
+    survey: SurveyHeader,
+    since: Optional[Union[int, datetime]] = None,
+    first_id: Optional[int] = None,
+    last_id: Optional[int] = None,
+    report: Optional[Callable[[int], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the serialized sessions of survey with ids in [first_id, last_id] (see iter_sessions)."""
+    questions = {q.id: q for q in Question.objects.filter(survey_section__survey_header=survey)}
+    selected = sessions_since(survey, since)
+    if last_id is not None:
+        selected = selected.filter(id__lte=last_id)
+    done = 0
+
+    after_id = first_id - 1 if first_id is not None else 0
+    while True:
+        chunk = list(selected.filter(id__gt=after_id).order_by('id')[:SESSION_CHUNK_SIZE])
+        if not chunk:
+            break
+        after_id = chunk[-1].id
+
+        top_level, children = _group_answers(
+            Answer.objects.filter(survey_session__in=[session.id for session in chunk]).order_by('id')
+        )
+        for session in chunk:
+            yield {
+                "uuid": str(session.uuid),
+                "start_datetime": session.start_datetime.isoformat() if session.start_datetime else None,
+                "end_datetime": session.end_datetime.isoformat() if session.end_datetime else None,
+                "language": session.language,
+                "answers": [
+                    _serialize_answer(answer, questions, children)
+                    for answer in top_level.get(session.id, [])
+                ],
+            }
+        done += len(chunk)
+        if report:
+            report(done)
+
+
+def _group_answers(answers) -> Tuple[Dict[int, List[Answer]], Dict[int, List[Answer]]]:
+    """Split answers into top-level answers by session and sub-answers by parent."""
+    top_level = {}
+    children = {}
+    for answer in answers:
+        if answer.parent_answer_id_id is None:
+            top_level.setdefault(answer.survey_session_id, []).append(answer)
+        else:
+            children.setdefault(answer.parent_answer_id_id, []).append(answer)
+    return top_level, children
+
+
+def _serialize_answer(
+    answer: Answer,
+    questions: Dict[int, Question],
+    children: Dict[int, List[Answer]],
+) -> Dict[str, Any]:
+    """Serialize a single answer from preloaded questions and sub-answers."""
+    question = questions[answer.question_id]
     data = {
-        "question_code": answer.question.code,
+        "question_code": question.code,
         "numeric": answer.numeric,
         "text": answer.text,
         "yn": answer.yn,
         "point": geo_to_wkt(answer.point),
         "line": geo_to_wkt(answer.line),
         "polygon": geo_to_wkt(answer.polygon),
-        "choices": serialize_choices(answer),
+        "choices": [question.get_choice_name(code) for code in answer.selected_choices or []],
         "sub_answers": [
-            _serialize_answer(sub_a)
-            for sub_a in Answer.objects.filter(parent_answer_id=answer)
+            _serialize_answer(sub_a, questions, children)
+            for sub_a in children.get(answer.id, [])
         ],
     }
     return data
@@ -176,9 +379,12 @@ def _serialize_answer(answer: Answer) -> Dict[str, Any]:
 
 def serialize_answers(session: SurveySession) -> List[Dict[str, Any]]:
     """Serialize answers with nested sub_answers."""
+    answers = list(Answer.objects.filter(survey_session=session).select_related('question').order_by('id'))
+    questions = {answer.question_id: answer.question for answer in answers}
+    top_level, children = _group_answers(answers)
     return [
-        _serialize_answer(answer)
-        for answer in session.answers()
+        _serialize_answer(answer, questions, children)
+        for answer in top_level.get(session.id, [])
     ]
 
 
@@ -214,7 +420,10 @@ def collect_upload_images(survey: SurveyHeader) -> List[Tuple[str, str]]:
 def export_survey_to_zip(
     survey: SurveyHeader,
     output: IO[bytes],
-    mode: str = "structure"
+    mode: str = "structure",
+    since: Optional[Union[int, datetime]] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    workers: int = 1,
 ) -> List[str]:
     """
     Export survey to ZIP archive.
@@ -222,13 +431,22 @@ def export_survey_to_zip(
     Args:
         survey: The survey to export
         output: File-like object to write ZIP to
-        mode: One of 'structure', 'data', 'full'
+        mode: One of 'structure', 'data', 'full', or 'gpkg'/'fgb' for
+            GeoPackage/FlatGeobuf layers with a CSV of the other answers
+        since: Incremental export watermark (see parse_watermark); only
+            sessions after it are exported and the responses header records the
+            watermark for the next pull
+        progress: Called with (sessions done, total) while responses are serialized
+        workers: Processes used for session ranges and GIS layers; the
+            archive content does not depend on it
 
     Returns:
         List of warnings generated during export
     """
     if mode not in EXPORT_MODES:
         raise ExportError(f"Invalid export mode '{mode}'. Must be one of: {', '.join(EXPORT_MODES)}")
+    if since is not None and mode not in ("data", "full"):
+        raise ExportError("A watermark can only be used with the 'data' and 'full' modes")
 
     warnings = []
 
@@ -253,32 +471,154 @@ def export_survey_to_zip(
             for archive_path, filesystem_path in images:
                 zf.write(filesystem_path, archive_path)
 
-        # Export data (responses.json + upload images)
+        # Export data (responses.ndjson + upload images)
         if mode in ("data", "full"):
-            responses_data = {
+            header = {
                 "version": FORMAT_VERSION,
                 "exported_at": datetime.utcnow().isoformat() + "Z",
                 "survey_name": survey.name,
-                "sessions": serialize_sessions(survey),
+                "since": since.isoformat() if isinstance(since, datetime) else since,
+                "watermark": session_watermark(survey, since),
+                "session_count": sessions_since(survey, since).count(),
             }
-            zf.writestr("responses.json", json.dumps(responses_data, indent=2, ensure_ascii=False))
+            with zf.open(RESPONSES_FILE, 'w', force_zip64=True) as member:
+                member.write(_ndjson_line(header))
+                for session in iter_sessions(survey, since, progress, workers):
+                    member.write(_ndjson_line(session))
 
             # Add upload images (currently empty, for future extension)
             for archive_path, filesystem_path in collect_upload_images(survey):
                 zf.write(filesystem_path, archive_path)
 
+        # Export GIS layers, converted by ogr2ogr and copied in chunks
+        if mode in OGR_FORMATS:
+            try:
+                for name, chunks in survey_data_members(survey, mode, workers):
+                    with zf.open(name, 'w', force_zip64=True) as member:
+                        for chunk in chunks:
+                            member.write(chunk)
+            except GeoExportError as e:
+                raise ExportError(str(e))
+
     return warnings
 
 
+def _ndjson_line(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
 # =============================================================================
 # IMPORT - Validation
 # =============================================================================
 
+class _JSONStreamReader:
+    """
+    Reads a JSON document from a text stream one value at a time.
+
+    Containers are stepped through with expect(); any complete value is
+    decoded with value(). Only the unread part of the current value is kept
+    in memory, so large arrays can be walked element by element.
+    """
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, stream: IO[str]):
+        self._stream = stream
+        self._buffer = ""
+        self._pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self._stream.read(JSON_READ_SIZE)
+        if not chunk:
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it, or '' at the end."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of chars, and return it."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"expected one of {chars!r}, got {char or 'end of file'!r}")
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode and consume the next complete value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number ending the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def items(self) -> Iterator[Any]:
+        """Yield the elements of the array at the current position."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.expect("]")
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+def _iter_legacy_responses(member: IO[bytes]) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield the fields of a 1.0 responses.json read incrementally from its member.
+
+    Header fields are yielded as (key, value). The sessions array is never
+    decoded whole: each session is yielded as ("sessions", session).
+    Raises ValueError (or UnicodeDecodeError) for malformed content.
+    """
+    reader = _JSONStreamReader(io.TextIOWrapper(member, encoding="utf-8"))
+    if reader.peek() != "{":
+        raise ValueError("expected an object")
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError("expected a field name")
+        reader.expect(":")
+        if key == "sessions" and reader.peek() == "[":
+            for session in reader.items():
+                yield key, session
+        else:
+            yield key, reader.value()
+        if reader.expect(",}") == "}":
+            return
+
+
+
 def validate_archive(zip_file: zipfile.ZipFile) -> Dict[str, Any]:
     """
     Validate archive structure, version, and required files.
 
-    Returns parsed survey.json and/or responses.json content.
+    Returns parsed survey.json and/or the responses header. For a
+    responses.ndjson member only the header line is read here; sessions are
+    streamed by iter_archive_sessions during import. A 1.0 responses.json
+    is parsed incrementally and its sessions are skipped one at a time, so
+    neither format is ever held in memory whole.
     Raises ImportError if validation fails.
     """
     result = {
@@ -301,9 +641,9 @@ def validate_archive(zip_file: zipfile.ZipFile) -> Dict[str, Any]:
 
         # Validate version
         version = data.get("version")
-        if version != FORMAT_VERSION:
+        if version not in SUPPORTED_FORMAT_VERSIONS:
             raise ImportError(
-                f"Unsupported format version '{version}'. Supported: {FORMAT_VERSION}"
+                f"Unsupported format version '{version}'. Supported: {', '.join(SUPPORTED_FORMAT_VERSIONS)}"
             )
 
         # Validate required fields
@@ -316,19 +656,31 @@ def validate_archive(zip_file: zipfile.ZipFile) -> Dict[str, Any]:
         result["survey_data"] = data
         result["mode"] = data.get("mode", "structure")
 
-    # Check for responses.json
-    if "responses.json" in names:
+    # Check for responses.ndjson, or a 1.0 responses.json
+    responses_file = next((n for n in (RESPONSES_FILE, LEGACY_RESPONSES_FILE) if n in names), None)
+    if responses_file:
         try:
-            content = zip_file.read("responses.json").decode("utf-8")
-            data = json.loads(content)
-        except (json.JSONDecodeError, UnicodeDecodeError) as e:
-            raise ImportError(f"Invalid responses.json: {e}")
+            if responses_file == RESPONSES_FILE:
+                with zip_file.open(RESPONSES_FILE) as member:
+                    data = json.loads(member.readline().decode("utf-8"))
+            else:
+                with zip_file.open(LEGACY_RESPONSES_FILE) as member:
+                    data = {
+                        key: value
+                        for key, value in _iter_legacy_responses(member)
+                        if key != "sessions"
+                    }
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ImportError(f"Invalid {responses_file}: {e}")
+        if not isinstance(data, dict):
+            raise ImportError(f"Invalid {responses_file}: expected an object")
 
         # Validate version
         version = data.get("version")
-        if version != FORMAT_VERSION:
+        if version not in SUPPORTED_FORMAT_VERSIONS:
             raise ImportError(
-                f"Unsupported format version '{version}' in responses.json. Supported: {FORMAT_VERSION}"
+                f"Unsupported format version '{version}' in {responses_file}. "
+                f"Supported: {', '.join(SUPPORTED_FORMAT_VERSIONS)}"
             )
 
         result["has_data"] = True
@@ -338,7 +690,7 @@ def validate_archive(zip_file: zipfile.ZipFile) -> Dict[str, Any]:
 
     # Must have at least one
     if not result["has_structure"] and not result["has_data"]:
-        raise ImportError("Archive must contain survey.json and/or responses.json")
+        raise ImportError(f"Archive must contain survey.json and/or {RESPONSES_FILE}")
 
     return result
 
@@ -385,16 +737,15 @@ def import_structure_from_archive(
     sections = create_sections(survey, sections_data)
 
     # Create questions for each section
-    for section_data in sections_data:
-        section = sections.get(section_data["name"])
-        if section:
-            questions_data = section_data.get("questions", [])
-            create_questions(section, questions_data, legacy_option_groups, code_remap)
+    create_questions(sections, sections_data, legacy_option_groups, code_remap)
 
     # Resolve section links
     link_warnings = resolve_section_links(sections, sections_data)
     warnings.extend(link_warnings)
 
+    # Bulk inserts send no post_save signals, so bump the version once here
+    bump_structure_version(pk=survey.pk)
+
     # Extract images
     image_warnings = extract_structure_images(zip_file, survey, code_remap)
     warnings.extend(image_warnings)
@@ -454,8 +805,11 @@ def create_sections(
     survey: SurveyHeader,
     sections_data: List[Dict[str, Any]]
 ) -> Dict[str, SurveySection]:
-    """Create sections without next/prev links, returns name->object mapping."""
-    result = {}
+    """Create sections without next/prev links, returns name->object mapping.
+
+    Sections and their translations are inserted with one bulk_create each.
+    """
+    sections = []
 
     for section_data in sections_data:
         # Parse geo point
@@ -469,7 +823,7 @@ def create_sections(
                     f"Invalid WKT for section '{section_data['name']}': {e}"
                 )
 
-        section = SurveySection.objects.create(
+        sections.append(SurveySection(
             survey_header=survey,
             name=section_data["name"][:45],
             title=section_data.get("title", "")[:256] if section_data.get("title") else None,
@@ -479,49 +833,82 @@ def create_sections(
             start_map_postion=start_map_position or Point(30.317, 59.945),
             start_map_zoom=section_data.get("start_map_zoom") or 12,
             # next_section and prev_section are resolved later
-        )
+        ))
 
-        # Create section translations
-        for trans_data in section_data.get("translations", []):
-            SurveySectionTranslation.objects.create(
-                section=section,
-                language=trans_data["language"],
-                title=trans_data.get("title"),
-                subheading=trans_data.get("subheading"),
-            )
+    SurveySection.objects.bulk_create(sections)
 
-        result[section.name] = section
+    # Create section translations
+    SurveySectionTranslation.objects.bulk_create([
+        SurveySectionTranslation(
+            section=section,
+            language=trans_data["language"],
+            title=trans_data.get("title"),
+            subheading=trans_data.get("subheading"),
+        )
+        for section, section_data in zip(sections, sections_data)
+        for trans_data in section_data.get("translations", [])
+    ])
 
-    return result
+    return {section.name: section for section in sections}
 
 
-def _generate_unique_code(original_code: str) -> str:
-    """Generate a new unique question code."""
+def _generate_unique_codes(count: int, reserved: set) -> List[str]:
+    """Generate count new question codes that are neither in reserved nor in the database."""
     import random
-    while True:
-        new_code = f"Q_{str(random.random())[2:12]}"
-        if not Question.objects.filter(code=new_code).exists():
-            return new_code
+    codes = set()
+    while len(codes) < count:
+        candidates = {
+            f"Q_{str(random.random())[2:12]}" for _ in range(count - len(codes))
+        } - reserved - codes
+        existing = set(Question.objects.filter(code__in=candidates).values_list('code', flat=True))
+        codes |= candidates - existing
+    return sorted(codes)
+
+
+def allocate_question_codes(codes: List[str], code_remap: Dict[str, str]) -> List[str]:
+    """
+    Return the code each incoming question gets, resolving collisions in bulk.
+
+    A code collides if a question already has it or an earlier question of
+    the archive uses it. Existing codes are found with one query and all
+    colliding questions get new codes together, so the number of queries
+    does not depend on the number of questions. The first question with a
+    colliding code is recorded in code_remap.
+    """
+    taken = set(Question.objects.filter(code__in=set(codes)).values_list('code', flat=True))
+    reserved = taken | set(codes)
+
+    allocated = []
+    collisions = []
+    for index, code in enumerate(codes):
+        if code in taken:
+            collisions.append(index)
+            allocated.append(None)
+        else:
+            taken.add(code)
+            allocated.append(code)
+
+    for index, new_code in zip(collisions, _generate_unique_codes(len(collisions), reserved)):
+        allocated[index] = new_code
+
+    seen = set()
+    for original_code, code in zip(codes, allocated):
+        if original_code not in seen and code != original_code:
+            code_remap[original_code] = code
+        seen.add(original_code)
+
+    return allocated
 
 
-def _create_question(
+def _build_question(
     section: SurveySection,
     question_data: Dict[str, Any],
     legacy_option_groups: List[Dict[str, Any]],
-    code_remap: Dict[str, str],
-    parent: Optional[Question] = None
+    code: str,
 ) -> Question:
-    """Create a single question, handling code collisions."""
+    """Validate question data and build an unsaved Question with the given code."""
     original_code = question_data["code"]
 
-    # Check for code collision
-    if Question.objects.filter(code=original_code).exists():
-        new_code = _generate_unique_code(original_code)
-        code_remap[original_code] = new_code
-        code = new_code
-    else:
-        code = original_code
-
     # Validate input_type
     input_type = question_data.get("input_type", "text")
     if input_type not in VALID_INPUT_TYPES:
@@ -548,9 +935,8 @@ def _create_question(
             f"Question '{original_code}': input_type '{input_type}' requires choices"
         )
 
-    question = Question.objects.create(
+    return Question(
         survey_section=section,
-        parent_question_id=parent,
         code=code[:50],
         order_number=question_data.get("order_number", 0),
         name=question_data.get("name", "")[:512] if question_data.get("name") else None,
@@ -563,31 +949,66 @@ def _create_question(
         # image is handled separately during extraction
     )
 
+
+def create_questions(
+    sections: Dict[str, SurveySection],
+    sections_data: List[Dict[str, Any]],
+    legacy_option_groups: List[Dict[str, Any]],
+    code_remap: Dict[str, str]
+) -> List[Question]:
+    """
+    Create the questions of all sections with hierarchy, updating code_remap for collisions.
+
+    Every question is validated before anything is inserted. Questions are
+    then created one nesting level at a time (questions, sub-questions, ...)
+    with bulk_create, followed by all their translations in one statement.
+    """
+    # (section, question data, index of the parent entry) in archive order
+    entries = []
+
+    def collect(section, questions_data, parent_index):
+        for question_data in questions_data:
+            entries.append((section, question_data, parent_index))
+            collect(section, question_data.get("sub_questions", []), len(entries) - 1)
+
+    for section_data in sections_data:
+        section = sections.get(section_data["name"])
+        if section:
+            collect(section, section_data.get("questions", []), None)
+
+    codes = allocate_question_codes([question_data["code"] for _, question_data, _ in entries], code_remap)
+    questions = [
+        _build_question(section, question_data, legacy_option_groups, code)
+        for (section, question_data, _), code in zip(entries, codes)
+    ]
+
+    depths = []
+    for _, _, parent_index in entries:
+        depths.append(0 if parent_index is None else depths[parent_index] + 1)
+
+    # Parents are inserted before their children are linked to them
+    for depth in range(max(depths, default=-1) + 1):
+        level = []
+        for question, (_, _, parent_index), question_depth in zip(questions, entries, depths):
+            if question_depth == depth:
+                if parent_index is not None:
+                    question.parent_question_id = questions[parent_index]
+                level.append(question)
+        Question.objects.bulk_create(level)
+
     # Create question translations
-    for trans_data in question_data.get("translations", []):
-        QuestionTranslation.objects.create(
+    QuestionTranslation.objects.bulk_create([
+        QuestionTranslation(
             question=question,
             language=trans_data["language"],
             name=trans_data.get("name"),
             subtext=trans_data.get("subtext"),
         )
+        for question, (_, question_data, _) in zip(questions, entries)
+        for trans_data in question_data.get("translations", [])
+    ])
 
-    # Create sub-questions recursively
-    for sub_q_data in question_data.get("sub_questions", []):
-        _create_question(section, sub_q_data, legacy_option_groups, code_remap, parent=question)
-
-    return question
-
-
-def create_questions(
-    section: SurveySection,
-    questions_data: List[Dict[str, Any]],
-    legacy_option_groups: List[Dict[str, Any]],
-    code_remap: Dict[str, str]
-) -> None:
-    """Create questions with hierarchy, updating code_remap for collisions."""
-    for question_data in questions_data:
-        _create_question(section, question_data, legacy_option_groups, code_remap)
+    return questions
 
 
 def resolve_section_links(
@@ -623,7 +1044,11 @@ def resolve_section_links(
                     f"Section '{section_name}': prev_section '{prev_name}' not found, set to null"
                 )
 
-        section.save()
+    # Positions are derived from the resolved links, not from the archive
+    ordered = order_sections_by_links(sorted(sections.values(), key=lambda s: s.id))
+    for position, section in enumerate(ordered, start=1):
+        section.position = position
+    SurveySection.objects.bulk_update(ordered, ['next_section', 'prev_section', 'position'])
 
     return warnings
 
@@ -642,6 +1067,8 @@ def extract_structure_images(
         if name.startswith("images/structure/") and not name.endswith("/")
     ]
 
+    questions = load_question_map(survey) if image_files else {}
+
     for image_path in image_files:
         # Parse filename: <question_code>_<original_name>
         filename = os.path.basename(image_path)
@@ -656,12 +1083,8 @@ def extract_structure_images(
         actual_code = code_remap.get(original_code, original_code)
 
         # Find the question
-        try:
-            question = Question.objects.get(
-                code=actual_code,
-                survey_section__survey_header=survey
-            )
-        except Question.DoesNotExist:
+        question = questions.get(actual_code)
+        if question is None:
             warnings.append(
                 f"Image '{filename}' not found in archive for question '{original_code}'"
             )
@@ -686,30 +1109,53 @@ def import_responses_from_archive(
     zip_file: zipfile.ZipFile,
     survey: SurveyHeader,
     code_remap: Dict[str, str],
-    data: Dict[str, Any]
+    data: Dict[str, Any],
+    progress: Optional[Callable[[int, int], None]] = None,
+    update_existing: bool = False,
 ) -> List[str]:
     """
     Import responses (sessions and answers) from archive.
 
+    The survey's questions and their choice name -> code maps are loaded
+    once. Sessions are then streamed from the archive, validated and
+    written SESSION_CHUNK_SIZE at a time with bulk_create: the sessions in
+    one statement, then their answers one nesting level at a time (answers,
+    sub-answers, ...) in statements of up to ANSWER_BATCH_SIZE rows. Memory
+    use and the number of queries per batch do not depend on the size of
+    the archive.
+
+    Sessions are matched by their uuid, so importing the same archive again
+    adds nothing; see _import_session_batch.
+
     Args:
         zip_file: The ZIP archive
         survey: The target survey (existing or just created)
         code_remap: Question code remapping table
-        data: Parsed responses.json content
+        data: Responses header returned by validate_archive
+        progress: Called with (sessions done, total) after each batch; total is
+            0 when the archive does not record its session count
+        update_existing: Replace sessions that already exist instead of skipping them
 
     Returns:
         List of warnings generated during import
     """
     warnings = []
-
-    sessions_data = data.get("sessions", [])
-
-    for session_data in sessions_data:
-        session = create_session(survey, session_data)
-
-        for answer_data in session_data.get("answers", []):
-            _, answer_warnings = create_answer(session, answer_data, code_remap)
-            warnings.extend(answer_warnings)
+    questions = load_question_map(survey)
+    choice_codes = load_choice_codes(questions)
+
+    total = count_archive_sessions(data)
+    done = 0
+    existing = 0
+    for batch in iter_session_batches(zip_file, data, SESSION_CHUNK_SIZE):
+        batch_warnings, batch_existing = _import_session_batch(
+            survey, batch, questions, choice_codes, code_remap, update_existing
+        )
+        warnings.extend(batch_warnings)
+        existing += batch_existing
+        done += len(batch)
+        if progress:
+            progress(done, total)
+    warnings.extend(_existing_sessions_warnings(existing, update_existing))
 
     # Extract uploaded images (currently a stub)
     upload_warnings = extract_upload_images(zip_file, survey)
@@ -718,11 +1164,295 @@ def import_responses_from_archive(
     return warnings
 
 
-def create_session(
+def import_responses_in_chunks(
+    zip_file: zipfile.ZipFile,
+    job: ImportJob,
+    data: Dict[str, Any],
+    chunk_size: int = SESSION_CHUNK_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None,
+    update_existing: bool = False,
+) -> List[str]:
+    """
+    Import responses committing every chunk_size sessions, checkpointed in job.
+
+    Each chunk is inserted and job.sessions_done advanced in one
+    transaction, so the job always records exactly the sessions that were
+    committed and a resumed import starts right after them. Sessions before
+    the checkpoint are read from the archive but not inserted again. On
+    failure the job is marked failed and the error is re-raised.
+    """
+    warnings = []
+    survey = job.survey
+    questions = load_question_map(survey)
+    choice_codes = load_choice_codes(questions)
+
+    # A resumed job was left failed; show it as running again while it runs
+    if job.status != "running":
+        job.status = "running"
+        job.error = ""
+        job.save(update_fields=['status', 'error', 'updated_at'])
+
+    total = count_archive_sessions(data)
+    existing = 0
+    try:
+        for batch in iter_session_batches(zip_file, data, chunk_size, start=job.sessions_done):
+            done = job.sessions_done + len(batch)
+            with transaction.atomic():
+                batch_warnings, batch_existing = _import_session_batch(
+                    survey, batch, questions, choice_codes, job.code_remap, update_existing
+                )
+                ImportJob.objects.filter(id=job.id).update(sessions_done=done, updated_at=timezone.now())
+            warnings.extend(batch_warnings)
+            existing += batch_existing
+            job.sessions_done = done
+            if progress:
+                progress(done, total)
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    warnings.extend(_existing_sessions_warnings(existing, update_existing))
+    return warnings
+
+
+def _copy_uuid(source: uuid.UUID, survey: SurveyHeader) -> uuid.UUID:
+    """Return the uuid of the copy of session source imported into survey."""
+    return uuid.uuid5(source, str(survey.uuid))
+
+
+def _existing_sessions_warnings(count: int, update_existing: bool) -> List[str]:
+    if not count:
+        return []
+    action = "updated" if update_existing else "skipped"
+    return [f"{count} session(s) already imported, {action}"]
+
+
+def _import_session_batch(
+    survey: SurveyHeader,
+    batch: List[Dict[str, Any]],
+    questions: Dict[str, Question],
+    choice_codes: Dict[int, Dict[str, Any]],
+    code_remap: Dict[str, str],
+    update_existing: bool = False,
+) -> Tuple[List[str], int]:
+    """
+    Upsert a batch of sessions and all their answers by session uuid.
+
+    Sessions whose uuid already exists in survey are skipped, or with
+    update_existing have their fields and answers replaced. A uuid found
+    in another survey (e.g. a full archive imported as a copy) is not
+    reused; the copy gets a uuid derived from the source uuid and the
+    target survey (see _copy_uuid), so importing the same archive again
+    finds it. Existing sessions are found with one query per batch.
+
+    Returns:
+        (warnings, number of sessions that already existed)
+    """
+    warnings = []
+    keys = [_session_uuid(d) for d in batch]
+    lookup = [key for key in keys if key is not None]
+    existing = {
+        key: (session_id, survey_id)
+        for key, session_id, survey_id in SurveySession.objects.filter(
+            uuid__in=lookup + [_copy_uuid(key, survey) for key in lookup],
+        ).values_list('uuid', 'id', 'survey_id')
+    }
+
+    new_sessions = []
+    updated_sessions = []
+    seen = set()
+    for key, session_data in zip(keys, batch):
+        session = build_session(survey, session_data)
+        if key is None:
+            new_sessions.append((session, session_data))
+            continue
+        if key in seen:
+            continue
+        seen.add(key)
+        session_id, survey_id = existing.get(key, (None, None))
+        if session_id is not None and survey_id != survey.id:
+            key = _copy_uuid(key, survey)
+            session_id, survey_id = existing.get(key, (None, None))
+        if session_id is None:
+            session.uuid = key
+            new_sessions.append((session, session_data))
+        elif update_existing:
+            session.pk = session_id
+            session.uuid = key
+            session.updated_at = timezone.now()
+            updated_sessions.append((session, session_data))
+    existing_count = len(batch) - len(new_sessions)
+
+    SurveySession.objects.bulk_create([session for session, _ in new_sessions])
+    if updated_sessions:
+        SurveySession.objects.bulk_update(
+            [session for session, _ in updated_sessions],
+            ['start_datetime', 'end_datetime', 'language', 'updated_at'],
+        )
+        Answer.objects.filter(survey_session__in=[session.id for session, _ in updated_sessions]).delete()
+
+    # (session, parent answer, answer data) of the nesting level being inserted;
+    # parents are saved before their children are built, so their ids are known
+    level = [
+        (session, None, session_data.get("answers") or [])
+        for session, session_data in new_sessions + updated_sessions
+    ]
+    while level:
+        answers = []
+        next_level = []
+        for session, parent_answer, answers_data in level:
+            for answer_data in answers_data:
+                answer, answer_warnings = build_answer(
+                    session, answer_data, questions, choice_codes, code_remap, parent_answer
+                )
+                warnings.extend(answer_warnings)
+                if answer is None:
+                    continue
+                answers.append(answer)
+                if answer_data.get("sub_answers"):
+                    next_level.append((session, answer, answer_data["sub_answers"]))
+        Answer.objects.bulk_create(answers, batch_size=ANSWER_BATCH_SIZE)
+        level = next_level
+
+    return warnings, existing_count
+
+
+def _session_uuid(session_data: Dict[str, Any]) -> Optional[uuid.UUID]:
+    """Return the stable uuid of an imported session, or None if the archive has none."""
+    value = session_data.get("uuid")
+    return uuid.UUID(str(value)) if value else None
+
+
+def iter_archive_sessions(zip_file: zipfile.ZipFile, data: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """
+    Yield the sessions of an archive one at a time.
+
+    responses.ndjson is read line by line after its header and a 1.0
+    responses.json element by element, so the archive never has to fit in
+    memory. Sessions already present in data are yielded from there.
+    """
+    if "sessions" in data:
+        yield from data["sessions"]
+        return
+
+    names = zip_file.namelist()
+    if RESPONSES_FILE not in names:
+        if LEGACY_RESPONSES_FILE in names:
+            try:
+                with zip_file.open(LEGACY_RESPONSES_FILE) as member:
+                    for key, value in _iter_legacy_responses(member):
+                        if key == "sessions":
+                            yield value
+            except (ValueError, UnicodeDecodeError) as e:
+                raise ImportError(f"Invalid {LEGACY_RESPONSES_FILE}: {e}")
+        return
+
+    with zip_file.open(RESPONSES_FILE) as member:
+        member.readline()
+        for line_number, line in enumerate(member, start=2):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line.decode("utf-8"))
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                raise ImportError(f"Invalid {RESPONSES_FILE} line {line_number}: {e}")
+
+
+def count_archive_sessions(data: Dict[str, Any]) -> int:
+    """
+    Return the number of sessions an archive holds, or 0 if it does not say.
+
+    1.1 exports record session_count in the responses header, so progress
+    totals cost nothing; for older archives the total is reported as unknown
+    rather than reading the whole member twice.
+    """
+    if "sessions" in data:
+        return len(data["sessions"])
+    count = data.get("session_count")
+    return count if isinstance(count, int) and count >= 0 else 0
+
+
+def validate_session(session_data: Any, position: int) -> None:
+    """Check the shape of the session at 1-based position; raises ImportError."""
+    if not isinstance(session_data, dict):
+        raise ImportError(f"Session {position}: expected an object")
+    try:
+        _session_uuid(session_data)
+    except ValueError:
+        raise ImportError(f"Session {position}: invalid uuid '{session_data.get('uuid')}'")
+
+    def check_answers(answers, field):
+        if answers is None:
+            return
+        if not isinstance(answers, list):
+            raise ImportError(f"Session {position}: '{field}' must be a list")
+        for answer_data in answers:
+            if not isinstance(answer_data, dict) or "question_code" not in answer_data:
+                raise ImportError(f"Session {position}: answer without 'question_code'")
+            check_answers(answer_data.get("sub_answers"), "sub_answers")
+
+    check_answers(session_data.get("answers"), "answers")
+
+
+def iter_session_batches(
+    zip_file: zipfile.ZipFile,
+    data: Dict[str, Any],
+    size: int = SESSION_CHUNK_SIZE,
+    start: int = 0,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the sessions of an archive in validated lists of up to size sessions.
+
+    The first start sessions are skipped without being validated.
+    """
+    batch = []
+    for position, session_data in enumerate(iter_archive_sessions(zip_file, data), start=1):
+        if position <= start:
+            continue
+        validate_session(session_data, position)
+        batch.append(session_data)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_question_map(survey: SurveyHeader) -> Dict[str, Question]:
+    """Return code -> Question for every question of survey, in one query."""
+    return {
+        question.code: question
+        for question in Question.objects.filter(survey_section__survey_header=survey)
+    }
+
+
+def load_choice_codes(questions: Dict[str, Question]) -> Dict[int, Dict[str, Any]]:
+    """Return question id -> choice name -> code for the questions that have choices."""
+    return {
+        question.id: choice_name_to_code(question)
+        for question in questions.values() if question.choices
+    }
+
+
+def choice_name_to_code(question: Question) -> Dict[str, Any]:
+    """Build a name -> code lookup from Question.choices, covering every language."""
+    name_to_code = {}
+    for choice in question.choices or []:
+        names = choice["name"]
+        if isinstance(names, dict):
+            for lang_name in names.values():
+                name_to_code[lang_name] = choice["code"]
+        else:
+            name_to_code[names] = choice["code"]
+    return name_to_code
+
+
+def build_session(
     survey: SurveyHeader,
     session_data: Dict[str, Any]
 ) -> SurveySession:
-    """Create SurveySession from data."""
+    """Build an unsaved SurveySession from data."""
     from dateutil.parser import parse as parse_datetime
 
     start_dt = None
@@ -733,7 +1463,7 @@ def create_session(
     if session_data.get("end_datetime"):
         end_dt = parse_datetime(session_data["end_datetime"])
 
-    return SurveySession.objects.create(
+    return SurveySession(
         survey=survey,
         start_datetime=start_dt or datetime.now(),
         end_datetime=end_dt,
@@ -741,38 +1471,39 @@ def create_session(
     )
 
 
-def create_answer(
+def build_answer(
     session: SurveySession,
     answer_data: Dict[str, Any],
+    questions: Dict[str, Question],
+    choice_codes: Dict[int, Dict[str, Any]],
     code_remap: Dict[str, str],
     parent_answer: Optional[Answer] = None
 ) -> Tuple[Optional[Answer], List[str]]:
     """
-    Create Answer from data with geo parsing and choice linking.
-    Returns (answer, warnings). Answer may be None if question not found.
-    """
-    warnings = []
+    Build an unsaved Answer from data with geo parsing and choice linking.
+    Sub-answers are not built. Returns (answer, warnings). Answer is None
+    if the question is not found.
 
+    Args:
+        questions: Code -> Question map from load_question_map
+        choice_codes: Question id -> choice name -> code map
+    """
     original_code = answer_data["question_code"]
     actual_code = code_remap.get(original_code, original_code)
 
-    # Find the question
-    try:
-        question = Question.objects.get(
-            code=actual_code,
-            survey_section__survey_header=session.survey
-        )
-    except Question.DoesNotExist:
-        warnings.append(
-            f"Answer references unknown question '{original_code}', skipped"
-        )
-        return None, warnings
+    question = questions.get(actual_code)
+    if question is None:
+        return None, [f"Answer references unknown question '{original_code}', skipped"]
+
+    codes, warnings = link_choices(
+        answer_data.get("choices", []), question, choice_codes.get(question.id)
+    )
 
-    # Create answer
-    answer = Answer.objects.create(
+    answer = Answer(
         survey_session=session,
         question=question,
         parent_answer_id=parent_answer,
+        selected_choices=codes or None,
         numeric=answer_data.get("numeric"),
         text=answer_data.get("text"),
         yn=answer_data.get("yn"),
@@ -780,17 +1511,6 @@ def create_answer(
         line=wkt_to_geo(answer_data.get("line"), "line"),
         polygon=wkt_to_geo(answer_data.get("polygon"), "polygon"),
     )
-
-    # Link choices by name -> code
-    choice_names = answer_data.get("choices", [])
-    choice_warnings = link_choices(answer, choice_names, question)
-    warnings.extend(choice_warnings)
-
-    # Create sub-answers recursively
-    for sub_answer_data in answer_data.get("sub_answers", []):
-        _, sub_warnings = create_answer(session, sub_answer_data, code_remap, answer)
-        warnings.extend(sub_warnings)
-
     return answer, warnings
 
 
@@ -805,25 +1525,15 @@ def wkt_to_geo(wkt: Optional[str], field_type: str) -> Optional[GEOSGeometry]:
 
 
 def link_choices(
-    answer: Answer,
     choice_names: List[str],
-    question: Question
-) -> List[str]:
-    """Convert choice names to codes and store in answer.selected_choices."""
+    question: Question,
+    name_to_code: Optional[Dict[str, Any]]
+) -> Tuple[List[Any], List[str]]:
+    """Convert choice names to codes with the question's name -> code map; returns (codes, warnings)."""
     warnings = []
 
-    if not question.choices or not choice_names:
-        return warnings
-
-    # Build a name->code lookup from Question.choices
-    name_to_code = {}
-    for choice in question.choices:
-        names = choice["name"]
-        if isinstance(names, dict):
-            for lang_name in names.values():
-                name_to_code[lang_name] = choice["code"]
-        else:
-            name_to_code[names] = choice["code"]
+    if not name_to_code or not choice_names:
+        return [], warnings
 
     codes = []
     for name in choice_names:
@@ -831,14 +1541,10 @@ def link_choices(
             codes.append(name_to_code[name])
         else:
             warnings.append(
-                f"Choice '{name}' not found for question '{answer.question.code}', skipped"
+                f"Choice '{name}' not found for question '{question.code}', skipped"
             )
 
-    if codes:
-        answer.selected_choices = codes
-        answer.save(update_fields=['selected_choices'])
-
-    return warnings
+    return codes, warnings
 
 
 def extract_upload_images(
@@ -860,15 +1566,36 @@ def import_survey_from_zip(
     mode: Optional[str] = None,
     organization: Optional[Organization] = None,
     created_by=None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    chunk_size: Optional[int] = None,
+    resume: bool = False,
+    update_existing: bool = False,
 ) -> Tuple[Optional[SurveyHeader], List[str]]:
     """
     Import survey from ZIP archive.
 
+    By default responses are imported in a single transaction. With
+    chunk_size they are committed every chunk_size sessions instead and an
+    ImportJob keyed by the archive's SHA-256 records the checkpoint (see
+    import_responses_in_chunks). With resume, the latest unfinished job of
+    the same archive is continued: its survey and code remapping are
+    reused and the committed sessions are skipped. If there is no such job
+    the import starts from the beginning.
+
+    Sessions are upserted by their uuid: those already in the survey are
+    skipped, or replaced with update_existing, so repeated syncs of the
+    same data only add what is new.
+
     Args:
-        input_file: File-like object containing ZIP data
+        input_file: Seekable file-like object containing ZIP data
         mode: Override mode detection (None = auto-detect from archive)
         organization: Override organization (from active org context)
         created_by: User who initiated the import
+        progress: Called with (sessions done, total) while responses are imported;
+            total is 0 when the archive does not record its session count
+        chunk_size: Sessions committed per transaction (implies a checkpointed import)
+        resume: Continue the unfinished checkpointed import of this archive
+        update_existing: Replace sessions that already exist instead of skipping them
 
     Returns:
         Tuple of (created_survey_or_none, warnings)
@@ -880,6 +1607,15 @@ def import_survey_from_zip(
     survey = None
     code_remap = {}
 
+    checkpointed = bool(chunk_size) or resume
+    chunk_size = chunk_size or SESSION_CHUNK_SIZE
+    digest = archive_hash(input_file) if checkpointed else None
+    job = None
+    if resume:
+        job = ImportJob.objects.filter(archive_hash=digest).exclude(
+            status="done",
+        ).select_related('survey').order_by('-id').first()
+
     try:
         with zipfile.ZipFile(input_file, 'r') as zf:
             # Validate archive
@@ -890,8 +1626,14 @@ def import_survey_from_zip(
             survey_data = archive_info["survey_data"]
             responses_data = archive_info["responses_data"]
 
+            # The interrupted import already committed the structure
+            if job is not None:
+                survey = job.survey
+                code_remap = job.code_remap
+                has_structure = False
+
             # Data-only import requires existing survey
-            if has_data and not has_structure:
+            elif has_data and not has_structure:
                 survey_name = responses_data.get("survey_name")
                 if not survey_name:
                     raise ImportError("Data-only archive missing 'survey_name' field")
@@ -919,15 +1661,54 @@ def import_survey_from_zip(
                     )
                     warnings.extend(struct_warnings)
 
-            # Import data (in transaction)
+                    # Committed with the structure, so a resume never imports it twice
+                    if checkpointed:
+                        job = _create_import_job(digest, survey, code_remap, created_by)
+
+            if checkpointed and job is None and survey:
+                job = _create_import_job(digest, survey, code_remap, created_by)
+
+            # Import data (in one transaction, or one per chunk)
             if has_data and survey:
-                with transaction.atomic():
-                    data_warnings = import_responses_from_archive(
-                        zf, survey, code_remap, responses_data
+                if checkpointed:
+                    data_warnings = import_responses_in_chunks(
+                        zf, job, responses_data, chunk_size, progress, update_existing
                     )
-                    warnings.extend(data_warnings)
+                else:
+                    with transaction.atomic():
+                        data_warnings = import_responses_from_archive(
+                            zf, survey, code_remap, responses_data, progress, update_existing
+                        )
+                warnings.extend(data_warnings)
 
     except zipfile.BadZipFile:
         raise ImportError("Invalid ZIP archive")
 
+    if job is not None:
+        job.status = "done"
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'updated_at'])
+
     return survey, warnings
+
+
+def archive_hash(input_file: IO[bytes]) -> str:
+    """Return the SHA-256 of a seekable archive file and rewind it."""
+    digest = hashlib.sha256()
+    input_file.seek(0)
+    while True:
+        block = input_file.read(1024 * 1024)
+        if not block:
+            break
+        digest.update(block)
+    input_file.seek(0)
+    return digest.hexdigest()
+
+
+def _create_import_job(digest: str, survey: SurveyHeader, code_remap: Dict[str, str], created_by=None) -> ImportJob:
+    return ImportJob.objects.create(
+        archive_hash=digest,
+        survey=survey,
+        created_by=created_by if created_by is not None and created_by.is_authenticated else None,
+        code_remap=code_remap,
+    )
@@ -1,7 +1,13 @@
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django_registration.signals import user_registered
 
-from .models import Organization, Membership
+from .models import (
+    Organization, Membership, SurveyHeader, ExportCacheEntry, ExportJob,
+    SurveySection, SurveySectionTranslation, Question, QuestionTranslation,
+    bump_structure_version,
+)
+from .slug_cache import forget_survey_slugs
 
 
 @receiver(user_registered)
@@ -46,3 +52,54 @@ def create_personal_org_on_registration(sender, user, request, **kwargs):
             )
             invite.accepted_at = timezone.now()
             invite.save(update_fields=['accepted_at'])
+
+
+# ─── Structure snapshot invalidation ────────────────────────────────────────
+
+@receiver([post_save, post_delete], sender=SurveySection)
+def bump_version_on_section_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_structure_version(pk=instance.survey_header_id)
+
+
+@receiver([post_save, post_delete], sender=SurveySectionTranslation)
+def bump_version_on_section_translation_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_structure_version(surveysection__id=instance.section_id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def bump_version_on_question_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_structure_version(surveysection__id=instance.survey_section_id)
+
+
+@receiver([post_save, post_delete], sender=QuestionTranslation)
+def bump_version_on_question_translation_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_structure_version(surveysection__question__id=instance.question_id)
+
+
+# ─── Survey slug cache invalidation ─────────────────────────────────────────
+
+@receiver([post_save, post_delete], sender=SurveyHeader)
+def forget_slugs_on_survey_change(sender, instance, **kwargs):
+    # A saved survey may take a slug cached as missing, and deleting one of
+    # two surveys sharing a name makes that name resolve again.
+    forget_survey_slugs(instance.name, str(instance.uuid))
+
+
+# ─── Export archive cache ───────────────────────────────────────────────────
+
+@receiver(post_delete, sender=ExportCacheEntry)
+def delete_cached_archive_file(sender, instance, **kwargs):
+    # Also runs for entries removed with their survey
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+@receiver(post_delete, sender=ExportJob)
+def delete_export_job_artifact(sender, instance, **kwargs):
+    # Also runs for jobs purged by the worker or removed with their survey
+    if instance.artifact:
+        instance.artifact.delete(save=False)
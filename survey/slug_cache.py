@@ -0,0 +1,55 @@
+"""
+Negative cache of survey URL slugs.
+
+resolve_survey (survey.views) runs before every respondent page. A known
+slug costs one indexed query on SurveyHeader, which the respondent path
+needs anyway: its structure_version selects the cached snapshot (see
+survey.snapshot), so the row itself is not cached. Unknown and ambiguous
+slugs are cached as missing for a short time, so repeated 404s from
+crawlers do not reach the database. Entries are dropped when a survey is
+saved or deleted (see survey.signals), so a survey created under a
+missing slug resolves right away.
+
+That invalidation only reaches other workers through a shared cache
+backend; with the default per-process LocMemCache another worker keeps
+its entry. A UUID only becomes known when its survey is created, but a
+name can be taken by a save in another process. Missing name slugs are
+therefore kept for at most SLUG_NAME_CACHE_TIMEOUT seconds, which
+deployments with a shared CACHES backend can raise.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+SLUG_NEGATIVE_TIMEOUT = getattr(settings, 'SURVEY_SLUG_NEGATIVE_TIMEOUT', 60)
+
+# Upper bound for name slugs, which can be taken without this process noticing
+SLUG_NAME_CACHE_TIMEOUT = getattr(settings, 'SURVEY_SLUG_NAME_CACHE_TIMEOUT', 5)
+
+
+def _slug_key(slug) -> str:
+    # Names may hold characters that are not valid in memcached keys
+    return "survey:missing-slug:" + hashlib.md5(str(slug).encode()).hexdigest()
+
+
+def _timeout(slug, timeout) -> int:
+    try:
+        uuid.UUID(str(slug))
+    except ValueError:
+        return min(timeout, SLUG_NAME_CACHE_TIMEOUT)
+    return timeout
+
+
+def is_missing_slug(slug) -> bool:
+    """Return True if slug was recently found not to resolve."""
+    return cache.get(_slug_key(slug)) is not None
+
+
+def remember_missing_slug(slug) -> None:
+    cache.set(_slug_key(slug), True, _timeout(slug, SLUG_NEGATIVE_TIMEOUT))
+
+
+def forget_survey_slugs(*slugs) -> None:
+    cache.delete_many([_slug_key(slug) for slug in slugs if slug])
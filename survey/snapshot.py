@@ -0,0 +1,260 @@
+"""
+Compiled survey structure snapshots for the respondent path.
+
+A snapshot is an immutable, in-process copy of one survey's structure:
+ordered sections, top-level questions, sub-questions, translations and
+choice maps. Snapshots are cached per process and keyed by survey UUID and
+SurveyHeader.structure_version. Every change to sections, questions or their
+translations bumps the version (see survey.signals), so a request that has
+just loaded the survey row never sees a stale snapshot.
+
+Building a snapshot costs a fixed number of queries regardless of how many
+sections or questions the survey has.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from .models import (
+    SurveyHeader, SurveySection, SurveySectionTranslation,
+    Question, QuestionTranslation, localize_choice_name,
+    has_valid_positions, order_sections_by_links,
+)
+
+# Maximum number of surveys kept in the per-process cache
+SNAPSHOT_CACHE_SIZE = 128
+
+_cache: "OrderedDict[str, SurveySnapshot]" = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True, eq=False)
+class QuestionSnapshot:
+    """Read-only question; mirrors the Question helpers used by forms."""
+    id: int
+    code: str
+    order_number: int
+    name: Optional[str]
+    subtext: Optional[str]
+    input_type: str
+    choices: Optional[list]
+    required: bool
+    color: str
+    icon_class: Optional[str]
+    image_url: Optional[str]
+    translations: Dict[str, Tuple[Optional[str], Optional[str]]]
+    choice_names: Dict[Any, Any]
+    sub_questions: Tuple["QuestionSnapshot", ...]
+
+    def __str__(self):
+        return self.name or ""
+
+    def subQuestions(self):
+        return self.sub_questions
+
+    def get_translated_name(self, lang):
+        name = self.translations.get(lang, (None, None))[0] if lang else None
+        return name if name else self.name
+
+    def get_translated_subtext(self, lang):
+        subtext = self.translations.get(lang, (None, None))[1] if lang else None
+        return subtext if subtext else self.subtext
+
+    def get_choice_name(self, code, lang=None):
+        if code in self.choice_names:
+            return localize_choice_name(self.choice_names[code], lang)
+        return str(code)
+
+
+@dataclass(frozen=True, eq=False)
+class SectionSnapshot:
+    """Read-only section with its ordered top-level questions."""
+    id: int
+    name: str
+    title: Optional[str]
+    subheading: Optional[str]
+    code: str
+    is_head: bool
+    start_map_postion: Any
+    start_map_zoom: int
+    prev_name: Optional[str]
+    next_name: Optional[str]
+    position: int
+    total: int
+    translations: Dict[str, Tuple[Optional[str], Optional[str]]]
+    top_questions: Tuple[QuestionSnapshot, ...]
+    questions_by_code: Dict[str, QuestionSnapshot]
+
+    def __str__(self):
+        return self.name
+
+    def questions(self):
+        return self.top_questions
+
+    def get_translated_title(self, lang):
+        title = self.translations.get(lang, (None, None))[0] if lang else None
+        return title if title else self.title
+
+    def get_translated_subheading(self, lang):
+        subheading = self.translations.get(lang, (None, None))[1] if lang else None
+        return subheading if subheading else self.subheading
+
+
+@dataclass(frozen=True, eq=False)
+class SurveySnapshot:
+    """Read-only survey structure, sections in linked-list order."""
+    survey_id: int
+    uuid: str
+    version: int
+    sections: Tuple[SectionSnapshot, ...]
+    sections_by_name: Dict[str, SectionSnapshot]
+
+    def section(self, name) -> Optional[SectionSnapshot]:
+        return self.sections_by_name.get(name)
+
+    def section_by_id(self, section_id) -> Optional[SectionSnapshot]:
+        for section in self.sections:
+            if section.id == section_id:
+                return section
+        return None
+
+
+def _count_hops(section, by_id, attr):
+    """Count links followed from section via attr, guarding against cycles."""
+    hops = 0
+    visited = {section.id}
+    current = by_id.get(getattr(section, attr))
+    while current is not None and current.id not in visited:
+        hops += 1
+        visited.add(current.id)
+        current = by_id.get(getattr(current, attr))
+    return hops
+
+
+def _build_question(question, children, translations):
+    return QuestionSnapshot(
+        id=question.id,
+        code=question.code,
+        order_number=question.order_number,
+        name=question.name,
+        subtext=question.subtext,
+        input_type=question.input_type,
+        choices=question.choices,
+        required=question.required,
+        color=question.color,
+        icon_class=question.icon_class,
+        image_url=question.image_url,
+        translations=translations.get(question.id, {}),
+        choice_names={c["code"]: c["name"] for c in (question.choices or [])},
+        sub_questions=tuple(
+            _build_question(child, children, translations)
+            for child in children.get(question.id, [])
+        ),
+    )
+
+
+def build_survey_snapshot(survey: SurveyHeader) -> SurveySnapshot:
+    """Load the full structure of a survey in a fixed number of queries."""
+    sections = list(SurveySection.objects.filter(survey_header=survey).order_by('id'))
+
+    section_translations = {}
+    for t in SurveySectionTranslation.objects.filter(section__survey_header=survey):
+        section_translations.setdefault(t.section_id, {})[t.language] = (t.title, t.subheading)
+
+    question_translations = {}
+    for t in QuestionTranslation.objects.filter(question__survey_section__survey_header=survey):
+        question_translations.setdefault(t.question_id, {})[t.language] = (t.name, t.subtext)
+
+    top_level = {}
+    children = {}
+    for question in Question.objects.filter(
+        survey_section__survey_header=survey,
+    ).order_by('order_number', 'id'):
+        if question.parent_question_id_id is None:
+            top_level.setdefault(question.survey_section_id, []).append(question)
+        else:
+            children.setdefault(question.parent_question_id_id, []).append(question)
+
+    by_id = {s.id: s for s in sections}
+
+    # Stored positions give order, neighbours and progress directly; surveys
+    # whose positions were never computed fall back to walking the links.
+    use_positions = has_valid_positions(sections)
+    if use_positions:
+        ordered = sorted(sections, key=lambda s: s.position)
+    else:
+        ordered = order_sections_by_links(sections)
+
+    compiled = []
+    for index, section in enumerate(ordered):
+        questions = tuple(
+            _build_question(q, children, question_translations)
+            for q in top_level.get(section.id, [])
+        )
+        questions_by_code = {}
+        for q in questions:
+            questions_by_code[q.code] = q
+            for sub_q in q.sub_questions:
+                questions_by_code.setdefault(sub_q.code, sub_q)
+
+        if use_positions:
+            prev_section = ordered[index - 1] if index > 0 else None
+            next_section = ordered[index + 1] if index + 1 < len(ordered) else None
+            position = section.position
+            total = len(ordered)
+        else:
+            prev_section = by_id.get(section.prev_section_id)
+            next_section = by_id.get(section.next_section_id)
+            position = _count_hops(section, by_id, 'prev_section_id') + 1
+            total = position + _count_hops(section, by_id, 'next_section_id')
+        compiled.append(SectionSnapshot(
+            id=section.id,
+            name=section.name,
+            title=section.title,
+            subheading=section.subheading,
+            code=section.code,
+            is_head=section.is_head,
+            start_map_postion=section.start_map_postion,
+            start_map_zoom=section.start_map_zoom,
+            prev_name=prev_section.name if prev_section else None,
+            next_name=next_section.name if next_section else None,
+            position=position,
+            total=total,
+            translations=section_translations.get(section.id, {}),
+            top_questions=questions,
+            questions_by_code=questions_by_code,
+        ))
+
+    return SurveySnapshot(
+        survey_id=survey.id,
+        uuid=str(survey.uuid),
+        version=survey.structure_version,
+        sections=tuple(compiled),
+        sections_by_name={s.name: s for s in compiled},
+    )
+
+
+def get_survey_snapshot(survey: SurveyHeader) -> SurveySnapshot:
+    """Return the cached snapshot for survey, rebuilding it if the version moved."""
+    key = str(survey.uuid)
+    with _lock:
+        snapshot = _cache.get(key)
+        if snapshot is not None and snapshot.version == survey.structure_version:
+            _cache.move_to_end(key)
+            return snapshot
+
+    snapshot = build_survey_snapshot(survey)
+
+    with _lock:
+        _cache[key] = snapshot
+        _cache.move_to_end(key)
+        while len(_cache) > SNAPSHOT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return snapshot
+
+
+def clear_snapshot_cache() -> None:
+    """Drop every cached snapshot in this process."""
+    with _lock:
+        _cache.clear()
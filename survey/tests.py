@@ -1,5 +1,6 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client
 from django.contrib.auth.models import User
+from django.http import Http404, FileResponse
 from django.contrib.gis.geos import Point, LineString, Polygon
 from io import BytesIO
 import json
@@ -8,7 +9,7 @@ import zipfile
 from .models import (
     Organization, SurveyHeader, SurveySection, Question,
     SurveySession, Answer, ChoicesValidator, Story,
-    Membership, SurveyCollaborator, Invitation,
+    Membership, SurveyCollaborator, Invitation, ExportJob, ExportCacheEntry,
 )
 from .serialization import (
     serialize_survey_to_dict, serialize_sections,
@@ -25,6 +26,34 @@ def _make_org(name='TestOrg'):
     return Organization.objects.create(name=name, slug=name.lower().replace(' ', '-'))
 
 
+def _read_responses(zf):
+    """Helper to load responses.ndjson as one dict: the header plus its sessions."""
+    lines = zf.read("responses.ndjson").decode("utf-8").splitlines()
+    data = json.loads(lines[0])
+    data["sessions"] = [json.loads(line) for line in lines[1:]]
+    return data
+
+
+def _write_responses(zf, data):
+    """Helper to write a dict shaped like _read_responses output as responses.ndjson."""
+    header = {k: v for k, v in data.items() if k != "sessions"}
+    lines = [json.dumps(header)] + [json.dumps(session) for session in data["sessions"]]
+    zf.writestr("responses.ndjson", "\n".join(lines) + "\n")
+
+
+def _use_temp_media_root(test_case):
+    """Helper to send files written during a test (export cache, job artifacts) to a temporary MEDIA_ROOT."""
+    import shutil
+    import tempfile
+    from django.test import override_settings
+
+    media_root = tempfile.mkdtemp(prefix="survey-test-media-")
+    override = override_settings(MEDIA_ROOT=media_root)
+    override.enable()
+    test_case.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    test_case.addCleanup(override.disable)
+
+
 class SmokeTest(TestCase):
     """Basic smoke test to verify test infrastructure works."""
 
@@ -390,6 +419,45 @@ class DataSerializationTest(TestCase):
         self.assertIn("Poor", result)
         self.assertIn("Excellent", result)
 
+    def _answer_session(self, index):
+        session = SurveySession.objects.create(survey=self.survey)
+        sub_question = Question.objects.get(code="Q_POINT_SUB")
+        point = Answer.objects.create(survey_session=session, question=self.point_question, point=Point(30, 60 + index))
+        Answer.objects.create(survey_session=session, question=sub_question, parent_answer_id=point, text=f"note {index}")
+        Answer.objects.create(survey_session=session, question=self.choice_question, selected_choices=[5])
+        return session
+
+    def test_serialize_sessions_query_count_is_constant(self):
+        """
+        GIVEN 3 and then 13 sessions with geo answers, sub-answers and choices
+        WHEN serialize_sessions is called
+        THEN both runs issue the same number of queries and keep the nesting
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        Question.objects.create(
+            survey_section=self.section, parent_question_id=self.point_question,
+            code="Q_POINT_SUB", name="Note", input_type="text",
+        )
+        for i in range(3):
+            self._answer_session(i)
+        with CaptureQueriesContext(connection) as small:
+            serialize_sessions(self.survey)
+
+        for i in range(3, 13):
+            self._answer_session(i)
+        with CaptureQueriesContext(connection) as large:
+            result = serialize_sessions(self.survey)
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(result), 14)
+        self.assertEqual(result[0]["answers"], [])
+        last = result[-1]["answers"]
+        self.assertEqual([a["question_code"] for a in last], ["Q_POINT", "Q_CHOICE"])
+        self.assertEqual(last[0]["sub_answers"][0]["text"], "note 12")
+        self.assertEqual(last[1]["choices"], ["Excellent"])
+
 
 class ZipCreationTest(TestCase):
     """Tests for ZIP archive creation with all modes."""
@@ -430,7 +498,7 @@ class ZipCreationTest(TestCase):
         with zipfile.ZipFile(output, 'r') as zf:
             names = zf.namelist()
             self.assertIn("survey.json", names)
-            self.assertNotIn("responses.json", names)
+            self.assertNotIn("responses.ndjson", names)
 
             survey_data = json.loads(zf.read("survey.json"))
             self.assertEqual(survey_data["version"], FORMAT_VERSION)
@@ -450,9 +518,9 @@ class ZipCreationTest(TestCase):
         with zipfile.ZipFile(output, 'r') as zf:
             names = zf.namelist()
             self.assertNotIn("survey.json", names)
-            self.assertIn("responses.json", names)
+            self.assertIn("responses.ndjson", names)
 
-            responses_data = json.loads(zf.read("responses.json"))
+            responses_data = _read_responses(zf)
             self.assertEqual(responses_data["version"], FORMAT_VERSION)
             self.assertEqual(responses_data["survey_name"], "zip_test_survey")
             self.assertEqual(len(responses_data["sessions"]), 1)
@@ -470,7 +538,7 @@ class ZipCreationTest(TestCase):
         with zipfile.ZipFile(output, 'r') as zf:
             names = zf.namelist()
             self.assertIn("survey.json", names)
-            self.assertIn("responses.json", names)
+            self.assertIn("responses.ndjson", names)
 
             survey_data = json.loads(zf.read("survey.json"))
             self.assertEqual(survey_data["mode"], "full")
@@ -488,7 +556,7 @@ class ZipCreationTest(TestCase):
         with zipfile.ZipFile(output, 'r') as zf:
             names = zf.namelist()
             self.assertIn("survey.json", names)
-            self.assertNotIn("responses.json", names)
+            self.assertNotIn("responses.ndjson", names)
 
     def test_export_includes_inline_choices(self):
         """
@@ -658,7 +726,7 @@ class CLICommandTest(TestCase):
 
             with zipfile.ZipFile(output_path, 'r') as zf:
                 self.assertIn("survey.json", zf.namelist())
-                self.assertIn("responses.json", zf.namelist())
+                self.assertIn("responses.ndjson", zf.namelist())
         finally:
             import os
             os.unlink(output_path)
@@ -930,7 +998,7 @@ class RoundTripTest(TestCase):
         # Modify name in archive
         with zipfile.ZipFile(output, 'r') as zf:
             survey_json = json.loads(zf.read("survey.json"))
-            responses_json = json.loads(zf.read("responses.json"))
+            responses_json = _read_responses(zf)
 
         survey_json["survey"]["name"] = "full_roundtrip_imported"
         responses_json["survey_name"] = "full_roundtrip_imported"
@@ -938,7 +1006,7 @@ class RoundTripTest(TestCase):
         import_buffer = BytesIO()
         with zipfile.ZipFile(import_buffer, 'w') as zf:
             zf.writestr("survey.json", json.dumps(survey_json))
-            zf.writestr("responses.json", json.dumps(responses_json))
+            _write_responses(zf, responses_json)
         import_buffer.seek(0)
 
         # Import
@@ -1012,7 +1080,7 @@ class RoundTripTest(TestCase):
         # Modify name for import
         with zipfile.ZipFile(output, 'r') as zf:
             survey_json = json.loads(zf.read("survey.json"))
-            responses_json = json.loads(zf.read("responses.json"))
+            responses_json = _read_responses(zf)
 
         survey_json["survey"]["name"] = "geo_roundtrip_imported"
         responses_json["survey_name"] = "geo_roundtrip_imported"
@@ -1020,7 +1088,7 @@ class RoundTripTest(TestCase):
         import_buffer = BytesIO()
         with zipfile.ZipFile(import_buffer, 'w') as zf:
             zf.writestr("survey.json", json.dumps(survey_json))
-            zf.writestr("responses.json", json.dumps(responses_json))
+            _write_responses(zf, responses_json)
         import_buffer.seek(0)
 
         # Import
@@ -1988,6 +2056,7 @@ class WebViewTest(TestCase):
 
     def setUp(self):
         """Set up test data and client."""
+        _use_temp_media_root(self)
         self.client = Client()
         self.org = _make_org()
         self.user = User.objects.create_user(
@@ -2058,7 +2127,7 @@ class WebViewTest(TestCase):
 
         zip_buffer = BytesIO(response.content)
         with zipfile.ZipFile(zip_buffer, 'r') as zf:
-            self.assertIn("responses.json", zf.namelist())
+            self.assertIn("responses.ndjson", zf.namelist())
 
     def test_export_authenticated_full_mode(self):
         """
@@ -2074,7 +2143,7 @@ class WebViewTest(TestCase):
         zip_buffer = BytesIO(response.content)
         with zipfile.ZipFile(zip_buffer, 'r') as zf:
             self.assertIn("survey.json", zf.namelist())
-            self.assertIn("responses.json", zf.namelist())
+            self.assertIn("responses.ndjson", zf.namelist())
 
     def test_export_default_mode_is_structure(self):
         """
@@ -3489,7 +3558,7 @@ class TranslationSerializationTest(TestCase):
         output.seek(0)
 
         with zipfile.ZipFile(output, 'r') as zf:
-            responses_data = json.loads(zf.read("responses.json"))
+            responses_data = _read_responses(zf)
 
         self.assertEqual(responses_data["sessions"][0]["language"], "ru")
 
@@ -3640,7 +3709,7 @@ class TranslationSerializationTest(TestCase):
         # Modify name for import
         with zipfile.ZipFile(output, 'r') as zf:
             survey_json = json.loads(zf.read("survey.json"))
-            responses_json = json.loads(zf.read("responses.json"))
+            responses_json = _read_responses(zf)
 
         survey_json["survey"]["name"] = "imported_session_lang"
         responses_json["survey_name"] = "imported_session_lang"
@@ -3648,7 +3717,7 @@ class TranslationSerializationTest(TestCase):
         import_buffer = BytesIO()
         with zipfile.ZipFile(import_buffer, 'w') as zf:
             zf.writestr("survey.json", json.dumps(survey_json))
-            zf.writestr("responses.json", json.dumps(responses_json))
+            _write_responses(zf, responses_json)
         import_buffer.seek(0)
 
         # Import
@@ -3865,7 +3934,7 @@ class MultilingualIntegrationTest(TestCase):
         # Modify name for import
         with zipfile.ZipFile(output, 'r') as zf:
             survey_json = json.loads(zf.read("survey.json"))
-            responses_json = json.loads(zf.read("responses.json"))
+            responses_json = _read_responses(zf)
 
         survey_json["survey"]["name"] = "imported_integration_multilang"
         responses_json["survey_name"] = "imported_integration_multilang"
@@ -3873,7 +3942,7 @@ class MultilingualIntegrationTest(TestCase):
         import_buffer = BytesIO()
         with zipfile.ZipFile(import_buffer, 'w') as zf:
             zf.writestr("survey.json", json.dumps(survey_json))
-            zf.writestr("responses.json", json.dumps(responses_json))
+            _write_responses(zf, responses_json)
         import_buffer.seek(0)
 
         # Import
@@ -5949,6 +6018,7 @@ class ExportImportDeletePermissionTest(TestCase):
     """Tests for export, import, and delete permission checks."""
 
     def setUp(self):
+        _use_temp_media_root(self)
         self.org = _make_org('EIDOrg')
         self.owner = User.objects.create_user(username='eid_owner', password='pass')
         self.editor = User.objects.create_user(username='eid_editor', password='pass')
@@ -6500,3 +6570,2361 @@ class InvitationFlowTest(TestCase):
         response = self.client.get('/editor/')
         self.assertEqual(response.status_code, 200)
         self.assertNotIn('pending_invitation_token', self.client.session)
+
+
+class SurveySnapshotTest(TestCase):
+    """Tests for the compiled survey structure snapshot used by survey_section."""
+
+    def setUp(self):
+        self.org = _make_org('SnapshotOrg')
+        self.survey = SurveyHeader.objects.create(
+            name="snapshot_survey",
+            organization=self.org,
+            available_languages=["en", "ru"],
+        )
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey,
+            name="snap_sec",
+            title="Snapshot Section",
+            code="SS",
+            is_head=True,
+        )
+
+    def _add_questions(self, count):
+        for i in range(count):
+            parent = Question.objects.create(
+                survey_section=self.section,
+                name=f"Place {i}",
+                input_type="point",
+                order_number=i,
+            )
+            Question.objects.create(
+                survey_section=self.section,
+                parent_question_id=parent,
+                name=f"Why {i}",
+                input_type="choice",
+                choices=[{"code": 1, "name": {"en": "Yes", "ru": "Да"}}],
+                order_number=1,
+            )
+
+    def _count_section_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        client = Client()
+        session = client.session
+        session['survey_language'] = 'ru'
+        session.save()
+        client.get(f'/surveys/{self.survey.uuid}/snap_sec/')
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(f'/surveys/{self.survey.uuid}/snap_sec/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_query_count_independent_of_question_count(self):
+        """
+        GIVEN a section served once with 2 questions and once with 12
+        WHEN the section is requested again from a warm snapshot cache
+        THEN both requests issue the same number of queries
+        """
+        self._add_questions(2)
+        small = self._count_section_queries()
+        self._add_questions(10)
+        large = self._count_section_queries()
+        self.assertEqual(small, large)
+
+    def test_structure_change_bumps_version(self):
+        """
+        GIVEN a survey whose snapshot has been built
+        WHEN a question is added
+        THEN structure_version increases and the new question is rendered
+        """
+        from .snapshot import get_survey_snapshot
+
+        self.survey.refresh_from_db()
+        before = get_survey_snapshot(self.survey)
+        Question.objects.create(
+            survey_section=self.section,
+            name="Fresh question",
+            input_type="text",
+        )
+        self.survey.refresh_from_db()
+        self.assertGreater(self.survey.structure_version, before.version)
+        after = get_survey_snapshot(self.survey)
+        self.assertIsNot(before, after)
+        self.assertEqual(
+            [q.name for q in after.section('snap_sec').questions()],
+            ["Fresh question"],
+        )
+
+    def test_header_save_does_not_rewind_version(self):
+        """
+        GIVEN a stale SurveyHeader instance
+        WHEN it is saved with update_fields after a structure change
+        THEN structure_version keeps the newer database value
+        """
+        stale = SurveyHeader.objects.get(pk=self.survey.pk)
+        Question.objects.create(survey_section=self.section, name="Q", input_type="text")
+        stale.redirect_url = "/done/"
+        stale.save(update_fields=['redirect_url'])
+        fresh = SurveyHeader.objects.get(pk=self.survey.pk)
+        self.assertGreater(fresh.structure_version, stale.structure_version)
+        self.assertEqual(fresh.redirect_url, "/done/")
+
+    def test_snapshot_translations_and_choices(self):
+        """
+        GIVEN translated questions and localized choices
+        WHEN they are read from the snapshot
+        THEN translations and choice names fall back like the models do
+        """
+        from .models import QuestionTranslation, SurveySectionTranslation
+        from .snapshot import get_survey_snapshot
+
+        self._add_questions(1)
+        parent = Question.objects.get(survey_section=self.section, parent_question_id__isnull=True)
+        QuestionTranslation.objects.create(question=parent, language="ru", name="Место")
+        SurveySectionTranslation.objects.create(section=self.section, language="ru", title="Раздел")
+        self.survey.refresh_from_db()
+
+        section = get_survey_snapshot(self.survey).section('snap_sec')
+        question = section.questions()[0]
+        self.assertEqual(section.get_translated_title("ru"), "Раздел")
+        self.assertEqual(section.get_translated_title("de"), "Snapshot Section")
+        self.assertEqual(question.get_translated_name("ru"), "Место")
+        self.assertEqual(question.get_translated_name(None), "Place 0")
+        sub_question = question.subQuestions()[0]
+        self.assertEqual(sub_question.get_choice_name(1, "ru"), "Да")
+        self.assertEqual(sub_question.get_choice_name(1, "de"), "Yes")
+        self.assertEqual(sub_question.get_choice_name(9), "9")
+
+    def test_unknown_section_returns_404(self):
+        """
+        GIVEN a survey
+        WHEN a section name that does not exist is requested
+        THEN the response is 404
+        """
+        session = self.client.session
+        session['survey_language'] = 'en'
+        session.save()
+        response = self.client.get(f'/surveys/{self.survey.uuid}/missing/')
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkAnswerPersistenceTest(TestCase):
+    """Tests and query-count benchmark for the bulk section POST write path."""
+
+    def setUp(self):
+        self.org = _make_org('BulkOrg')
+        self.survey = SurveyHeader.objects.create(
+            name="bulk_survey",
+            organization=self.org,
+            redirect_url="/thanks/",
+        )
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey,
+            name="map_sec",
+            title="Map",
+            code="MS",
+            is_head=True,
+        )
+        self.polygon_q = Question.objects.create(
+            survey_section=self.section,
+            name="Area",
+            input_type="polygon",
+            order_number=1,
+        )
+        self.text_q = Question.objects.create(
+            survey_section=self.section,
+            name="Comment",
+            input_type="text",
+            order_number=2,
+        )
+        self.sub_questions = {
+            "text": Question.objects.create(
+                survey_section=self.section, parent_question_id=self.polygon_q,
+                name="Why", input_type="text", order_number=1,
+            ),
+            "number": Question.objects.create(
+                survey_section=self.section, parent_question_id=self.polygon_q,
+                name="How many", input_type="number", order_number=2,
+            ),
+            "choice": Question.objects.create(
+                survey_section=self.section, parent_question_id=self.polygon_q,
+                name="Like", input_type="choice", order_number=3,
+                choices=[{"code": 1, "name": "Yes"}, {"code": 2, "name": "No"}],
+            ),
+            "multichoice": Question.objects.create(
+                survey_section=self.section, parent_question_id=self.polygon_q,
+                name="Uses", input_type="multichoice", order_number=4,
+                choices=[{"code": 1, "name": "Walk"}, {"code": 2, "name": "Play"}],
+            ),
+            "range": Question.objects.create(
+                survey_section=self.section, parent_question_id=self.polygon_q,
+                name="Score", input_type="range", order_number=5,
+                choices=[{"code": 0, "name": "0"}, {"code": 10, "name": "10"}],
+            ),
+        }
+        self.url = f'/surveys/{self.survey.uuid}/map_sec/'
+
+    def _feature(self, i):
+        x = 30 + i * 0.01
+        return json.dumps({
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[x, 60], [x + 0.005, 60], [x + 0.005, 60.005], [x, 60]]],
+            },
+            "properties": {
+                "question_id": self.polygon_q.code,
+                self.sub_questions["text"].code: [f"reason {i}"],
+                self.sub_questions["number"].code: [str(i)],
+                self.sub_questions["choice"].code: ["1"],
+                self.sub_questions["multichoice"].code: ["1", "2"],
+                self.sub_questions["range"].code: ["7"],
+            },
+        })
+
+    def _post_features(self, count):
+        return self.client.post(self.url, {
+            self.polygon_q.code: "|".join(self._feature(i) for i in range(count)),
+            self.text_q.code: "hello",
+        })
+
+    def test_features_and_properties_saved(self):
+        """
+        GIVEN a polygon question with five property sub-questions
+        WHEN two features are submitted
+        THEN two parent answers with five sub-answers each are stored
+        """
+        self.client.get(self.url)
+        response = self._post_features(2)
+        self.assertEqual(response.status_code, 302)
+
+        parents = Answer.objects.filter(question=self.polygon_q, parent_answer_id__isnull=True)
+        self.assertEqual(parents.count(), 2)
+        first = parents.order_by('id').first()
+        self.assertIsNotNone(first.polygon)
+        subs = {a.question_id: a for a in Answer.objects.filter(parent_answer_id=first)}
+        self.assertEqual(len(subs), 5)
+        self.assertEqual(subs[self.sub_questions["text"].id].text, "reason 0")
+        self.assertEqual(subs[self.sub_questions["number"].id].numeric, 0.0)
+        self.assertEqual(subs[self.sub_questions["choice"].id].selected_choices, [1])
+        self.assertEqual(subs[self.sub_questions["multichoice"].id].selected_choices, [1, 2])
+        self.assertEqual(subs[self.sub_questions["range"].id].numeric, 7.0)
+        self.assertEqual(Answer.objects.get(question=self.text_q).text, "hello")
+
+    def test_unknown_property_is_ignored(self):
+        """
+        GIVEN a feature carrying a property that matches no sub-question
+        WHEN it is submitted
+        THEN the feature is saved and the unknown property is skipped
+        """
+        self.client.get(self.url)
+        feature = json.loads(self._feature(0))
+        feature["properties"]["no_such_code"] = ["x"]
+        self.client.post(self.url, {self.polygon_q.code: json.dumps(feature)})
+        parent = Answer.objects.get(question=self.polygon_q)
+        self.assertEqual(Answer.objects.filter(parent_answer_id=parent).count(), 5)
+
+    def test_query_count_constant_in_feature_count(self):
+        """
+        GIVEN a polygon section with five property sub-questions
+        WHEN 1 feature and then 30 features are submitted
+        THEN both submissions issue the same number of queries
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.get(self.url)
+        self._post_features(1)  # warm the snapshot cache
+
+        # Start from an empty session each time so both submissions are pure inserts
+        Answer.objects.all().delete()
+        with CaptureQueriesContext(connection) as small:
+            self._post_features(1)
+        Answer.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            self._post_features(30)
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(
+            Answer.objects.filter(question=self.polygon_q, parent_answer_id__isnull=True).count(),
+            30,
+        )
+        self.assertEqual(Answer.objects.filter(parent_answer_id__isnull=False).count(), 150)
+
+
+class DiffAnswerUpsertTest(TestCase):
+    """Tests for writing only the answers that changed on resubmission."""
+
+    _feature = BulkAnswerPersistenceTest._feature
+
+    def _save(self, count, comment="hello"):
+        from .answers import save_section_answers
+        from .snapshot import get_survey_snapshot
+        from django.http import QueryDict
+
+        data = QueryDict(mutable=True)
+        data[self.polygon_q.code] = "|".join(self._feature(i) for i in range(count))
+        data[self.text_q.code] = comment
+        section = get_survey_snapshot(self.survey).section("map_sec")
+        return save_section_answers(section, self.session.id, data)
+
+    def setUp(self):
+        BulkAnswerPersistenceTest.setUp(self)
+        self.session = SurveySession.objects.create(survey=self.survey)
+
+    def test_unchanged_resubmission_writes_nothing(self):
+        """
+        GIVEN a saved section with three features
+        WHEN the same data is submitted again
+        THEN no rows are created, updated or deleted and ids are kept
+        """
+        self._save(3)
+        ids = set(Answer.objects.values_list('id', flat=True))
+
+        self.assertEqual(self._save(3), {"created": 0, "updated": 0, "deleted": 0})
+        self.assertEqual(set(Answer.objects.values_list('id', flat=True)), ids)
+
+    def test_only_changed_rows_are_written(self):
+        """
+        GIVEN a saved section with three features
+        WHEN the comment changes and the last feature is removed
+        THEN one row is updated and one feature with its five properties deleted
+        """
+        self._save(3)
+        self.assertEqual(self._save(2, comment="changed"), {"created": 0, "updated": 1, "deleted": 6})
+        self.assertEqual(Answer.objects.get(question=self.text_q).text, "changed")
+        self.assertEqual(Answer.objects.filter(question=self.polygon_q).count(), 2)
+
+    def test_deletes_do_not_grow_with_removed_answers(self):
+        """
+        GIVEN saved sections with two and with twelve features
+        WHEN every feature is removed on resubmission
+        THEN both deletes issue the same number of queries
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._save(2)
+        with CaptureQueriesContext(connection) as small:
+            self._save(0)
+        self._save(12)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self._save(0)["deleted"], 12 * 6)
+        self.assertEqual(len(small), len(large))
+
+    def test_session_is_locked_before_answers_are_read(self):
+        """
+        GIVEN a saved section
+        WHEN it is submitted again
+        THEN the session row is locked before the stored answers are read
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._save(1)
+        with CaptureQueriesContext(connection) as queries:
+            self._save(2)
+
+        statements = [q['sql'] for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertIn('FOR UPDATE', statements[0])
+        self.assertIn('"survey_surveysession"', statements[0])
+        self.assertIn('"survey_answer"', statements[1])
+
+
+class ModelHelperMemoizationTest(TestCase):
+    """Tests for memoized, prefetch-aware model helper methods."""
+
+    def setUp(self):
+        self.org = _make_org('MemoOrg')
+        self.survey = SurveyHeader.objects.create(name="memo_survey", organization=self.org)
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey, name="memo_sec", code="MS", is_head=True,
+        )
+        self.parents = []
+        for i in range(3):
+            parent = Question.objects.create(
+                survey_section=self.section, name=f"Point {i}", input_type="point", order_number=i,
+            )
+            for j in (2, 1):
+                Question.objects.create(
+                    survey_section=self.section, parent_question_id=parent,
+                    name=f"Sub {i}.{j}", input_type="text", order_number=j,
+                )
+            self.parents.append(parent)
+
+    def test_helper_result_is_memoized(self):
+        """
+        GIVEN a section instance
+        WHEN questions() is evaluated twice
+        THEN only one query is issued
+        """
+        section = SurveySection.objects.get(pk=self.section.pk)
+        with self.assertNumQueries(1):
+            list(section.questions())
+            list(section.questions())
+
+    def test_invalidate_helper_cache(self):
+        """
+        GIVEN a section whose questions() result is cached
+        WHEN a question is added and the cache is invalidated
+        THEN questions() reflects the new question
+        """
+        section = SurveySection.objects.get(pk=self.section.pk)
+        self.assertEqual(len(section.questions()), 3)
+        Question.objects.create(survey_section=self.section, name="New", input_type="text", order_number=9)
+        self.assertEqual(len(section.questions()), 3)
+        section.invalidate_helper_cache()
+        self.assertEqual(len(section.questions()), 4)
+        Question.objects.create(survey_section=self.section, name="Newer", input_type="text", order_number=10)
+        section.refresh_from_db()
+        self.assertEqual(len(section.questions()), 5)
+
+    def test_sub_questions_use_prefetch_cache(self):
+        """
+        GIVEN questions loaded with prefetch_related('question_set')
+        WHEN subQuestions() is called for every question
+        THEN no extra queries are issued and order_number ordering is kept
+        """
+        questions = list(
+            Question.objects.filter(survey_section=self.section, parent_question_id__isnull=True)
+            .prefetch_related('question_set')
+        )
+        with self.assertNumQueries(0):
+            for question in questions:
+                self.assertEqual(
+                    [q.order_number for q in question.subQuestions()],
+                    [1, 2],
+                )
+
+    def test_section_questions_use_prefetch_cache(self):
+        """
+        GIVEN sections loaded with prefetch_related('question_set')
+        WHEN questions() is called
+        THEN only top-level questions are returned without extra queries
+        """
+        section = SurveySection.objects.prefetch_related('question_set').get(pk=self.section.pk)
+        with self.assertNumQueries(0):
+            names = [q.name for q in section.questions()]
+        self.assertEqual(names, ["Point 0", "Point 1", "Point 2"])
+
+    def test_sub_answers_use_prefetch_cache(self):
+        """
+        GIVEN answers loaded with their sub-answers and question tree prefetched
+        WHEN subAnswers() is called for every answer
+        THEN no extra queries are issued
+        """
+        session = SurveySession.objects.create(survey=self.survey)
+        for parent in self.parents:
+            answer = Answer.objects.create(survey_session=session, question=parent, point=Point(30, 60))
+            for sub_q in parent.subQuestions():
+                Answer.objects.create(
+                    survey_session=session, question=sub_q, parent_answer_id=answer, text=sub_q.name,
+                )
+
+        answers = list(
+            Answer.objects.filter(survey_session=session, parent_answer_id__isnull=True)
+            .select_related('question')
+            .prefetch_related('answer_set', 'question__question_set')
+        )
+        with self.assertNumQueries(0):
+            for answer in answers:
+                sub_answers = answer.subAnswers()
+                self.assertEqual(len(sub_answers), 2)
+                for sub_q, values in sub_answers.items():
+                    self.assertEqual([a.text for a in values], [sub_q.name])
+
+
+class SectionPositionTest(TestCase):
+    """Tests for stored section positions used for ordering and progress."""
+
+    def setUp(self):
+        self.org = _make_org('PositionOrg')
+        self.user = User.objects.create_user(username='positions', password='pass')
+        Membership.objects.create(user=self.user, organization=self.org, role='owner')
+        self.client.login(username='positions', password='pass')
+        self.survey = SurveyHeader.objects.create(name='position_survey', visibility='private', organization=self.org)
+        self.s1 = SurveySection.objects.create(
+            survey_header=self.survey, name='p1', title='P1', code='P1', is_head=True,
+        )
+        self.s2 = SurveySection.objects.create(survey_header=self.survey, name='p2', title='P2', code='P2')
+        self.s3 = SurveySection.objects.create(survey_header=self.survey, name='p3', title='P3', code='P3')
+        self.s1.next_section = self.s2
+        self.s1.save(update_fields=['next_section'])
+        self.s2.prev_section = self.s1
+        self.s2.next_section = self.s3
+        self.s2.save(update_fields=['prev_section', 'next_section'])
+        self.s3.prev_section = self.s2
+        self.s3.save(update_fields=['prev_section'])
+
+    def _positions(self):
+        return list(
+            SurveySection.objects.filter(survey_header=self.survey)
+            .order_by('position').values_list('name', 'position')
+        )
+
+    def test_renumber_follows_links_and_bumps_version(self):
+        """
+        GIVEN linked sections p1 → p2 → p3 without stored positions
+        WHEN renumber_sections() is called
+        THEN positions are 1..3 in link order and the structure version moves
+        """
+        self.survey.refresh_from_db()
+        version = self.survey.structure_version
+        self.survey.renumber_sections()
+        self.assertEqual(self._positions(), [('p1', 1), ('p2', 2), ('p3', 3)])
+        self.survey.refresh_from_db()
+        self.assertGreater(self.survey.structure_version, version)
+
+    def test_reorder_and_delete_keep_positions_contiguous(self):
+        """
+        GIVEN sections p1 → p2 → p3
+        WHEN they are reordered to [p3, p1, p2] and p1 is then deleted
+        THEN positions follow the new order without gaps
+        """
+        self.client.post(
+            f'/editor/surveys/{self.survey.uuid}/sections/reorder/',
+            data=json.dumps({'section_ids': [self.s3.id, self.s1.id, self.s2.id]}),
+            content_type='application/json',
+        )
+        self.assertEqual(self._positions(), [('p3', 1), ('p1', 2), ('p2', 3)])
+
+        self.client.post(f'/editor/surveys/{self.survey.uuid}/sections/{self.s1.id}/delete/')
+        self.assertEqual(self._positions(), [('p3', 1), ('p2', 2)])
+
+    def test_snapshot_progress_uses_positions(self):
+        """
+        GIVEN renumbered sections p1 → p2 → p3
+        WHEN the structure snapshot is built
+        THEN each section's position, total and neighbours come from stored positions
+        """
+        from .snapshot import build_survey_snapshot
+
+        self.survey.renumber_sections()
+        self.survey.refresh_from_db()
+        with self.assertNumQueries(4):
+            snapshot = build_survey_snapshot(self.survey)
+        middle = snapshot.section('p2')
+        self.assertEqual((middle.position, middle.total), (2, 3))
+        self.assertEqual((middle.prev_name, middle.next_name), ('p1', 'p3'))
+        self.assertEqual([s.name for s in snapshot.sections], ['p1', 'p2', 'p3'])
+
+    def test_links_changed_without_renumbering_win_over_positions(self):
+        """
+        GIVEN renumbered sections p1 → p2 → p3
+        WHEN the links are changed to p1 → p3 → p2 without renumbering
+        THEN the snapshot and the editor follow the links, not the stale positions
+        """
+        from .snapshot import build_survey_snapshot
+        from .editor_views import _get_sections_ordered
+
+        self.survey.renumber_sections()
+        SurveySection.objects.filter(id=self.s1.id).update(next_section=self.s3)
+        SurveySection.objects.filter(id=self.s3.id).update(prev_section=self.s1, next_section=self.s2)
+        SurveySection.objects.filter(id=self.s2.id).update(prev_section=self.s3, next_section=None)
+        self.survey.refresh_from_db()
+
+        snapshot = build_survey_snapshot(self.survey)
+        self.assertEqual([s.name for s in snapshot.sections], ['p1', 'p3', 'p2'])
+        self.assertEqual((snapshot.section('p3').position, snapshot.section('p3').next_name), (2, 'p2'))
+        self.assertEqual([s.name for s in _get_sections_ordered(self.survey)], ['p1', 'p3', 'p2'])
+
+
+class SectionPrefillTest(TestCase):
+    """Tests for loading saved answers back into a section."""
+
+    def setUp(self):
+        self.org = _make_org('PrefillOrg')
+        self.survey = SurveyHeader.objects.create(name="prefill_survey", organization=self.org)
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey, name="prefill_sec", title="Prefill", code="PF", is_head=True,
+        )
+        self.point_q = Question.objects.create(
+            survey_section=self.section, name="Place", input_type="point", order_number=1,
+        )
+        self.why_q = Question.objects.create(
+            survey_section=self.section, parent_question_id=self.point_q,
+            name="Why", input_type="text", order_number=1,
+        )
+        self.like_q = Question.objects.create(
+            survey_section=self.section, parent_question_id=self.point_q,
+            name="Like", input_type="multichoice", order_number=2,
+            choices=[{"code": 1, "name": "Yes"}, {"code": 2, "name": "No"}],
+        )
+        self.age_q = Question.objects.create(
+            survey_section=self.section, name="Age", input_type="number", order_number=2,
+        )
+        self.session = SurveySession.objects.create(survey=self.survey)
+
+    def _add_points(self, count):
+        for i in range(count):
+            answer = Answer.objects.create(
+                survey_session=self.session, question=self.point_q, point=Point(30.5 + i, 60.25),
+            )
+            Answer.objects.create(
+                survey_session=self.session, question=self.why_q, parent_answer_id=answer, text=f"because {i}",
+            )
+            Answer.objects.create(
+                survey_session=self.session, question=self.like_q, parent_answer_id=answer, selected_choices=[1, 2],
+            )
+
+    def _prefill(self):
+        from .answers import load_section_prefill
+        from .snapshot import build_survey_snapshot
+
+        section = build_survey_snapshot(self.survey).section("prefill_sec")
+        return load_section_prefill(section, self.session.id)
+
+    def test_prefill_builds_initial_and_features(self):
+        """
+        GIVEN a saved point with two property answers and a numeric answer
+        WHEN the section prefill is loaded
+        THEN the number becomes an initial value and the point a GeoJSON feature
+        """
+        self._add_points(1)
+        Answer.objects.create(survey_session=self.session, question=self.age_q, numeric=42)
+
+        initial, features = self._prefill()
+
+        self.assertEqual(initial, {self.age_q.code: 42})
+        self.assertEqual(features, {self.point_q.code: [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [30.5, 60.25]},
+            'properties': {
+                'question_id': self.point_q.code,
+                self.why_q.code: ['because 0'],
+                self.like_q.code: ['1', '2'],
+            },
+        }]})
+
+    def test_prefill_query_count_independent_of_feature_count(self):
+        """
+        GIVEN a session with 25 saved points, each with two property answers
+        WHEN the section prefill is loaded
+        THEN a single query fetches every answer
+        """
+        self._add_points(25)
+        from .answers import load_section_prefill
+        from .snapshot import build_survey_snapshot
+
+        section = build_survey_snapshot(self.survey).section("prefill_sec")
+        with self.assertNumQueries(1):
+            initial, features = load_section_prefill(section, self.session.id)
+        self.assertEqual(len(features[self.point_q.code]), 25)
+
+
+class SectionFragmentCacheTest(TestCase):
+    """Tests for cached popup forms and question blocks of survey sections."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .fragments import reset_fragment_cache_stats
+
+        cache.clear()
+        reset_fragment_cache_stats()
+        self.org = _make_org('FragmentOrg')
+        self.survey = SurveyHeader.objects.create(name="fragment_survey", organization=self.org)
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey, name="frag_sec", title="Fragments", code="FS", is_head=True,
+        )
+        self.point_q = Question.objects.create(
+            survey_section=self.section, name="Place", input_type="point", order_number=1,
+        )
+        self.why_q = Question.objects.create(
+            survey_section=self.section, parent_question_id=self.point_q,
+            name="Why here", input_type="text", order_number=1,
+        )
+        self.url = f'/surveys/{self.survey.uuid}/frag_sec/'
+
+    def test_second_request_hits_cache(self):
+        """
+        GIVEN a section rendered once
+        WHEN a second respondent opens it
+        THEN popup forms and the question block are served from the cache
+        """
+        from .fragments import fragment_cache_stats
+
+        self.client.get(self.url)
+        self.assertEqual(fragment_cache_stats(), {"hits": 0, "misses": 2})
+
+        response = Client().get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(fragment_cache_stats(), {"hits": 2, "misses": 2})
+        self.assertIn("Why here", response.content.decode())
+
+    def test_lookups_are_logged_with_counters(self):
+        """
+        GIVEN a section rendered once
+        WHEN it is requested again with DEBUG logging on survey.fragments
+        THEN each fragment lookup is logged with the running hit/miss counters
+        """
+        self.client.get(self.url)
+
+        with self.assertLogs('survey.fragments', level='DEBUG') as logs:
+            Client().get(self.url)
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("hit", logs.output[0])
+        self.assertIn("(hits=2, misses=2)", logs.output[1])
+
+    def test_question_change_invalidates_fragments(self):
+        """
+        GIVEN a section whose fragments are cached
+        WHEN a sub-question is renamed
+        THEN the next request renders the new name
+        """
+        self.client.get(self.url)
+        self.why_q.name = "Why there"
+        self.why_q.save()
+
+        response = Client().get(self.url)
+        content = response.content.decode()
+        self.assertIn("Why there", content)
+        self.assertNotIn("Why here", content)
+
+
+class TranslationResolverTest(TestCase):
+    """Tests for batched, versioned translation lookups on model helpers."""
+
+    def setUp(self):
+        from .models import SurveySectionTranslation, QuestionTranslation
+
+        self.org = _make_org('ResolverOrg')
+        self.survey = SurveyHeader.objects.create(
+            name="resolver_survey", organization=self.org, available_languages=["en", "ru"],
+        )
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey, name="res_sec", title="Section", code="RS", is_head=True,
+        )
+        SurveySectionTranslation.objects.create(section=self.section, language="ru", title="Раздел")
+        for i in range(5):
+            question = Question.objects.create(
+                survey_section=self.section, name=f"Question {i}", input_type="text", order_number=i,
+            )
+            QuestionTranslation.objects.create(question=question, language="ru", name=f"Вопрос {i}")
+
+    def _load_questions(self):
+        return list(
+            Question.objects.filter(survey_section=self.section)
+            .select_related('survey_section__survey_header').order_by('order_number')
+        )
+
+    def test_one_query_per_table_for_all_questions(self):
+        """
+        GIVEN five translated questions loaded with their survey
+        WHEN every translated name and the section title are resolved
+        THEN translations are loaded with two queries and then served from memory
+        """
+        from .translations import clear_translation_cache
+
+        clear_translation_cache()
+        questions = self._load_questions()
+        with self.assertNumQueries(2):
+            names = [q.get_translated_name("ru") for q in questions]
+            title = questions[0].survey_section.get_translated_title("ru")
+        self.assertEqual(names, [f"Вопрос {i}" for i in range(5)])
+        self.assertEqual(title, "Раздел")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(questions[4].get_translated_subtext("ru"), None)
+
+    def test_survey_resolved_once_per_section(self):
+        """
+        GIVEN a section loaded without its survey
+        WHEN the title and every question's name and subtext are resolved
+        THEN one survey lookup and two table loads serve all of them
+        """
+        from .translations import clear_translation_cache
+
+        clear_translation_cache()
+        section = SurveySection.objects.get(pk=self.section.pk)
+        questions = list(section.questions())
+        with self.assertNumQueries(3):
+            self.assertEqual(section.get_translated_title("ru"), "Раздел")
+            names = [q.get_translated_name("ru") for q in questions]
+            subtexts = [q.get_translated_subtext("ru") for q in questions]
+        self.assertEqual(names, [f"Вопрос {i}" for i in range(5)])
+        self.assertEqual(subtexts, [None] * 5)
+
+    def test_standalone_question_resolves_survey_once(self):
+        """
+        GIVEN a question loaded on its own with a warm translation cache
+        WHEN its name and subtext are resolved
+        THEN a single values lookup is issued
+        """
+        self._load_questions()[0].get_translated_name("ru")
+        question = Question.objects.filter(survey_section=self.section).order_by('order_number').first()
+        with self.assertNumQueries(1):
+            self.assertEqual(question.get_translated_name("ru"), "Вопрос 0")
+            self.assertIsNone(question.get_translated_subtext("ru"))
+
+    def test_translation_edit_invalidates_cache(self):
+        """
+        GIVEN translated names already resolved once
+        WHEN a translation is edited and the survey is reloaded
+        THEN the new translation is returned
+        """
+        from .models import QuestionTranslation
+
+        self._load_questions()[0].get_translated_name("ru")
+        translation = QuestionTranslation.objects.get(question__survey_section=self.section, name="Вопрос 0")
+        translation.name = "Новый вопрос"
+        translation.save()
+
+        self.assertEqual(self._load_questions()[0].get_translated_name("ru"), "Новый вопрос")
+
+
+class SurveySlugCacheTest(TestCase):
+    """Tests for survey slug resolution with negative caching."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.org = _make_org('SlugOrg')
+        self.survey = SurveyHeader.objects.create(name="slug_survey", organization=self.org)
+
+    def test_known_slug_costs_one_query(self):
+        """
+        GIVEN a name slug and a UUID slug
+        WHEN they are resolved
+        THEN each costs a single query
+        """
+        from .views import resolve_survey
+
+        for slug in ("slug_survey", str(self.survey.uuid)):
+            with self.assertNumQueries(1):
+                self.assertEqual(resolve_survey(slug), self.survey)
+
+    def test_unknown_slug_is_cached_negatively(self):
+        """
+        GIVEN a slug that matches no survey
+        WHEN it is resolved twice
+        THEN the second 404 is answered without queries
+        """
+        from .views import resolve_survey
+
+        with self.assertRaises(Http404):
+            resolve_survey("no_such_survey")
+        with self.assertNumQueries(0):
+            with self.assertRaises(Http404):
+                resolve_survey("no_such_survey")
+
+    def test_create_rename_and_delete_invalidate(self):
+        """
+        GIVEN a slug cached as missing and resolved surveys
+        WHEN a survey is created under the missing name, renamed or deleted
+        THEN resolution follows the database
+        """
+        from .views import resolve_survey
+
+        with self.assertRaises(Http404):
+            resolve_survey("late_survey")
+        late = SurveyHeader.objects.create(name="late_survey", organization=self.org)
+        self.assertEqual(resolve_survey("late_survey"), late)
+
+        resolve_survey("slug_survey")
+        self.survey.name = "renamed_survey"
+        self.survey.save()
+        with self.assertRaises(Http404):
+            resolve_survey("slug_survey")
+        self.assertEqual(resolve_survey("renamed_survey"), self.survey)
+
+        late.delete()
+        with self.assertRaises(Http404):
+            resolve_survey("late_survey")
+
+    def test_missing_name_slugs_expire_without_invalidation(self):
+        """
+        GIVEN a missing name slug and a name cache timeout of 0
+        WHEN another worker creates a survey with that name (no local invalidation)
+        THEN the name resolves to the new survey
+        """
+        from . import slug_cache
+        from .views import resolve_survey
+
+        self.addCleanup(setattr, slug_cache, 'SLUG_NAME_CACHE_TIMEOUT', slug_cache.SLUG_NAME_CACHE_TIMEOUT)
+        slug_cache.SLUG_NAME_CACHE_TIMEOUT = 0
+        with self.assertRaises(Http404):
+            resolve_survey("other_survey")
+
+        # bulk_create sends no signals, like a save in another process
+        SurveyHeader.objects.bulk_create([SurveyHeader(name="other_survey", organization=_make_org('SlugOrg2'))])
+
+        self.assertEqual(resolve_survey("other_survey").name, "other_survey")
+
+
+class QuestionAutosaveTest(TestCase):
+    """Tests for the per-question autosave endpoint."""
+
+    def setUp(self):
+        self.org = _make_org('AutosaveOrg')
+        self.survey = SurveyHeader.objects.create(name="autosave_survey", organization=self.org)
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey, name="auto_sec", title="Autosave", code="AS", is_head=True,
+        )
+        self.point_q = Question.objects.create(
+            survey_section=self.section, name="Place", input_type="point", order_number=1,
+        )
+        self.why_q = Question.objects.create(
+            survey_section=self.section, parent_question_id=self.point_q,
+            name="Why", input_type="text", order_number=1,
+        )
+        self.comment_q = Question.objects.create(
+            survey_section=self.section, name="Comment", input_type="text", order_number=2,
+        )
+        self.client.get(f'/surveys/{self.survey.uuid}/auto_sec/')
+        self.url = f'/surveys/{self.survey.uuid}/auto_sec/autosave/'
+
+    def _point(self, x, why):
+        return json.dumps({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [x, 60]},
+            "properties": {"question_id": self.point_q.code, self.why_q.code: [why]},
+        })
+
+    def test_autosave_replaces_only_one_question(self):
+        """
+        GIVEN a saved comment and one saved point
+        WHEN the point question is autosaved with two new features
+        THEN the points are replaced and the comment is untouched
+        """
+        self.client.post(self.url, {'question': self.comment_q.code, self.comment_q.code: 'hi'})
+        self.client.post(self.url, {'question': self.point_q.code, self.point_q.code: self._point(30, 'a')})
+
+        response = self.client.post(self.url, {
+            'question': self.point_q.code,
+            self.point_q.code: self._point(31, 'b') + '|' + self._point(32, 'c') + '|',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        # The old point and its property are updated in place, the second one is new
+        self.assertEqual(response.json(), {'question': self.point_q.code, 'created': 2, 'updated': 2, 'deleted': 0})
+        points = Answer.objects.filter(question=self.point_q).order_by('id')
+        self.assertEqual([p.point.x for p in points], [31, 32])
+        self.assertEqual(
+            sorted(Answer.objects.filter(question=self.why_q).values_list('text', flat=True)), ['b', 'c'],
+        )
+        self.assertEqual(Answer.objects.get(question=self.comment_q).text, 'hi')
+
+    def test_autosave_rejects_sub_question_and_unknown_codes(self):
+        """
+        GIVEN the autosave endpoint
+        WHEN a sub-question or an unknown code is posted
+        THEN it answers 400 and stores nothing
+        """
+        for code in (self.why_q.code, 'nope'):
+            response = self.client.post(self.url, {'question': code, code: 'x'})
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Answer.objects.exists())
+
+    def test_autosave_rejects_malformed_geometry(self):
+        """
+        GIVEN the autosave endpoint
+        WHEN broken GeoJSON, a geometry without coordinates or a line for a point question is posted
+        THEN it answers 400 with a JSON error and stores nothing
+        """
+        line = json.dumps({
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": [[30, 60], [31, 60]]},
+            "properties": {},
+        })
+        for value in ('{"type": "Feature"', '{"type": "Feature", "geometry": {"type": "Point"}}', line):
+            response = self.client.post(self.url, {'question': self.point_q.code, self.point_q.code: value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(self.point_q.code, response.json()['error'])
+        self.assertFalse(Answer.objects.exists())
+
+    def test_section_submit_rejects_malformed_geometry(self):
+        """
+        GIVEN the section form
+        WHEN a line is submitted for a point question
+        THEN it answers 400 naming the question and stores nothing
+        """
+        line = json.dumps({
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": [[30, 60], [31, 60]]},
+            "properties": {},
+        })
+        response = self.client.post(
+            f'/surveys/{self.survey.uuid}/auto_sec/',
+            {self.point_q.code: line, self.comment_q.code: 'hi'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(self.point_q.code, response.content.decode())
+        self.assertFalse(Answer.objects.exists())
+
+    def test_autosave_accepts_empty_range(self):
+        """
+        GIVEN a range question
+        WHEN it is autosaved with an empty value
+        THEN the request succeeds and no value is stored
+        """
+        range_q = Question.objects.create(
+            survey_section=self.section, name="Scale", input_type="range", order_number=3,
+            choices=[{"code": 1, "name": "1"}, {"code": 5, "name": "5"}],
+        )
+
+        response = self.client.post(self.url, {'question': range_q.code, range_q.code: ''})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(Answer.objects.get(question=range_q).numeric)
+
+
+class DataDownloadTest(TestCase):
+    """Tests for the streamed survey data download."""
+
+    def setUp(self):
+        _use_temp_media_root(self)
+        self.org = _make_org('DownloadOrg')
+        self.user = User.objects.create_user(username='downloader', password='pass')
+        self.client.login(username='downloader', password='pass')
+        self.survey = SurveyHeader.objects.create(name="download_survey", organization=self.org)
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey, name="dl_sec", title="Download", code="DL", is_head=True,
+        )
+        self.point_q = Question.objects.create(
+            survey_section=self.section, name="Place", input_type="point", order_number=1,
+        )
+        self.why_q = Question.objects.create(
+            survey_section=self.section, parent_question_id=self.point_q,
+            name="Why", input_type="text", order_number=1,
+        )
+        self.age_q = Question.objects.create(
+            survey_section=self.section, name="Age", input_type="number", order_number=2,
+        )
+        self.sessions = []
+        for i in range(3):
+            session = SurveySession.objects.create(survey=self.survey)
+            point = Answer.objects.create(survey_session=session, question=self.point_q, point=Point(30 + i, 60))
+            Answer.objects.create(survey_session=session, question=self.why_q, parent_answer_id=point, text=f"why {i}")
+            Answer.objects.create(survey_session=session, question=self.age_q, numeric=20 + i)
+            self.sessions.append(session)
+
+    def _download(self):
+        response = self.client.get(f'/surveys/{self.survey.name}/download')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+
+    def test_archive_contains_layers_and_csv(self):
+        """
+        GIVEN a survey with a point question and a number question answered by 3 sessions
+        WHEN the data download is requested
+        THEN the streamed archive holds a 3-feature layer and a 3-row CSV
+        """
+        archive = self._download()
+        self.assertEqual(sorted(archive.namelist()), ["Place.geojson", "download_survey.csv"])
+
+        layer = json.loads(archive.read("Place.geojson"))
+        self.assertEqual(layer["type"], "FeatureCollection")
+        self.assertEqual(layer["properties"]["survey_section"], "dl_sec")
+        self.assertEqual(len(layer["features"]), 3)
+        self.assertEqual(layer["features"][0]["geometry"], {"type": "Point", "coordinates": [30.0, 60.0]})
+        self.assertEqual(layer["features"][0]["properties"]["Why"], "why 0")
+
+        rows = archive.read("download_survey.csv").decode("utf8").splitlines()
+        self.assertEqual(len(rows), 4)
+        self.assertIn("Age", rows[0])
+
+    def test_csv_pivots_sessions_with_constant_queries(self):
+        """
+        GIVEN 3 and then 13 answering sessions, plus one session without answers
+        WHEN the CSV member is generated
+        THEN there is one row per session and the query count does not change
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .exports import sessions_csv_chunks
+
+        SurveySession.objects.create(survey=self.survey)
+        with CaptureQueriesContext(connection) as small:
+            rows = b"".join(sessions_csv_chunks(self.survey)).decode("utf8").splitlines()
+        self.assertEqual(rows[0], ",Age,session,datetime")
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1].split(",")[1], "20.0")
+        self.assertEqual(rows[4].split(",")[1], "")
+
+        for i in range(10):
+            session = SurveySession.objects.create(survey=self.survey)
+            Answer.objects.create(survey_session=session, question=self.age_q, numeric=i)
+        with CaptureQueriesContext(connection) as large:
+            rows = b"".join(sessions_csv_chunks(self.survey)).decode("utf8").splitlines()
+        self.assertEqual(len(rows), 15)
+        self.assertEqual(len(small), len(large))
+
+    def test_layer_built_with_one_query_per_question(self):
+        """
+        GIVEN a point layer exported once with 3 features and once with 13
+        WHEN the whole archive is generated
+        THEN both runs issue the same number of queries
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .exports import stream_zip, survey_data_members
+
+        with CaptureQueriesContext(connection) as small:
+            b"".join(stream_zip(survey_data_members(self.survey)))
+
+        for i in range(10):
+            session = SurveySession.objects.create(survey=self.survey)
+            point = Answer.objects.create(survey_session=session, question=self.point_q, point=Point(40, 50 + i))
+            Answer.objects.create(survey_session=session, question=self.why_q, parent_answer_id=point, text="more")
+        with CaptureQueriesContext(connection) as large:
+            archive = zipfile.ZipFile(BytesIO(b"".join(stream_zip(survey_data_members(self.survey)))))
+
+        self.assertEqual(len(small), len(large))
+        layer = json.loads(archive.read("Place.geojson"))
+        self.assertEqual(len(layer["features"]), 13)
+        self.assertEqual(layer["features"][-1]["properties"]["Why"], "more")
+
+    def test_layer_keeps_first_sub_answer(self):
+        """
+        GIVEN a feature with two answers to the same sub-question
+        WHEN the layer is generated
+        THEN the property holds the answer that was created first
+        """
+        from .exports import geo_layer_features
+
+        point = Answer.objects.get(survey_session=self.sessions[0], question=self.point_q)
+        Answer.objects.create(
+            survey_session=self.sessions[0], question=self.why_q, parent_answer_id=point, text="why again",
+        )
+        features = [json.loads(f) for f in geo_layer_features(self.point_q, [self.why_q])]
+        self.assertEqual(len(features), 3)
+        self.assertEqual(features[0]["properties"]["Why"], "why 0")
+
+    def test_unknown_download_mode_rejected(self):
+        """
+        GIVEN a survey with data
+        WHEN the download is requested with an unknown mode
+        THEN the response is 400
+        """
+        response = self.client.get(f'/surveys/{self.survey.name}/download?mode=shp')
+        self.assertEqual(response.status_code, 400)
+
+    def test_gis_layer_modes(self):
+        """
+        GIVEN a point layer with 3 features and a sub-question answer each
+        WHEN the download is requested as GeoPackage and as FlatGeobuf
+        THEN the archive holds a layer file that GDAL reads back with 3 features
+        """
+        import os
+        import tempfile
+        from django.contrib.gis.gdal import DataSource
+        from .exports import ogr_available
+
+        if not ogr_available():
+            self.skipTest("ogr2ogr is not installed")
+
+        for mode, name in (("gpkg", "download_survey.gpkg"), ("fgb", "Place.fgb")):
+            response = self.client.get(f'/surveys/{self.survey.name}/download?mode={mode}')
+            self.assertEqual(response.status_code, 200)
+            archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+            self.assertEqual(sorted(archive.namelist()), sorted([name, "download_survey.csv"]))
+
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, name)
+                with open(path, "wb") as f:
+                    f.write(archive.read(name))
+                layer = DataSource(path)[0]
+                self.assertEqual(layer.name, "Place")
+                self.assertEqual(len(layer), 3)
+                self.assertEqual(sorted(f.get("Why") for f in layer), ["why 0", "why 1", "why 2"])
+
+    def test_export_survey_gis_mode(self):
+        """
+        GIVEN a survey with a point layer
+        WHEN export_survey_to_zip runs in gpkg mode
+        THEN the archive holds the GeoPackage and the CSV but no survey.json
+        """
+        from .exports import ogr_available
+
+        if not ogr_available():
+            self.skipTest("ogr2ogr is not installed")
+
+        output = BytesIO()
+        export_survey_to_zip(self.survey, output, "gpkg")
+        names = zipfile.ZipFile(output).namelist()
+        self.assertIn("download_survey.gpkg", names)
+        self.assertIn("download_survey.csv", names)
+        self.assertNotIn("survey.json", names)
+
+
+class IncrementalExportTest(TestCase):
+    """Tests for watermark-based incremental data exports."""
+
+    def setUp(self):
+        from . import serialization
+        from datetime import timedelta
+
+        # Exact watermarks; test_timestamp_watermark_overlap covers the overlap
+        self.addCleanup(setattr, serialization, 'WATERMARK_OVERLAP', serialization.WATERMARK_OVERLAP)
+        serialization.WATERMARK_OVERLAP = timedelta(0)
+        self.org = _make_org('IncrementalOrg')
+        self.survey = SurveyHeader.objects.create(name="incremental_survey", organization=self.org)
+        self.section = SurveySection.objects.create(
+            survey_header=self.survey, name="inc_sec", code="INC", is_head=True,
+        )
+        self.question = Question.objects.create(
+            survey_section=self.section, code="Q_INC", name="Comment", input_type="text",
+        )
+        self.sessions = []
+        for i in range(3):
+            session = SurveySession.objects.create(survey=self.survey)
+            Answer.objects.create(survey_session=session, question=self.question, text=f"answer {i}")
+            self.sessions.append(session)
+
+    def _responses(self, since):
+        output = BytesIO()
+        export_survey_to_zip(self.survey, output, "data", since)
+        return _read_responses(zipfile.ZipFile(output))
+
+    def test_session_id_watermark(self):
+        """
+        GIVEN three sessions
+        WHEN data is exported since the first session's id
+        THEN only the two later sessions are exported and the watermark is the last id
+        """
+        data = self._responses(self.sessions[0].id)
+
+        self.assertEqual([s["answers"][0]["text"] for s in data["sessions"]], ["answer 1", "answer 2"])
+        self.assertEqual(data["since"], self.sessions[0].id)
+        self.assertEqual(data["watermark"]["session_id"], self.sessions[2].id)
+        self.assertEqual(data["session_count"], 2)
+
+        empty = self._responses(data["watermark"]["session_id"])
+        self.assertEqual(empty["sessions"], [])
+        self.assertEqual(empty["watermark"]["session_id"], self.sessions[2].id)
+
+    def test_timestamp_watermark_includes_modified_sessions(self):
+        """
+        GIVEN a watermark taken after a full export
+        WHEN an old session's answer is changed through the answer upsert
+        THEN the next export since the watermark contains only that session
+        """
+        from django.http import QueryDict
+        from .answers import save_question_answers
+        from .serialization import parse_watermark
+        from .snapshot import get_survey_snapshot
+
+        watermark = self._responses(None)["watermark"]["updated_at"]
+        self.assertEqual(self._responses(parse_watermark(watermark))["sessions"], [])
+
+        section = get_survey_snapshot(self.survey).section("inc_sec")
+        data = QueryDict(mutable=True)
+        data["Q_INC"] = "edited"
+        save_question_answers(section, self.sessions[0].id, section.questions()[0], data)
+
+        changed = self._responses(parse_watermark(watermark))["sessions"]
+        self.assertEqual(len(changed), 1)
+        self.assertEqual(changed[0]["answers"][0]["text"], "edited")
+
+    def test_timestamp_watermark_overlap(self):
+        """
+        GIVEN a watermark taken with a one-minute overlap
+        WHEN a session committed late carries an updated_at just before the newest exported one
+        THEN the next export since the watermark still contains it
+        """
+        from datetime import timedelta
+        from . import serialization
+
+        serialization.WATERMARK_OVERLAP = timedelta(minutes=1)
+        newest = SurveySession.objects.get(id=self.sessions[2].id).updated_at
+
+        data = self._responses(None)
+        watermark = serialization.parse_watermark(data["watermark"]["updated_at"])
+        self.assertEqual(watermark, newest - timedelta(minutes=1))
+
+        late = SurveySession.objects.create(survey=self.survey)
+        SurveySession.objects.filter(id=late.id).update(updated_at=newest - timedelta(seconds=1))
+
+        again = self._responses(watermark)
+        self.assertIn(str(late.uuid), [session["uuid"] for session in again["sessions"]])
+        # The watermark never moves back behind the one it was read from
+        self.assertGreaterEqual(serialization.parse_watermark(again["watermark"]["updated_at"]), watermark)
+
+    def test_timestamp_watermark_includes_direct_answer_edits(self):
+        """
+        GIVEN a watermark taken after a full export
+        WHEN one answer is saved directly and another session's answer is deleted
+        THEN the next export since the watermark contains both sessions
+        """
+        from .serialization import parse_watermark
+
+        watermark = parse_watermark(self._responses(None)["watermark"]["updated_at"])
+
+        answer = Answer.objects.get(survey_session=self.sessions[0])
+        answer.text = "edited"
+        answer.save()
+        Answer.objects.get(survey_session=self.sessions[1]).delete()
+
+        changed = self._responses(watermark)["sessions"]
+        self.assertEqual(len(changed), 2)
+        self.assertEqual(changed[0]["answers"][0]["text"], "edited")
+        self.assertEqual(changed[1]["answers"], [])
+
+    def test_survey_delete_does_not_grow_with_answers(self):
+        """
+        GIVEN two surveys with three and with thirty answering sessions
+        WHEN each survey is deleted
+        THEN both deletes issue the same number of queries
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        large_survey = SurveyHeader.objects.create(name="incremental_large", organization=self.org)
+        section = SurveySection.objects.create(survey_header=large_survey, name="inc_large", code="INL", is_head=True)
+        question = Question.objects.create(survey_section=section, code="Q_INL", name="Comment", input_type="text")
+        for i in range(30):
+            session = SurveySession.objects.create(survey=large_survey)
+            Answer.objects.create(survey_session=session, question=question, text=f"answer {i}")
+
+        with CaptureQueriesContext(connection) as small:
+            self.survey.delete()
+        with CaptureQueriesContext(connection) as large:
+            large_survey.delete()
+        self.assertEqual(len(small), len(large))
+        self.assertFalse(Answer.objects.exists())
+
+    def test_parse_watermark(self):
+        """
+        GIVEN session id, timestamp and malformed watermark strings
+        WHEN parse_watermark is called
+        THEN ids become ints, timestamps aware datetimes and garbage an ExportError
+        """
+        from .serialization import parse_watermark, ExportError
+
+        self.assertEqual(parse_watermark("42"), 42)
+        parsed = parse_watermark("2026-01-02T03:04:05Z")
+        self.assertEqual((parsed.year, parsed.hour, parsed.utcoffset().total_seconds()), (2026, 3, 0))
+        self.assertIsNotNone(parse_watermark("2026-01-02T03:04:05").tzinfo)
+        with self.assertRaises(ExportError):
+            parse_watermark("yesterday")
+
+    def test_command_since_option(self):
+        """
+        GIVEN three sessions
+        WHEN export_survey runs with --mode=data --since=<first session id>
+        THEN the archive contains the two later sessions
+        """
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.zip")
+            call_command(
+                'export_survey', 'incremental_survey', '--mode', 'data',
+                '--since', str(self.sessions[0].id), '--output', path,
+            )
+            data = _read_responses(zipfile.ZipFile(path))
+        self.assertEqual(len(data["sessions"]), 2)
+
+        with self.assertRaises(CommandError):
+            call_command('export_survey', 'incremental_survey', '--mode', 'structure', '--since', '1', '--output', os.devnull)
+
+
+class ExportJobTest(TestCase):
+    """Tests for background export jobs and the export worker."""
+
+    def setUp(self):
+        _use_temp_media_root(self)
+        self.org = _make_org('JobOrg')
+        self.user = User.objects.create_user(username='job_owner', password='pass')
+        Membership.objects.create(user=self.user, organization=self.org, role='owner')
+        self.client.login(username='job_owner', password='pass')
+        self.survey = SurveyHeader.objects.create(name="job_survey", organization=self.org)
+        section = SurveySection.objects.create(survey_header=self.survey, name="job_sec", code="JOB", is_head=True)
+        self.question = Question.objects.create(survey_section=section, code="Q_JOB", name="Comment", input_type="text")
+        for i in range(3):
+            session = SurveySession.objects.create(survey=self.survey)
+            Answer.objects.create(survey_session=session, question=self.question, text=f"answer {i}")
+
+    def _run_worker(self):
+        from django.core.management import call_command
+        from io import StringIO
+        call_command('run_export_worker', '--once', stdout=StringIO(), stderr=StringIO())
+
+    def test_queued_job_is_built_by_worker(self):
+        """
+        GIVEN a data export queued through the jobs endpoint
+        WHEN the worker runs once
+        THEN the job is done and its artifact downloads as a ZIP with responses.json
+        """
+        response = self.client.post(f'/editor/export/{self.survey.uuid}/jobs/', {'mode': 'data'})
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()["status_url"]
+        self.assertEqual(self.client.get(status_url).json()["status"], "queued")
+
+        self._run_worker()
+
+        status = self.client.get(status_url).json()
+        self.assertEqual((status["status"], status["progress"]), ("done", 100))
+        job = ExportJob.objects.get(id=status["id"])
+        self.addCleanup(job.artifact.delete, save=False)
+
+        download = self.client.get(status["download_url"])
+        self.assertEqual(download.status_code, 200)
+        archive = zipfile.ZipFile(BytesIO(b"".join(download.streaming_content)))
+        self.assertEqual(len(_read_responses(archive)["sessions"]), 3)
+
+    def test_large_survey_export_is_queued(self):
+        """
+        GIVEN a survey with more answers than the synchronous limit
+        WHEN the export and download views are requested
+        THEN both queue a job and redirect instead of building the archive
+        """
+        from . import jobs
+
+        limit = jobs.EXPORT_SYNC_MAX_ANSWERS
+        jobs.EXPORT_SYNC_MAX_ANSWERS = 2
+        self.addCleanup(setattr, jobs, 'EXPORT_SYNC_MAX_ANSWERS', limit)
+
+        response = self.client.get(f'/editor/export/{self.survey.uuid}/?mode=data')
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(f'/surveys/{self.survey.name}/download')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted(ExportJob.objects.values_list('kind', 'mode')),
+            [("archive", "data"), ("data", "geojson")],
+        )
+
+        # Structure exports do not depend on the amount of data
+        response = self.client.get(f'/editor/export/{self.survey.uuid}/?mode=structure')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+
+    def test_large_download_streams_for_non_member(self):
+        """
+        GIVEN a survey with more answers than the synchronous limit
+        WHEN a logged-in user outside its organization requests the data download
+        THEN the archive is streamed and no job is queued
+        """
+        from . import jobs
+
+        limit = jobs.EXPORT_SYNC_MAX_ANSWERS
+        jobs.EXPORT_SYNC_MAX_ANSWERS = 2
+        self.addCleanup(setattr, jobs, 'EXPORT_SYNC_MAX_ANSWERS', limit)
+        User.objects.create_user(username='job_outsider', password='pass')
+        self.client.login(username='job_outsider', password='pass')
+
+        response = self.client.get(f'/surveys/{self.survey.name}/download')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(BytesIO(b"".join(response.streaming_content)))
+        self.assertIn("job_survey.csv", archive.namelist())
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_organization_concurrency_limit(self):
+        """
+        GIVEN an organization already running the maximum number of jobs
+        WHEN a worker claims the next job
+        THEN the queued job of another organization is taken first
+        """
+        from .jobs import EXPORT_JOBS_PER_ORGANIZATION, claim_next_job, enqueue_export
+        from django.utils import timezone
+
+        for _ in range(EXPORT_JOBS_PER_ORGANIZATION):
+            ExportJob.objects.create(
+                survey=self.survey, organization=self.org, kind="archive", mode="full",
+                status="running", started_at=timezone.now(),
+            )
+        blocked = enqueue_export(self.survey, self.user, "archive", "data")
+        other_org = _make_org('OtherJobOrg')
+        other_survey = SurveyHeader.objects.create(name="other_job_survey", organization=other_org)
+        other = enqueue_export(other_survey, None, "archive", "structure")
+
+        self.assertEqual(claim_next_job().id, other.id)
+        self.assertIsNone(claim_next_job())
+        blocked.refresh_from_db()
+        self.assertEqual(blocked.status, "queued")
+
+    def test_repeated_requests_reuse_the_job_and_its_archive(self):
+        """
+        GIVEN a survey above the synchronous limit whose data download was requested twice
+        WHEN the worker runs and the download is requested again
+        THEN one job is queued and the third request is served from the archive cache
+        """
+        from . import jobs
+
+        limit = jobs.EXPORT_SYNC_MAX_ANSWERS
+        jobs.EXPORT_SYNC_MAX_ANSWERS = 2
+        self.addCleanup(setattr, jobs, 'EXPORT_SYNC_MAX_ANSWERS', limit)
+
+        url = f'/surveys/{self.survey.name}/download'
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+        self._run_worker()
+
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+    def test_old_jobs_are_purged_with_their_artifacts(self):
+        """
+        GIVEN a finished job older than the retention period and a recent one
+        WHEN old jobs are purged
+        THEN only the old job and its artifact are deleted
+        """
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from django.utils import timezone
+        from .jobs import EXPORT_JOB_RETENTION, purge_finished_jobs
+
+        old, recent = [
+            ExportJob.objects.create(
+                survey=self.survey, organization=self.org, kind="archive", mode="data",
+                status="done", finished_at=finished_at,
+            )
+            for finished_at in (timezone.now() - EXPORT_JOB_RETENTION * 2, timezone.now())
+        ]
+        old.artifact.save("old.zip", ContentFile(b"zip"))
+        path = old.artifact.name
+
+        self.assertEqual(purge_finished_jobs(), 1)
+        self.assertEqual(list(ExportJob.objects.values_list('id', flat=True)), [recent.id])
+        self.assertFalse(default_storage.exists(path))
+
+    def test_failed_job_records_error(self):
+        """
+        GIVEN a queued job with an invalid watermark
+        WHEN the worker runs it
+        THEN the job is failed with the error and the status endpoint reports it
+        """
+        from .jobs import enqueue_export
+
+        job = enqueue_export(self.survey, self.user, "archive", "data", since="yesterday")
+        self._run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("Invalid watermark", job.error)
+
+        status = self.client.get(f'/editor/export/{self.survey.uuid}/jobs/{job.id}/').json()
+        self.assertNotIn("download_url", status)
+
+    def test_data_job_rejects_watermark(self):
+        """
+        GIVEN a data download job requested with a since watermark
+        WHEN it is posted to the jobs endpoint
+        THEN it is rejected instead of silently exporting everything
+        """
+        response = self.client.post(
+            f'/editor/export/{self.survey.uuid}/jobs/', {'kind': 'data', 'mode': 'geojson', 'since': '1'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("since", response.json()["error"])
+        self.assertFalse(ExportJob.objects.exists())
+
+
+class ParallelExportTest(TransactionTestCase):
+    """Tests for export_survey --workers; committed rows so forked workers can read them."""
+
+    def setUp(self):
+        self.org = _make_org('ParallelOrg')
+        self.survey = SurveyHeader.objects.create(name="parallel_survey", organization=self.org)
+        section = SurveySection.objects.create(survey_header=self.survey, name="par_sec", code="PAR", is_head=True)
+        point_q = Question.objects.create(survey_section=section, code="Q_PAR_PT", name="Place", input_type="point")
+        note_q = Question.objects.create(
+            survey_section=section, parent_question_id=point_q, code="Q_PAR_NOTE", name="Note", input_type="text",
+        )
+        for i in range(7):
+            session = SurveySession.objects.create(survey=self.survey)
+            point = Answer.objects.create(survey_session=session, question=point_q, point=Point(30, 50 + i))
+            Answer.objects.create(survey_session=session, question=note_q, parent_answer_id=point, text=f"note {i}")
+
+    def test_workers_produce_the_same_sessions(self):
+        """
+        GIVEN a survey with 7 sessions
+        WHEN the command exports data with 1 and with 3 workers
+        THEN responses.json holds the same sessions in the same order
+        """
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            for workers in (1, 3):
+                path = os.path.join(directory, f"{workers}.zip")
+                call_command(
+                    'export_survey', 'parallel_survey', '--mode', 'data',
+                    '--workers', str(workers), '--output', path, stdout=StringIO(),
+                )
+                results.append(_read_responses(zipfile.ZipFile(path))["sessions"])
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(
+            [s["answers"][0]["sub_answers"][0]["text"] for s in results[1]],
+            [f"note {i}" for i in range(7)],
+        )
+
+    def test_session_id_ranges(self):
+        """
+        GIVEN 7 sessions
+        WHEN they are split into 3 ranges
+        THEN the ranges are contiguous, ordered and cover every session
+        """
+        from .serialization import _session_id_ranges
+
+        ids = list(SurveySession.objects.order_by('id').values_list('id', flat=True))
+        ranges = _session_id_ranges(ids, 3)
+        self.assertEqual(ranges, [(ids[0], ids[2]), (ids[3], ids[5]), (ids[6], ids[6])])
+
+
+class NDJSONResponsesTest(TestCase):
+    """Tests for the line-delimited responses member of format 1.1 archives."""
+
+    def setUp(self):
+        self.org = _make_org('NDJSONOrg')
+        self.survey = SurveyHeader.objects.create(name="ndjson_survey", organization=self.org)
+        section = SurveySection.objects.create(survey_header=self.survey, name="nd_sec", code="ND", is_head=True)
+        self.question = Question.objects.create(survey_section=section, code="Q_ND", name="Comment", input_type="text")
+        for i in range(3):
+            session = SurveySession.objects.create(survey=self.survey)
+            Answer.objects.create(survey_session=session, question=self.question, text=f"line {i}")
+
+    def _export(self, mode="data"):
+        output = BytesIO()
+        export_survey_to_zip(self.survey, output, mode)
+        output.seek(0)
+        return output
+
+    def test_one_session_per_line(self):
+        """
+        GIVEN a survey with 3 sessions
+        WHEN data is exported
+        THEN responses.ndjson has a header line and one compact line per session
+        """
+        with zipfile.ZipFile(self._export()) as zf:
+            lines = zf.read("responses.ndjson").decode("utf-8").splitlines()
+
+        self.assertEqual(len(lines), 4)
+        header = json.loads(lines[0])
+        self.assertEqual(header["version"], FORMAT_VERSION)
+        self.assertNotIn("sessions", header)
+        self.assertEqual([json.loads(line)["answers"][0]["text"] for line in lines[1:]], ["line 0", "line 1", "line 2"])
+        self.assertFalse(any(line.startswith(" ") or ": " in line for line in lines[1:]))
+
+    def test_ndjson_round_trip(self):
+        """
+        GIVEN a data export of the survey
+        WHEN it is imported back as data for the same survey
+        THEN the sessions are streamed in and recognized as already present
+        """
+        _, warnings = import_survey_from_zip(self._export())
+        self.assertEqual(SurveySession.objects.filter(survey=self.survey).count(), 3)
+        self.assertEqual(Answer.objects.filter(question=self.question, text="line 2").count(), 1)
+        self.assertIn("3 session(s) already imported, skipped", warnings)
+
+    def test_legacy_responses_json_is_read(self):
+        """
+        GIVEN a 1.0 archive with an indented responses.json
+        WHEN it is imported
+        THEN its sessions are created
+        """
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w') as zf:
+            zf.writestr("responses.json", json.dumps({
+                "version": "1.0",
+                "exported_at": "2026-01-01T00:00:00Z",
+                "survey_name": "ndjson_survey",
+                "sessions": [{
+                    "start_datetime": None, "end_datetime": None, "language": None,
+                    "answers": [{"question_code": "Q_ND", "text": "legacy", "sub_answers": []}],
+                }],
+            }, indent=2))
+        output.seek(0)
+
+        import_survey_from_zip(output)
+        self.assertTrue(Answer.objects.filter(question=self.question, text="legacy").exists())
+
+    def test_malformed_line_reports_line_number(self):
+        """
+        GIVEN a responses.ndjson whose third line is not JSON
+        WHEN it is imported
+        THEN ImportError names the line and nothing is imported
+        """
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w') as zf:
+            zf.writestr("responses.ndjson", "\n".join([
+                json.dumps({"version": FORMAT_VERSION, "survey_name": "ndjson_survey"}),
+                json.dumps({"answers": [{"question_code": "Q_ND", "text": "ok", "sub_answers": []}]}),
+                "{not json",
+            ]))
+        output.seek(0)
+
+        with self.assertRaises(ImportError) as context:
+            import_survey_from_zip(output)
+        self.assertIn("line 3", str(context.exception))
+        self.assertFalse(Answer.objects.filter(text="ok").exists())
+
+
+class ArchiveCacheTest(TestCase):
+    """Tests for the data-version keyed export archive cache."""
+
+    def setUp(self):
+        _use_temp_media_root(self)
+        self.org = _make_org('CacheOrg')
+        self.user = User.objects.create_user(username='cache_owner', password='pass')
+        Membership.objects.create(user=self.user, organization=self.org, role='owner')
+        self.client.login(username='cache_owner', password='pass')
+        self.survey = SurveyHeader.objects.create(name="cache_survey", organization=self.org)
+        section = SurveySection.objects.create(survey_header=self.survey, name="cache_sec", code="CA", is_head=True)
+        self.question = Question.objects.create(survey_section=section, code="Q_CA", name="Comment", input_type="text")
+        self.session = SurveySession.objects.create(survey=self.survey)
+        Answer.objects.create(survey_session=self.session, question=self.question, text="cached")
+        self.addCleanup(self._clear_cache)
+
+    def _clear_cache(self):
+        # Delete entries one by one so their files go too, before the rollback
+        for entry in ExportCacheEntry.objects.all():
+            entry.delete()
+
+    def _download(self, **headers):
+        return self.client.get(f'/surveys/{self.survey.name}/download', **headers)
+
+    def test_repeat_download_is_served_from_cache(self):
+        """
+        GIVEN a data download that was streamed once
+        WHEN the same download is requested again
+        THEN it comes from the cache with the same ETag and bytes
+        """
+        first = self._download()
+        first_bytes = b"".join(first.streaming_content)
+        self.assertEqual(ExportCacheEntry.objects.count(), 1)
+
+        second = self._download()
+        self.assertIsInstance(second, FileResponse)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(b"".join(second.streaming_content), first_bytes)
+
+    def test_if_none_match_returns_304(self):
+        """
+        GIVEN the ETag of a previous download
+        WHEN the download is requested with If-None-Match
+        THEN the response is 304 until the data changes
+        """
+        etag = self._download()["ETag"]
+
+        self.assertEqual(self._download(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        from django.http import QueryDict
+        from .answers import save_question_answers
+        from .snapshot import get_survey_snapshot
+        section = get_survey_snapshot(self.survey).section("cache_sec")
+        data = QueryDict(mutable=True)
+        data["Q_CA"] = "changed"
+        save_question_answers(section, self.session.id, section.questions()[0], data)
+
+        response = self._download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_header_edit_changes_export(self):
+        """
+        GIVEN a cached full export
+        WHEN a survey header field is edited
+        THEN the ETag changes and the new archive carries the edit
+        """
+        first = self.client.get(f'/editor/export/{self.survey.uuid}/?mode=full')
+
+        self.survey.redirect_url = "/edited/"
+        self.survey.save()
+
+        second = self.client.get(f'/editor/export/{self.survey.uuid}/?mode=full', HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second["ETag"], first["ETag"])
+        content = b"".join(second.streaming_content) if second.streaming else second.content
+        with zipfile.ZipFile(BytesIO(content)) as zf:
+            self.assertEqual(json.loads(zf.read("survey.json"))["survey"]["redirect_url"], "/edited/")
+
+    def test_export_view_uses_cache(self):
+        """
+        GIVEN a data-mode survey export
+        WHEN it is requested twice
+        THEN the second response is the cached archive
+        """
+        first = self.client.get(f'/editor/export/{self.survey.uuid}/?mode=data')
+        second = self.client.get(f'/editor/export/{self.survey.uuid}/?mode=data')
+        self.assertIsInstance(second, FileResponse)
+        self.assertEqual(b"".join(second.streaming_content), first.content)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """
+        GIVEN a cache limit that fits one archive
+        WHEN a second archive is stored
+        THEN the least recently used entry and its file are removed
+        """
+        from django.core.files.storage import default_storage
+        from . import archive_cache
+
+        limit = archive_cache.EXPORT_CACHE_MAX_BYTES
+        archive_cache.EXPORT_CACHE_MAX_BYTES = 150
+        self.addCleanup(setattr, archive_cache, 'EXPORT_CACHE_MAX_BYTES', limit)
+
+        old = archive_cache.store_archive(self.survey, "archive", "data", "a" * 40, BytesIO(b"x" * 100))
+        new = archive_cache.store_archive(self.survey, "archive", "full", "b" * 40, BytesIO(b"y" * 100))
+
+        self.assertEqual(list(ExportCacheEntry.objects.values_list('id', flat=True)), [new.id])
+        self.assertFalse(default_storage.exists(old.file.name))
+
+
+class BulkResponseImportTest(TestCase):
+    """Tests for the bulk insert of imported sessions and answers."""
+
+    def setUp(self):
+        self.org = _make_org('BulkImportOrg')
+        self.survey = SurveyHeader.objects.create(name="bulk_import_survey", organization=self.org)
+        section = SurveySection.objects.create(survey_header=self.survey, name="bulk_sec", code="BK", is_head=True)
+        self.point_q = Question.objects.create(
+            survey_section=section, code="Q_BK_POINT", name="Place", input_type="point",
+        )
+        self.sub_q = Question.objects.create(
+            survey_section=section, parent_question_id=self.point_q, code="Q_BK_KIND", name="Kind",
+            input_type="choice", choices=[{"code": 1, "name": {"en": "Park", "ru": "Парк"}}],
+        )
+
+    def _session(self, index):
+        return {
+            "start_datetime": "2026-01-01T10:00:00Z",
+            "end_datetime": None,
+            "language": "en",
+            "answers": [{
+                "question_code": "Q_BK_POINT",
+                "point": f"POINT ({index} 1)",
+                "choices": [],
+                "sub_answers": [
+                    {"question_code": "Q_BK_KIND", "choices": ["Парк", "Forest"], "sub_answers": []},
+                    {"question_code": "Q_BK_GONE", "text": "lost", "sub_answers": []},
+                ],
+            }],
+        }
+
+    def _import(self, count):
+        from .serialization import import_responses_from_archive
+        with zipfile.ZipFile(BytesIO(), 'w') as zf:
+            return import_responses_from_archive(
+                zf, self.survey, {}, {"sessions": [self._session(i) for i in range(count)]},
+            )
+
+    def test_answers_and_sub_answers_are_created(self):
+        """
+        GIVEN sessions with a point answer and nested sub-answers
+        WHEN they are imported
+        THEN answers are linked to their sessions and parents and choices are mapped to codes
+        """
+        warnings = self._import(2)
+
+        sessions = SurveySession.objects.filter(survey=self.survey).order_by('id')
+        self.assertEqual(sessions.count(), 2)
+        self.assertEqual(sessions[0].language, "en")
+        point = Answer.objects.get(survey_session=sessions[1], question=self.point_q)
+        self.assertEqual(point.point.x, 1)
+        child = Answer.objects.get(parent_answer_id=point)
+        self.assertEqual(child.survey_session_id, sessions[1].id)
+        self.assertEqual(child.selected_choices, [1])
+        self.assertIn("Choice 'Forest' not found for question 'Q_BK_KIND', skipped", warnings)
+        self.assertIn("Answer references unknown question 'Q_BK_GONE', skipped", warnings)
+
+    def test_query_count_does_not_grow_with_answers(self):
+        """
+        GIVEN archives of 1 and 50 sessions
+        WHEN they are imported
+        THEN both take the same four queries: questions, sessions, answers, sub-answers
+        """
+        with self.assertNumQueries(4):
+            self._import(1)
+        with self.assertNumQueries(4):
+            self._import(50)
+        self.assertEqual(Answer.objects.filter(question=self.sub_q).count(), 51)
+
+
+class StreamingImportTest(TestCase):
+    """Tests for incremental parsing, batch validation and progress of response imports."""
+
+    def setUp(self):
+        self.org = _make_org('StreamImportOrg')
+        self.survey = SurveyHeader.objects.create(name="stream_import_survey", organization=self.org)
+        section = SurveySection.objects.create(survey_header=self.survey, name="st_sec", code="ST", is_head=True)
+        self.question = Question.objects.create(survey_section=section, code="Q_ST", name="Note", input_type="text")
+
+    def _sessions(self, count):
+        return [
+            {"answers": [{"question_code": "Q_ST", "text": f"note {i}", "sub_answers": []}]}
+            for i in range(count)
+        ]
+
+    def _ndjson_archive(self, sessions):
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w') as zf:
+            _write_responses(zf, {
+                "version": FORMAT_VERSION, "survey_name": "stream_import_survey",
+                "session_count": len(sessions), "sessions": sessions,
+            })
+        output.seek(0)
+        return output
+
+    def test_legacy_responses_json_is_parsed_incrementally(self):
+        """
+        GIVEN a 1.0 responses.json with the header fields after the sessions
+        WHEN it is imported with a tiny read size
+        THEN every session is imported
+        """
+        from . import serialization
+        self.addCleanup(setattr, serialization, 'JSON_READ_SIZE', serialization.JSON_READ_SIZE)
+        serialization.JSON_READ_SIZE = 16
+
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w') as zf:
+            zf.writestr("responses.json", json.dumps({
+                "sessions": self._sessions(3),
+                "version": "1.0",
+                "survey_name": "stream_import_survey",
+            }, indent=2))
+        output.seek(0)
+
+        import_survey_from_zip(output)
+        self.assertEqual(
+            sorted(Answer.objects.filter(question=self.question).values_list('text', flat=True)),
+            ["note 0", "note 1", "note 2"],
+        )
+
+    def test_progress_is_reported_per_batch(self):
+        """
+        GIVEN 5 sessions and a batch size of 2
+        WHEN they are imported with a progress callback
+        THEN progress is reported after every batch
+        """
+        from . import serialization
+        self.addCleanup(setattr, serialization, 'SESSION_CHUNK_SIZE', serialization.SESSION_CHUNK_SIZE)
+        serialization.SESSION_CHUNK_SIZE = 2
+        calls = []
+
+        with zipfile.ZipFile(self._ndjson_archive(self._sessions(5))) as zf:
+            serialization.import_responses_from_archive(
+                zf, self.survey, {}, validate_archive(zf)["responses_data"],
+                lambda done, total: calls.append((done, total)),
+            )
+
+        self.assertEqual(calls, [(2, 5), (4, 5), (5, 5)])
+
+    def test_progress_total_is_unknown_without_session_count(self):
+        """
+        GIVEN an archive whose header does not record its session count
+        WHEN it is imported with a progress callback
+        THEN the total is reported as 0 instead of reading the sessions twice
+        """
+        from . import serialization
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w') as zf:
+            _write_responses(zf, {"version": "1.0", "survey_name": "stream_import_survey", "sessions": self._sessions(3)})
+        calls = []
+
+        with zipfile.ZipFile(output) as zf:
+            serialization.import_responses_from_archive(
+                zf, self.survey, {}, validate_archive(zf)["responses_data"],
+                lambda done, total: calls.append((done, total)),
+            )
+
+        self.assertEqual(calls, [(3, 0)])
+
+    def test_malformed_session_is_rejected(self):
+        """
+        GIVEN an archive whose second session has an answer without question_code
+        WHEN it is imported
+        THEN ImportError names the session and nothing is imported
+        """
+        sessions = self._sessions(2)
+        del sessions[1]["answers"][0]["question_code"]
+
+        with self.assertRaises(ImportError) as context:
+            import_survey_from_zip(self._ndjson_archive(sessions))
+        self.assertIn("Session 2", str(context.exception))
+        self.assertFalse(SurveySession.objects.filter(survey=self.survey).exists())
+
+    def test_import_command_reports_progress(self):
+        """
+        GIVEN a data archive on disk
+        WHEN import_survey is run
+        THEN the number of imported sessions is written to stderr
+        """
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as f:
+            f.write(self._ndjson_archive(self._sessions(3)).getvalue())
+        self.addCleanup(os.remove, f.name)
+
+        stderr = StringIO()
+        call_command('import_survey', f.name, stdout=StringIO(), stderr=stderr)
+        self.assertIn("Imported 3/3 sessions", stderr.getvalue())
+
+
+class BulkStructureImportTest(TestCase):
+    """Tests for set-based code allocation and bulk inserts of imported structure."""
+
+    def setUp(self):
+        self.org = _make_org('BulkStructOrg')
+
+    def _survey_data(self, name, question_count, codes=None):
+        codes = codes or [f"Q_BS_{name}_{i}" for i in range(question_count)]
+        return {
+            "version": FORMAT_VERSION,
+            "survey": {
+                "name": name,
+                "sections": [
+                    {
+                        "name": "bs_head", "code": "BH", "is_head": True, "next_section_name": "bs_tail",
+                        "translations": [{"language": "ru", "title": "Начало"}],
+                        "questions": [
+                            {
+                                "code": code, "order_number": i, "name": f"Question {i}", "input_type": "point",
+                                "translations": [{"language": "ru", "name": f"Вопрос {i}"}],
+                                "sub_questions": [
+                                    {"code": f"{code}_SUB", "order_number": 1, "name": "Why", "input_type": "text"},
+                                ],
+                            }
+                            for i, code in enumerate(codes)
+                        ],
+                    },
+                    {"name": "bs_tail", "code": "BT", "prev_section_name": "bs_head", "questions": []},
+                ],
+            },
+        }
+
+    def _import(self, data):
+        from .serialization import import_structure_from_archive
+        with zipfile.ZipFile(BytesIO(), 'w') as zf:
+            return import_structure_from_archive(zf, data, organization=self.org)
+
+    def test_query_count_does_not_grow_with_questions(self):
+        """
+        GIVEN surveys of 2 and 40 questions with sub-questions and translations
+        WHEN their structure is imported
+        THEN both imports run the same number of queries
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as small:
+            self._import(self._survey_data("bs_small", 2))
+        with CaptureQueriesContext(connection) as large:
+            survey, _, _ = self._import(self._survey_data("bs_large", 40))
+
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Question.objects.filter(survey_section__survey_header=survey).count(), 80)
+        sub = Question.objects.get(code="Q_BS_bs_large_7_SUB")
+        self.assertEqual(sub.parent_question_id.code, "Q_BS_bs_large_7")
+        self.assertEqual(sub.survey_section.name, "bs_head")
+
+    def test_sections_translations_and_links_are_created(self):
+        """
+        GIVEN two linked sections with translations
+        WHEN the structure is imported
+        THEN translations, links and positions are stored and the structure version moves on
+        """
+        from .models import QuestionTranslation, SurveySectionTranslation
+
+        survey, _, _ = self._import(self._survey_data("bs_links", 1))
+
+        head = SurveySection.objects.get(survey_header=survey, name="bs_head")
+        tail = SurveySection.objects.get(survey_header=survey, name="bs_tail")
+        self.assertEqual((head.next_section_id, head.position), (tail.id, 1))
+        self.assertEqual((tail.prev_section_id, tail.position), (head.id, 2))
+        self.assertEqual(SurveySectionTranslation.objects.get(section=head).title, "Начало")
+        self.assertEqual(QuestionTranslation.objects.get(question__code="Q_BS_bs_links_0").name, "Вопрос 0")
+        survey.refresh_from_db()
+        self.assertGreater(survey.structure_version, 0)
+
+    def test_colliding_codes_are_remapped_in_bulk(self):
+        """
+        GIVEN an archive reusing an existing code twice and a fresh code
+        WHEN the structure is imported
+        THEN the duplicates get distinct new codes and the first one is remapped
+        """
+        existing = SurveyHeader.objects.create(name="bs_existing", organization=self.org)
+        section = SurveySection.objects.create(survey_header=existing, name="bs_ex", code="BE", is_head=True)
+        Question.objects.create(survey_section=section, code="Q_BS_TAKEN", input_type="text")
+
+        survey, code_remap, _ = self._import(
+            self._survey_data("bs_collide", 3, codes=["Q_BS_TAKEN", "Q_BS_FREE", "Q_BS_TAKEN"]),
+        )
+
+        codes = list(Question.objects.filter(
+            survey_section__survey_header=survey, parent_question_id__isnull=True,
+        ).order_by('order_number').values_list('code', flat=True))
+        self.assertEqual(codes[1], "Q_BS_FREE")
+        self.assertNotIn("Q_BS_TAKEN", codes)
+        self.assertEqual(len(set(codes)), 3)
+        self.assertEqual(code_remap, {"Q_BS_TAKEN": codes[0]})
+
+
+class ResumableImportTest(TestCase):
+    """Tests for chunked imports with checkpoints and --resume."""
+
+    def setUp(self):
+        from . import serialization
+        self.org = _make_org('ResumeOrg')
+        existing = SurveyHeader.objects.create(name="resume_existing", organization=self.org)
+        section = SurveySection.objects.create(survey_header=existing, name="rs_ex", code="RE", is_head=True)
+        Question.objects.create(survey_section=section, code="Q_RS", name="Taken", input_type="text")
+        self.original_batch = serialization._import_session_batch
+        self.addCleanup(setattr, serialization, '_import_session_batch', self.original_batch)
+
+    def _archive(self):
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w') as zf:
+            zf.writestr("survey.json", json.dumps({
+                "version": FORMAT_VERSION,
+                "mode": "full",
+                "survey": {
+                    "name": "resume_full",
+                    "sections": [{
+                        "name": "rs", "code": "RS", "is_head": True,
+                        "questions": [{"code": "Q_RS", "order_number": 1, "name": "Note", "input_type": "text"}],
+                    }],
+                },
+            }))
+            _write_responses(zf, {
+                "version": FORMAT_VERSION,
+                "survey_name": "resume_full",
+                "sessions": [
+                    {"answers": [{"question_code": "Q_RS", "text": f"note {i}", "sub_answers": []}]}
+                    for i in range(5)
+                ],
+            })
+        output.seek(0)
+        return output
+
+    def _fail_on_batch(self, number):
+        from . import serialization
+        original = self.original_batch
+        calls = []
+
+        def failing(*args):
+            calls.append(1)
+            if len(calls) == number:
+                raise RuntimeError("worker killed")
+            return original(*args)
+
+        serialization._import_session_batch = failing
+
+    def test_chunked_import_records_checkpoint(self):
+        """
+        GIVEN a full archive with 5 sessions
+        WHEN it is imported with a chunk size of 2
+        THEN the import job is done with every session counted
+        """
+        from .models import ImportJob
+
+        survey, _ = import_survey_from_zip(self._archive(), chunk_size=2)
+
+        job = ImportJob.objects.get(survey=survey)
+        self.assertEqual((job.status, job.sessions_done), ("done", 5))
+        self.assertEqual(Answer.objects.filter(survey_session__survey=survey).count(), 5)
+
+    def test_resume_continues_after_last_committed_chunk(self):
+        """
+        GIVEN a chunked import that failed in its second chunk
+        WHEN the same archive is imported with resume
+        THEN the structure is not imported again and only the missing sessions are added
+        """
+        from .models import ImportJob
+
+        self._fail_on_batch(2)
+        with self.assertRaises(RuntimeError):
+            import_survey_from_zip(self._archive(), chunk_size=2)
+
+        job = ImportJob.objects.get()
+        self.assertEqual((job.status, job.sessions_done, job.error), ("failed", 2, "worker killed"))
+        self.assertEqual(SurveySession.objects.filter(survey=job.survey).count(), 2)
+
+        from . import serialization
+        serialization._import_session_batch = self.original_batch
+        statuses = []
+        survey, _ = import_survey_from_zip(
+            self._archive(), chunk_size=2, resume=True,
+            progress=lambda done, total: statuses.append(ImportJob.objects.values_list('status', 'error').get(id=job.id)),
+        )
+
+        # The resumed job shows as running, without the old error, while it runs
+        self.assertEqual(statuses, [("running", ""), ("running", "")])
+        job.refresh_from_db()
+        self.assertEqual(survey, job.survey)
+        self.assertEqual((job.status, job.sessions_done), ("done", 5))
+        self.assertEqual(SurveyHeader.objects.filter(name="resume_full").count(), 1)
+        self.assertEqual(
+            sorted(Answer.objects.filter(survey_session__survey=survey).values_list('text', flat=True)),
+            [f"note {i}" for i in range(5)],
+        )
+        remapped = Question.objects.get(survey_section__survey_header=survey)
+        self.assertNotEqual(remapped.code, "Q_RS")
+        self.assertEqual(Answer.objects.filter(question=remapped).count(), 5)
+
+    def test_resume_without_checkpoint_imports_from_start(self):
+        """
+        GIVEN no earlier import of the archive
+        WHEN it is imported with resume
+        THEN it is imported from the beginning
+        """
+        survey, _ = import_survey_from_zip(self._archive(), resume=True)
+        self.assertEqual(SurveySession.objects.filter(survey=survey).count(), 5)
+
+    def test_command_rejects_checkpoints_for_stdin(self):
+        """
+        GIVEN the import_survey command reading from stdin
+        WHEN --chunk-size or --resume is given
+        THEN it fails with a CommandError before reading the input
+        """
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        for option in (['--chunk-size', '2'], ['--resume']):
+            with self.assertRaises(CommandError):
+                call_command('import_survey', '-', *option)
+        self.assertFalse(SurveyHeader.objects.filter(name="resume_full").exists())
+
+
+
+class IdempotentImportTest(TestCase):
+    """Tests for upserting imported sessions by their stable uuid."""
+
+    def setUp(self):
+        self.org = _make_org('IdempotentOrg')
+        self.survey = SurveyHeader.objects.create(name="idem_survey", organization=self.org)
+        section = SurveySection.objects.create(survey_header=self.survey, name="id_sec", code="ID", is_head=True)
+        self.question = Question.objects.create(survey_section=section, code="Q_ID", name="Note", input_type="text")
+        self.session = SurveySession.objects.create(survey=self.survey)
+        Answer.objects.create(survey_session=self.session, question=self.question, text="original")
+
+    def _export(self, mode="data"):
+        output = BytesIO()
+        export_survey_to_zip(self.survey, output, mode)
+        output.seek(0)
+        with zipfile.ZipFile(output) as zf:
+            return {name: zf.read(name) for name in zf.namelist()}
+
+    def _archive(self, members, responses=None):
+        output = BytesIO()
+        with zipfile.ZipFile(output, 'w') as zf:
+            for name, content in members.items():
+                if name != "responses.ndjson":
+                    zf.writestr(name, content)
+            if responses is None:
+                zf.writestr("responses.ndjson", members["responses.ndjson"])
+            else:
+                _write_responses(zf, responses)
+        output.seek(0)
+        return output
+
+    def test_export_includes_session_uuid(self):
+        """
+        GIVEN a session
+        WHEN data is exported
+        THEN its line carries the session uuid
+        """
+        with zipfile.ZipFile(self._archive(self._export())) as zf:
+            responses = _read_responses(zf)
+        self.assertEqual(responses["sessions"][0]["uuid"], str(self.session.uuid))
+
+    def test_new_sessions_are_added_once(self):
+        """
+        GIVEN an archive with the existing session and a new one
+        WHEN it is imported twice
+        THEN only the new session is added, once
+        """
+        with zipfile.ZipFile(self._archive(self._export())) as zf:
+            responses = _read_responses(zf)
+        responses["sessions"].append({
+            "uuid": "6f1d4c5e-8a0b-4f7e-9d61-2b3c4d5e6f70",
+            "answers": [{"question_code": "Q_ID", "text": "new", "sub_answers": []}],
+        })
+        members = self._export()
+
+        import_survey_from_zip(self._archive(members, responses))
+        import_survey_from_zip(self._archive(members, responses))
+
+        self.assertEqual(SurveySession.objects.filter(survey=self.survey).count(), 2)
+        self.assertEqual(
+            sorted(Answer.objects.filter(question=self.question).values_list('text', flat=True)),
+            ["new", "original"],
+        )
+
+    def test_update_existing_replaces_answers(self):
+        """
+        GIVEN an archive where the existing session's answer changed
+        WHEN it is imported with update_existing
+        THEN the session keeps its id and its answers are replaced
+        """
+        members = self._export()
+        with zipfile.ZipFile(self._archive(members)) as zf:
+            responses = _read_responses(zf)
+        responses["sessions"][0]["answers"][0]["text"] = "edited"
+        responses["sessions"][0]["language"] = "ru"
+
+        _, warnings = import_survey_from_zip(self._archive(members, responses), update_existing=True)
+
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.language, "ru")
+        self.assertEqual(list(Answer.objects.filter(survey_session=self.session).values_list('text', flat=True)), ["edited"])
+        self.assertIn("1 session(s) already imported, updated", warnings)
+
+    def test_full_archive_imported_as_copy_gets_new_uuids(self):
+        """
+        GIVEN a full export imported as a new survey on the same instance
+        WHEN the import finishes
+        THEN the copy has its own sessions with new uuids
+        """
+        members = self._export("full")
+        survey_json = json.loads(members["survey.json"])
+        survey_json["survey"]["name"] = "idem_copy"
+        members["survey.json"] = json.dumps(survey_json)
+        with zipfile.ZipFile(self._archive(members)) as zf:
+            responses = _read_responses(zf)
+        responses["survey_name"] = "idem_copy"
+
+        copy, _ = import_survey_from_zip(self._archive(members, responses))
+
+        copied = SurveySession.objects.get(survey=copy)
+        self.assertNotEqual(copied.uuid, self.session.uuid)
+        self.assertEqual(SurveySession.objects.filter(survey=self.survey).count(), 1)
+
+    def test_resync_into_copy_does_not_duplicate(self):
+        """
+        GIVEN a copy of the survey on the same instance
+        WHEN the original's data archive is imported into the copy twice
+        THEN the copy holds the session once, under the same derived uuid
+        """
+        copy = SurveyHeader.objects.create(name="idem_resync", organization=self.org)
+        section = SurveySection.objects.create(survey_header=copy, name="rs_sec", code="RS", is_head=True)
+        Question.objects.create(survey_section=section, code="Q_ID_COPY", name="Note", input_type="text")
+        members = self._export()
+        with zipfile.ZipFile(self._archive(members)) as zf:
+            responses = _read_responses(zf)
+        responses["survey_name"] = "idem_resync"
+
+        import_survey_from_zip(self._archive(members, responses))
+        first = SurveySession.objects.get(survey=copy).uuid
+        _, warnings = import_survey_from_zip(self._archive(members, responses))
+
+        self.assertEqual(list(SurveySession.objects.filter(survey=copy).values_list('uuid', flat=True)), [first])
+        self.assertNotEqual(first, self.session.uuid)
+        self.assertIn("1 session(s) already imported, skipped", warnings)
+
+    def test_invalid_uuid_is_rejected(self):
+        """
+        GIVEN a session with a malformed uuid
+        WHEN it is imported
+        THEN ImportError names the session
+        """
+        responses = {"version": FORMAT_VERSION, "survey_name": "idem_survey", "sessions": [{"uuid": "nope", "answers": []}]}
+        with self.assertRaises(ImportError) as context:
+            import_survey_from_zip(self._archive({}, responses))
+        self.assertIn("Session 1: invalid uuid", str(context.exception))
@@ -0,0 +1,112 @@
+"""
+Batched translation lookups for the model-level helpers.
+
+get_translated_name/subtext on Question and get_translated_title/subheading
+on SurveySection used to run one query per call. The resolver loads every
+translation of a survey for one language at once and keeps the result in a
+per-process LRU keyed by (survey, language, structure_version); translation
+edits bump the version (see survey.signals), so entries never go stale.
+
+The (survey, structure_version) pair is memoized on the instance (see
+_translation_survey): questions returned by SurveySection.questions() or
+loaded with select_related share their section's lookup, so a batch of
+questions costs one survey lookup plus one table load per language.
+
+The respondent path reads translations from the structure snapshot (see
+survey.snapshot), which batches all languages of a survey the same way.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from .models import SurveySectionTranslation, QuestionTranslation
+
+# Maximum number of (survey, language) tables kept in the per-process cache
+TRANSLATION_CACHE_SIZE = 256
+
+_cache: "OrderedDict[Tuple[int, str], TranslationTable]" = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True, eq=False)
+class TranslationTable:
+    """All translations of one survey in one language."""
+    survey_id: int
+    language: str
+    version: int
+    sections: Dict[int, Tuple[Optional[str], Optional[str]]]
+    questions: Dict[int, Tuple[Optional[str], Optional[str]]]
+
+    def section(self, section_id) -> Tuple[Optional[str], Optional[str]]:
+        """Return (title, subheading) for a section, (None, None) if untranslated."""
+        return self.sections.get(section_id, (None, None))
+
+    def question(self, question_id) -> Tuple[Optional[str], Optional[str]]:
+        """Return (name, subtext) for a question, (None, None) if untranslated."""
+        return self.questions.get(question_id, (None, None))
+
+
+def build_translation_table(survey_id, version, language) -> TranslationTable:
+    """Load the section and question translations of a survey for language."""
+    sections = {
+        section_id: (title, subheading)
+        for section_id, title, subheading in SurveySectionTranslation.objects.filter(
+            section__survey_header_id=survey_id, language=language,
+        ).values_list('section_id', 'title', 'subheading')
+    }
+    questions = {
+        question_id: (name, subtext)
+        for question_id, name, subtext in QuestionTranslation.objects.filter(
+            question__survey_section__survey_header_id=survey_id, language=language,
+        ).values_list('question_id', 'name', 'subtext')
+    }
+    return TranslationTable(
+        survey_id=survey_id,
+        language=language,
+        version=version,
+        sections=sections,
+        questions=questions,
+    )
+
+
+def get_translations(survey, language) -> TranslationTable:
+    """Return the cached translation table of a loaded survey."""
+    return get_survey_translations(survey.id, survey.structure_version, language)
+
+
+def get_survey_translations(survey_id, version, language) -> TranslationTable:
+    """Return the cached translation table, rebuilding it if the version moved."""
+    key = (survey_id, language)
+    with _lock:
+        table = _cache.get(key)
+        if table is not None and table.version == version:
+            _cache.move_to_end(key)
+            return table
+
+    table = build_translation_table(survey_id, version, language)
+
+    with _lock:
+        _cache[key] = table
+        _cache.move_to_end(key)
+        while len(_cache) > TRANSLATION_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return table
+
+
+def section_translation(section, language) -> Tuple[Optional[str], Optional[str]]:
+    """Return (title, subheading) of section."""
+    survey_id, version = section._translation_survey()
+    return get_survey_translations(survey_id, version, language).section(section.id)
+
+
+def question_translation(question, language) -> Tuple[Optional[str], Optional[str]]:
+    """Return (name, subtext) of question."""
+    survey_id, version = question._translation_survey()
+    return get_survey_translations(survey_id, version, language).question(question.id)
+
+
+def clear_translation_cache() -> None:
+    """Drop every cached translation table in this process."""
+    with _lock:
+        _cache.clear()
@@ -8,6 +8,9 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('editor/', views.editor, name='editor'),
     path('editor/export/<uuid:survey_uuid>/', views.export_survey, name='export_survey'),
+    path('editor/export/<uuid:survey_uuid>/jobs/', views.export_job_create, name='export_job_create'),
+    path('editor/export/<uuid:survey_uuid>/jobs/<int:job_id>/', views.export_job_status, name='export_job_status'),
+    path('editor/export/<uuid:survey_uuid>/jobs/<int:job_id>/download/', views.export_job_download, name='export_job_download'),
     path('editor/import/', views.import_survey, name='import_survey'),
     path('editor/delete/<uuid:survey_uuid>/', views.delete_survey, name='delete_survey'),
 
@@ -47,6 +50,7 @@ urlpatterns = [
     path('surveys/<str:survey_slug>/language/', views.survey_language_select, name='survey_language_select'),
     path('surveys/<str:survey_slug>/thanks/', views.survey_thanks, name='survey_thanks'),
     path('surveys/<str:survey_slug>/<str:section_name>/', views.survey_section, name='section'),
+    path('surveys/<str:survey_slug>/<str:section_name>/autosave/', views.survey_question_autosave, name='section_autosave'),
     path('surveys/<str:survey_slug>/download', views.download_data, name='download_data'),
     path('stories/<slug:slug>/', views.story_detail, name='story_detail'),
     path('robots.txt', views.robots_txt, name='robots_txt'),
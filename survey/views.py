@@ -1,3 +1,4 @@
+import logging
 import uuid as uuid_mod
 
 from django.shortcuts import render, redirect, get_object_or_404
@@ -5,37 +6,45 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import models
 from django.db.models import Q
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.views.decorators.http import require_POST
 from django.utils import translation
-from .models import SurveyHeader, SurveySession, SurveySection, Answer, Question, Story, SurveyCollaborator
+from .models import SurveyHeader, SurveySession, Story, SurveyCollaborator, ExportJob
 from .permissions import (
     org_permission_required, survey_permission_required,
     get_effective_survey_role, get_org_membership, SURVEY_ROLE_RANK,
 )
-from datetime import datetime
 from django import forms
 from django.views.generic import UpdateView
 from .forms import SurveySectionAnswerForm
-from django.http import HttpResponseRedirect, Http404
+from .snapshot import get_survey_snapshot
+from .answers import AnswerDataError, save_section_answers, save_question_answers, load_section_prefill
+from .fragments import get_subquestion_forms, get_question_block
+from .exports import stream_zip, survey_data_members, DATA_FORMATS, OGR_FORMATS, ogr_available
+from .jobs import enqueue_export, job_status, should_run_in_background
+from .archive_cache import (
+    archive_key, not_modified_response, get_cached_archive, cached_archive_response,
+    caching_stream, store_archive,
+)
+from django.utils.cache import quote_etag
+from .slug_cache import is_missing_slug, remember_missing_slug
+from django.http import HttpResponseRedirect, Http404, StreamingHttpResponse, FileResponse
 from django.urls import reverse
-from django.core.serializers import serialize
 from django.db.models import Count
-import geojson
-from django.contrib.gis.geos import GEOSGeometry
-import sys
 from io import BytesIO
 import json
-from zipfile import ZipFile
-import pandas as pd
 
 from .serialization import (
     export_survey_to_zip,
     import_survey_from_zip,
+    parse_watermark,
     ImportError as SerializationImportError,
     ExportError,
     EXPORT_MODES,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class AsyncEmailRegistrationView(
     __import__('django_registration.backends.activation.views', fromlist=['RegistrationView']).RegistrationView
@@ -105,21 +114,29 @@ def resolve_survey(survey_slug):
     2. Fall back to name → lookup by SurveyHeader.name
     3. If name matches multiple surveys → raise Http404
 
+    A known slug costs one indexed query; unknown and ambiguous slugs are
+    remembered in survey.slug_cache and then cost none.
+
     Returns SurveyHeader or raises Http404.
     """
     try:
         parsed_uuid = uuid_mod.UUID(str(survey_slug))
-        return get_object_or_404(SurveyHeader, uuid=parsed_uuid)
     except (ValueError, AttributeError):
-        pass
+        parsed_uuid = None
+    slug = str(parsed_uuid) if parsed_uuid else survey_slug
 
-    surveys = SurveyHeader.objects.filter(name=survey_slug)
-    count = surveys.count()
-    if count == 1:
-        return surveys.first()
-    if count > 1:
+    if is_missing_slug(slug):
         raise Http404
-    raise Http404
+
+    if parsed_uuid:
+        surveys = list(SurveyHeader.objects.filter(uuid=parsed_uuid))
+    else:
+        # Two rows are enough to tell a unique name from an ambiguous one
+        surveys = list(SurveyHeader.objects.filter(name=survey_slug)[:2])
+    if len(surveys) != 1:
+        remember_missing_slug(slug)
+        raise Http404
+    return surveys[0]
 
 def index(request):
 	surveys = (
@@ -168,6 +185,9 @@ def editor(request):
 	context = {
 		"survey_headers": survey_list,
 		"org_role": org_role,
+		"export_jobs": ExportJob.objects.filter(
+			survey__in=survey_list, requested_by=request.user,
+		).select_related('survey').order_by('-created_at')[:10],
 	}
 	return render(request, "editor.html", context)
 
@@ -299,105 +319,26 @@ def survey_section(request, survey_slug, section_name):
 		survey_session.save()
 		request.session['survey_session_id'] = survey_session.id
 
-	section = SurveySection.objects.get(Q(survey_header=survey) & Q(name=section_name))
+	section = get_survey_snapshot(survey).section(section_name)
+	if section is None:
+		raise Http404
 
-	# Compute progress: current section index (1-based) and total sections
-	section_current = 1
-	s = section
-	while s.prev_section:
-		s = s.prev_section
-		section_current += 1
-	section_total = section_current
-	s = section
-	while s.next_section:
-		s = s.next_section
-		section_total += 1
+	# Progress: current section index (1-based) and total sections
+	section_current = section.position
+	section_total = section.total
 
 	if request.method == 'POST':
-		form = SurveySectionAnswerForm(initial=request.POST, section=section, question=None, survey_session_id=request.session['survey_session_id'], language=selected_language)
-
-		#save data to answers
-		section_questions = section.questions()
-		survey_session = SurveySession.objects.get(pk=request.session['survey_session_id'])
-
-		# Delete existing answers for this session and section before saving new ones
-		section_question_ids = [q.id for q in section_questions]
-		Answer.objects.filter(
-			survey_session=survey_session,
-			question_id__in=section_question_ids,
-			parent_answer_id__isnull=True,
-		).delete()
-
-		for question in section_questions:
-			result = request.POST.getlist(question.code)
-
-			if (result != []):
-				if not question.choices:
-					result = result[0]
-					if (question.input_type in ['point', 'line', 'polygon']):
-						geostr_list = result.split('|')
-						for geostr in geostr_list:
-							if geostr != '':
-								answer = Answer(survey_session=survey_session, question=question)
-
-								gj = geojson.loads(geostr)
-								geometry = geojson.dumps(gj['geometry'])
-								resultToSave = GEOSGeometry(geometry)
-
-								if question.input_type == "point":
-									answer.point = resultToSave
-								elif question.input_type == "line":
-									answer.line = resultToSave
-								elif question.input_type == "polygon":
-									answer.polygon = resultToSave
-
-								answer.save()
-
-								#сохранить properties как ответы наследники
-								properties = gj['properties'];
-								for key, value in properties.items():
-									if key != 'question_id':
-										sub_question = Question.objects.get(Q(survey_section=section) & Q(code=key))
-										sub_answer = Answer(survey_session=survey_session, question=sub_question, parent_answer_id = answer)
-										if not sub_question.choices:
-											if (sub_question.input_type == 'text' or sub_question.input_type == 'text_line') and value and value[0]:
-												sub_answer.text = value[0]
-											elif sub_question.input_type == 'number' and value and value[0]:
-												sub_answer.numeric = float(value[0])
-											else:
-												pass
-										else:
-											if(sub_question.input_type == 'range') and value and value[0]:
-												sub_answer.numeric = float(value[0])
-											else:
-												sub_answer.selected_choices = [int(v) for v in value if v]
-										sub_answer.save()
-
-
-					else:
-						answer = Answer(survey_session=survey_session, question=question)
-
-						if (question.input_type == "text" or question.input_type == "text_line"):
-							answer.text = result
-						elif question.input_type == "number":
-							if result:
-								answer.numeric = float(result)
-						else:
-							pass
-
-						answer.save()
-
-				else:
-					answer = Answer(survey_session=survey_session, question=question)
-					if  question.input_type == "range":
-						answer.numeric = float(result[0])
-					else:
-						answer.selected_choices = [int(r) for r in result if r]
-
-					answer.save()
-
-		if section.next_section:
-			next_page = "../" + section.next_section.name
+		try:
+			saved = save_section_answers(section, request.session['survey_session_id'], request.POST)
+		except AnswerDataError as e:
+			return HttpResponseBadRequest(str(e))
+		logger.debug(
+			"Saved section %s of session %s: %d created, %d updated, %d deleted",
+			section.name, request.session['survey_session_id'], saved["created"], saved["updated"], saved["deleted"],
+		)
+
+		if section.next_name:
+			next_page = "../" + section.next_name
 		elif survey.redirect_url == "#":
 			next_page = reverse('survey_thanks', args=[str(survey.uuid)])
 		else:
@@ -405,78 +346,18 @@ def survey_section(request, survey_slug, section_name):
 		return HttpResponseRedirect(next_page)
 
 	else:
-		questions = section.questions()
-
-		# Query existing answers for this session and section
-		existing_answers = Answer.objects.filter(
-			survey_session_id=request.session['survey_session_id'],
-			question__in=questions,
-			parent_answer_id__isnull=True,
-		).select_related('question')
-
-		# Build initial dict for scalar fields and geo GeoJSON for geo fields
-		initial = {}
-		existing_geo_answers = {}
-		answers_by_question = {}
-		for answer in existing_answers:
-			q = answer.question
-			answers_by_question.setdefault(q.code, []).append(answer)
-
-		for question in questions:
-			q_answers = answers_by_question.get(question.code, [])
-			if not q_answers:
-				continue
-
-			if question.input_type in ('point', 'line', 'polygon'):
-				# Build GeoJSON features for geo answers
-				features = []
-				for answer in q_answers:
-					geometry = getattr(answer, question.input_type)
-					if geometry is None:
-						continue
-					feature = {
-						'type': 'Feature',
-						'geometry': json.loads(geometry.geojson),
-						'properties': {'question_id': question.code},
-					}
-					# Add sub-question values
-					child_answers = Answer.objects.filter(parent_answer_id=answer).select_related('question')
-					for child in child_answers:
-						sub_q = child.question
-						if child.text is not None:
-							feature['properties'][sub_q.code] = [child.text]
-						elif child.numeric is not None:
-							feature['properties'][sub_q.code] = [str(child.numeric)]
-						elif child.selected_choices:
-							feature['properties'][sub_q.code] = [str(c) for c in child.selected_choices]
-					features.append(feature)
-				if features:
-					existing_geo_answers[question.code] = features
-			else:
-				answer = q_answers[0]
-				if question.input_type in ('text', 'text_line', 'datetime'):
-					if answer.text is not None:
-						initial[question.code] = answer.text
-				elif question.input_type == 'number':
-					if answer.numeric is not None:
-						initial[question.code] = answer.numeric
-				elif question.input_type in ('choice', 'rating'):
-					if answer.selected_choices:
-						initial[question.code] = str(answer.selected_choices[0])
-					elif answer.numeric is not None:
-						initial[question.code] = str(int(answer.numeric))
-				elif question.input_type == 'multichoice':
-					if answer.selected_choices:
-						initial[question.code] = [str(c) for c in answer.selected_choices]
-				elif question.input_type == 'range':
-					if answer.numeric is not None:
-						initial[question.code] = int(answer.numeric)
+		# Prefill from answers already saved for this session and section
+		initial, existing_geo_answers = load_section_prefill(section, request.session['survey_session_id'])
 
 		form = SurveySectionAnswerForm(initial=initial, section=section, question=None, survey_session_id=request.session['survey_session_id'], language=selected_language)
 
+		# Popup forms and the unfilled question block are shared by all respondents
 		subquestions_forms = {}
-		for question in questions:
-			subquestions_forms[question.code] = SurveySectionAnswerForm(initial={}, section=section, question=question, survey_session_id=request.session['survey_session_id'], language=selected_language).as_p().replace("/script", "\/script")
+		for code, html in get_subquestion_forms(section, selected_language, survey.structure_version).items():
+			subquestions_forms[code] = html.replace("/script", "\/script")
+		question_block = None
+		if not initial:
+			question_block = get_question_block(section, selected_language, survey.structure_version)
 
 		existing_geo_answers_json = json.dumps(existing_geo_answers)
 
@@ -488,6 +369,7 @@ def survey_section(request, survey_slug, section_name):
 	return render(request, 'survey_section.html', {
 		'form': form,
 		'subquestions_forms': subquestions_forms,
+		'question_block': question_block,
 		'survey': survey,
 		'section': section,
 		'section_title': section_title,
@@ -498,140 +380,64 @@ def survey_section(request, survey_slug, section_name):
 		'section_total': section_total,
 	})
 
+@require_POST
+def survey_question_autosave(request, survey_slug, section_name):
+	"""Save the answers to one question of a section while the respondent edits.
+
+	Expects the same form encoding as the section form plus a 'question'
+	field naming the top-level question code. Responds with JSON.
+	"""
+	survey = resolve_survey(survey_slug)
+
+	survey_session_id = request.session.get('survey_session_id')
+	if not survey_session_id:
+		return JsonResponse({'error': 'No survey session'}, status=400)
+
+	section = get_survey_snapshot(survey).section(section_name)
+	if section is None:
+		raise Http404
+
+	question = section.questions_by_code.get(request.POST.get('question'))
+	if question is None or question not in section.questions():
+		return JsonResponse({'error': 'Unknown question'}, status=400)
+
+	try:
+		saved = save_question_answers(section, survey_session_id, question, request.POST)
+	except AnswerDataError as e:
+		return JsonResponse({'error': str(e)}, status=400)
+	return JsonResponse({'question': question.code, **saved})
+
 @login_required
 def download_data(request, survey_slug):
-	in_memory = BytesIO()
-	zip = ZipFile(in_memory, "a")
-
 	survey = resolve_survey(survey_slug)
-	
-	#обработка гео вопросов
-	geo_questions = survey.geo_questions()	
-
-	for question in geo_questions:
-		
-		layer_properties = {
-			"survey": question.survey_section.survey_header.name,
-			"survey_section": question.survey_section.name,
-			"required": question.required,
-		}
-
-		#layer_str = geojson_template.format(layer_name = question.name, properties=layer_properties)
-
-		#получить ответы
-		features = []
-		answers = question.answers()
-		for answer in answers:
-			#получить геометрию
-			geo_type = question.input_type
-			if geo_type == "polygon":
-				coordinates =  [[[i[0],i[1]] for i in answer.polygon.coords[0]]]
-				geometry_type = "Polygon"
-			elif geo_type == "line":
-				coordinates =  [[i[0],i[1]] for i in answer.line.coords]
-				geometry_type = "LineString"
-			elif geo_type == "point":
-				coordinates =  [answer.point.coords[0], answer.point.coords[1]]
-				geometry_type = "Point"
-
-			#получить properties из subquestions
-			subquestions = question.subQuestions()
-			properties = {}
-			subanswers = answer.subAnswers()
-			result = ""
-			for key in subanswers:
-				input_type = key.input_type
-				if (input_type == "text" or input_type == "text_line"):
-					if subanswers[key]:
-						answer = subanswers[key][0]
-						result = answer.text
-				elif input_type == "number" or input_type == "range":
-					if subanswers[key]:
-						answer = subanswers[key][0]
-						result = answer.numeric
-				elif input_type == "choice" or input_type == "rating":
-					if subanswers[key]:
-						answer = subanswers[key][0]
-						names = answer.get_selected_choice_names()
-						result = names[0] if names else ""
-				elif input_type == "multichoice":
-					if subanswers[key]:
-						result = subanswers[key][0].get_selected_choice_names()
-
-				properties[key.name] = result
-
-			properties["session"] = str(answer.survey_session)
-
-			feature = {
-				"type": "Feature",
-				"properties": properties,
-				"geometry":{
-					"type": geometry_type,
-					"coordinates": coordinates,
-				}
-			}
-
-			features.append(feature)
-		
-		geojson_dict = {
-			"type": "FeatureCollection", 
-			"name": question.name,
-			"crs": {"type": "name", "properties": { "name": "urn:ogc:def:crs:OGC:1.3:CRS84" }},
-			"properties": layer_properties,
-			"features": features,
-		} 
-
-		geojson_str = json.dumps(geojson_dict, ensure_ascii=False).encode('utf8')
-
-		#сформировать geojson файл
-		#geojson_str = serialize('geojson', answers, geometry_field=question.input_type)
-		
-		#cформировать файлы
-		zip.writestr(question.name + '.geojson', geojson_str)
-
-	#обработка обычных вопросов
-
-	sessions = survey.sessions()
-
-	properties_list = []
-	for session in sessions:
-		properties = {}
-		answers = session.answers()
-		result = ""
-		for answer in answers:
-			input_type = answer.question.input_type
-
-			if (input_type == "text" or input_type == "text_line"):
-				result = answer.text
-			elif input_type == "number" or input_type == "range":
-				result = answer.numeric
-			elif input_type == "choice" or input_type == "rating":
-				names = answer.get_selected_choice_names()
-				result = names[0] if names else ""
-			elif input_type == "multichoice":
-				result = answer.get_selected_choice_names()
-			else:
-				continue
-
-			properties[answer.question.name] = result
-
-		properties["session"] = str(session)
-		properties["datetime"] = session.start_datetime
-		properties_list.append(properties)
-
-	zip.writestr(survey.name + '.csv', pd.DataFrame(properties_list).to_csv())
-
-
-	#Windows bug fix
-	for file in zip.filelist:
-		file.create_system = 0
-
-	zip.close()
-	response = HttpResponse(content_type="application/zip")
-	response["Content-Disposition"] = "attachment; filename={filename}.zip".format(filename=survey.name)
+	fmt = request.GET.get('mode', 'geojson')
+
+	if fmt not in DATA_FORMATS:
+		return HttpResponse(f"Invalid download mode '{fmt}'", status=400)
+	if fmt in OGR_FORMATS and not ogr_available():
+		return HttpResponse("GeoPackage and FlatGeobuf downloads are not available on this server", status=503)
+
+	# Unchanged data is answered with 304 or from the archive cache
+	key = archive_key(survey, "data", fmt)
+	not_modified = not_modified_response(request, key)
+	if not_modified is not None:
+		return not_modified
+	entry = get_cached_archive(key)
+	if entry is not None:
+		return cached_archive_response(entry, f"{survey.name}.zip")
+
+	# Jobs are listed in the editor of the survey's organization, so only users
+	# with a role on the survey get one; everyone else is streamed the archive
+	if should_run_in_background(survey) and get_effective_survey_role(request.user, survey) is not None:
+		enqueue_export(survey, request.user, "data", fmt)
+		messages.info(request, f"'{survey.name}' is large; the download is being prepared and will appear under Exports.")
+		return redirect('editor')
 
-	in_memory.seek(0)
-	response.write(in_memory.read())
+	# The archive is built while it is sent, one chunk at a time, and cached once complete
+	chunks = caching_stream(stream_zip(survey_data_members(survey, fmt)), survey, "data", fmt, key)
+	response = StreamingHttpResponse(chunks, content_type="application/zip")
+	response["Content-Disposition"] = "attachment; filename={filename}.zip".format(filename=survey.name)
+	response["ETag"] = quote_etag(key)
 
 	return response
 
@@ -648,8 +454,23 @@ def export_survey(request, survey_uuid):
 	survey = request.survey
 
 	try:
+		since = parse_watermark(request.GET['since']) if request.GET.get('since') else None
+
+		key = archive_key(survey, "archive", mode, request.GET.get('since', ''))
+		not_modified = not_modified_response(request, key)
+		if not_modified is not None:
+			return not_modified
+		entry = get_cached_archive(key)
+		if entry is not None:
+			return cached_archive_response(entry, f"survey_{survey.name}_{mode}.zip")
+
+		if mode != "structure" and should_run_in_background(survey):
+			enqueue_export(survey, request.user, "archive", mode, request.GET.get('since', ''))
+			messages.info(request, f"'{survey.name}' is large; the export is being prepared and will appear under Exports.")
+			return redirect('editor')
+
 		in_memory = BytesIO()
-		warnings = export_survey_to_zip(survey, in_memory, mode)
+		warnings = export_survey_to_zip(survey, in_memory, mode, since)
 
 		# Show warnings as messages
 		for warning in warnings:
@@ -657,9 +478,12 @@ def export_survey(request, survey_uuid):
 
 		response = HttpResponse(content_type="application/zip")
 		response["Content-Disposition"] = f"attachment; filename=survey_{survey.name}_{mode}.zip"
+		response["ETag"] = quote_etag(key)
 
 		in_memory.seek(0)
 		response.write(in_memory.read())
+		in_memory.seek(0)
+		store_archive(survey, "archive", mode, key, in_memory)
 
 		return response
 
@@ -668,6 +492,51 @@ def export_survey(request, survey_uuid):
 		return redirect('editor')
 
 
+def _export_job_payload(job):
+	payload = job_status(job)
+	if job.status == "done":
+		payload["download_url"] = reverse('export_job_download', args=[job.survey.uuid, job.id])
+	return payload
+
+
+@require_POST
+@survey_permission_required('viewer')
+def export_job_create(request, survey_uuid):
+	"""Queue a background export and return its status URL at once."""
+	kind = request.POST.get('kind', 'archive')
+	mode = request.POST.get('mode', 'structure' if kind == 'archive' else 'geojson')
+	since = request.POST.get('since', '')
+
+	if kind not in ("archive", "data") or mode not in (EXPORT_MODES if kind == "archive" else DATA_FORMATS):
+		return JsonResponse({'error': f"Invalid export '{kind}/{mode}'"}, status=400)
+	if since and kind == "data":
+		return JsonResponse({'error': "Data downloads do not support 'since'"}, status=400)
+	try:
+		if since:
+			parse_watermark(since)
+	except ExportError as e:
+		return JsonResponse({'error': str(e)}, status=400)
+
+	job = enqueue_export(request.survey, request.user, kind, mode, since)
+	payload = _export_job_payload(job)
+	payload["status_url"] = reverse('export_job_status', args=[request.survey.uuid, job.id])
+	return JsonResponse(payload, status=202)
+
+
+@survey_permission_required('viewer')
+def export_job_status(request, survey_uuid, job_id):
+	"""Progress endpoint polled by the editor."""
+	job = get_object_or_404(ExportJob, id=job_id, survey=request.survey)
+	return JsonResponse(_export_job_payload(job))
+
+
+@survey_permission_required('viewer')
+def export_job_download(request, survey_uuid, job_id):
+	"""Send a finished job's archive from the media storage."""
+	job = get_object_or_404(ExportJob, id=job_id, survey=request.survey, status="done")
+	return FileResponse(job.artifact.open('rb'), as_attachment=True, filename=job.filename, content_type="application/zip")
+
+
 @org_permission_required('editor')
 def import_survey(request):
 	"""Import survey from uploaded ZIP archive."""
@@ -679,12 +548,21 @@ def import_survey(request):
 		return redirect('editor')
 
 	uploaded_file = request.FILES['file']
+	imported = {"sessions": 0}
+
+	def progress(done, total):
+		imported["sessions"] = done
+		if total:
+			logger.info("Import of %s: %d/%d sessions", uploaded_file.name, done, total)
+		else:
+			logger.info("Import of %s: %d sessions", uploaded_file.name, done)
 
 	try:
 		survey, warnings = import_survey_from_zip(
 			uploaded_file,
 			organization=request.active_org,
 			created_by=request.user,
+			progress=progress,
 		)
 
 		# Show warnings
@@ -700,7 +578,7 @@ def import_survey(request):
 			)
 			messages.success(request, f"Survey '{survey.name}' imported successfully")
 		else:
-			messages.success(request, "Data imported successfully")
+			messages.success(request, f"Data imported successfully ({imported['sessions']} sessions)")
 
 	except SerializationImportError as e:
 		messages.error(request, str(e))